@@ -1,24 +1,66 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, g
 from flask_cors import CORS
-import cv2
-import numpy as np
 import os
 import json
+import logging
 import sys
 from datetime import datetime
 
-from gtts import gTTS
 import threading
 import time
 import base64
+from collections import deque
+from contextlib import contextmanager
 from PIL import Image
 import io
 import re
-from google.cloud import vision
-from google.cloud import texttospeech
-from google.auth.exceptions import DefaultCredentialsError
+import hmac
+import shutil
 from werkzeug.utils import secure_filename
 
+import camera_service
+import circuit_breaker
+import event_log
+import health_monitor
+import hedging
+import image_quality
+import lazy_imports
+import logging_setup
+import metrics
+import ocr_backends
+import page_crop
+import page_hashes
+import profiling
+import search_index
+import thumbnails
+import tracing
+import tts_backends
+import virtual_camera
+
+# cv2, numpy and the Google SDKs take most of a second to import; they load on
+# first use, or in the background shortly after the server starts (PRELOAD_MODULES)
+cv2 = lazy_imports.lazy_module('cv2')
+np = lazy_imports.lazy_module('numpy')
+gtts = lazy_imports.lazy_module('gtts')
+grpc = lazy_imports.lazy_module('grpc')
+vision = lazy_imports.lazy_module('google.cloud.vision')
+texttospeech = lazy_imports.lazy_module('google.cloud.texttospeech')
+google_auth_exceptions = lazy_imports.lazy_module('google.auth.exceptions')
+google_exceptions = lazy_imports.lazy_module('google.api_core.exceptions')
+# Imported on a background thread PRELOAD_DELAY_SECONDS after the server is up,
+# so the first capture or OCR request rarely waits for them; empty to disable
+PRELOAD_MODULES = [name.strip() for name in
+                   os.getenv('PRELOAD_MODULES', 'numpy,cv2,google.cloud.vision,google.cloud.texttospeech,gtts').split(',')
+                   if name.strip()]
+PRELOAD_DELAY_SECONDS = float(os.getenv('PRELOAD_DELAY_SECONDS', '1'))
+
+# Log records go through a queue to a background writer; LOG_LEVEL, LOG_FORMAT
+# (text or json) and LOG_FILE pick what is written where
+logging_setup.configure_logging()
+log = logging.getLogger('storyreader')
+# Stream failures can repeat on every frame of every client
+stream_log = logging_setup.rate_limited_logger('storyreader.stream')
+
 app = Flask(__name__)
 CORS(app)
 
@@ -28,6 +70,13 @@ TEXT_FOLDER = 'text'
 AUDIO_FOLDER = 'audio'
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png'}
 
+# File delivery: 'direct' streams bytes through Flask, 'x-accel-redirect' (nginx)
+# and 'x-sendfile' (lighttpd/Apache) only authorize and resolve the path, then hand
+# the transfer to the front proxy
+FILE_DELIVERY_MODE = os.getenv('FILE_DELIVERY_MODE', 'direct')
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '/protected')
+app.config['USE_X_SENDFILE'] = FILE_DELIVERY_MODE == 'x-sendfile'
+
 # Google Cloud Vision configuration
 GOOGLE_CLOUD_VISION_ENABLED = True  # Set to False to disable Google Cloud Vision
 GOOGLE_CLOUD_PROJECT_ID = os.getenv('GOOGLE_CLOUD_PROJECT_ID', 'story-reader-470101')
@@ -36,6 +85,51 @@ GOOGLE_CLOUD_CREDENTIALS_PATH = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', os.p
 # Google Cloud Text-to-Speech configuration
 GOOGLE_CLOUD_TTS_ENABLED = True  # Set to False to disable Google Cloud TTS
 
+# Point the Google clients at other hosts, e.g. regional endpoints. TLS and
+# the usual credentials unless CLOUD_API_INSECURE=1, which talks plaintext
+# without credentials to the local stand-ins in benchmarks/fake_cloud_server.py
+VISION_API_ENDPOINT = os.getenv('VISION_API_ENDPOINT')
+TTS_API_ENDPOINT = os.getenv('TTS_API_ENDPOINT')
+CLOUD_API_INSECURE = os.getenv('CLOUD_API_INSECURE', '0') == '1'
+# Page images can exceed gRPC's default 4 MB message limit
+GRPC_CHANNEL_OPTIONS = [('grpc.max_send_message_length', 32 * 1024 * 1024),
+                        ('grpc.max_receive_message_length', 32 * 1024 * 1024)]
+
+# Deadlines for cloud calls, and circuit breakers that skip a failing
+# backend instead of waiting out the deadline on every request
+VISION_DEADLINE_SECONDS = float(os.getenv('VISION_DEADLINE_SECONDS', '10'))
+TTS_DEADLINE_SECONDS = float(os.getenv('TTS_DEADLINE_SECONDS', '10'))
+vision_breaker = circuit_breaker.CircuitBreaker('google_cloud_vision',
+                                                ignored_exceptions=lambda: (google_exceptions.InvalidArgument,))
+tts_breaker = circuit_breaker.CircuitBreaker('google_cloud_tts',
+                                             ignored_exceptions=lambda: (google_exceptions.InvalidArgument,))
+
+# Hedged duplicates and jittered retries for slow or flaky Vision calls
+vision_hedge = hedging.HedgePolicy(
+    'google_cloud_vision',
+    enabled=os.getenv('VISION_HEDGE_ENABLED', '1') == '1',
+    percentile=float(os.getenv('VISION_HEDGE_PERCENTILE', '95')),
+    budget_ratio=float(os.getenv('VISION_HEDGE_BUDGET', '0.1')),
+    max_retries=int(os.getenv('VISION_MAX_RETRIES', '2'))
+)
+_vision_client = None
+_tts_client = None
+
+# OCR routing: 'best' prefers Vision, 'fast' the lowest observed latency and
+# 'offline' only local engines; ?quality= overrides it per request
+OCR_QUALITY = os.getenv('OCR_QUALITY', 'best')
+TESSERACT_ENABLED = os.getenv('TESSERACT_ENABLED', '1') == '1'
+TESSERACT_LANG = os.getenv('TESSERACT_LANG', 'eng')
+
+# Local speech synthesis (espeak-ng) for offline use. With a latency target,
+# TTS backends expected to take longer than it for a page are tried last
+LOCAL_TTS_ENABLED = os.getenv('LOCAL_TTS_ENABLED', '1') == '1'
+LOCAL_TTS_VOICE = os.getenv('LOCAL_TTS_VOICE', 'en-us')
+LOCAL_TTS_PROCESSES = int(os.getenv('LOCAL_TTS_PROCESSES', str(os.cpu_count() or 1)))
+TTS_LATENCY_TARGET_SECONDS = float(os.getenv('TTS_LATENCY_TARGET_SECONDS', '0')) or None
+# gTTS has no timeout of its own; on a dead connection its breaker skips it
+gtts_breaker = circuit_breaker.CircuitBreaker('gtts')
+
 # Set Google credentials environment variable if credentials file exists
 if os.path.exists(GOOGLE_CLOUD_CREDENTIALS_PATH):
     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = GOOGLE_CLOUD_CREDENTIALS_PATH
@@ -47,22 +141,204 @@ for folder in [UPLOAD_FOLDER, TEXT_FOLDER, AUDIO_FOLDER]:
 # Global variables for camera
 camera = None
 camera_active = False
+# Device index (or virtual source) the camera was opened from, for scans that must not reopen it
+active_camera_device = None
 capture_thread = None
 last_capture_time = 0
 DEBOUNCE_DELAY = 1.0  # 1 second debounce
 camera_lock = threading.Lock()  # Prevent concurrent camera access
 
-# Capture statistics
-capture_stats = {
-    'total_captures': 0,
-    'successful_captures': 0,
-    'failed_captures': 0,
-    'total_capture_time': 0.0,
-    'average_capture_time': 0.0,
-    'last_capture_timestamp': None,
-    'capture_errors': []
+# Capture statistics live in the metrics registry (GET /metrics);
+# /api/capture/stats summarises the same series
+CAPTURES = metrics.counter('storyreader_captures_total', 'Capture attempts by result', ('result',))
+CAPTURE_SECONDS = metrics.histogram('storyreader_capture_seconds', 'Successful capture time, end to end')
+CAPTURE_STAGE_SECONDS = metrics.histogram('storyreader_capture_stage_seconds',
+                                          'Time spent in each capture stage', ('stage',))
+CAPTURE_ERRORS = metrics.counter('storyreader_capture_errors_total', 'Failed captures by category', ('category',))
+CAPTURE_STAGES = ('read', 'quality_check', 'encode', 'write', 'crop', 'dedupe')
+
+# Blur, glare, contrast and text coverage scoring before a page is saved:
+# 'reject' refuses bad frames, 'warn' keeps them with advice, 'off' skips it
+QUALITY_GATE = os.getenv('QUALITY_GATE', 'reject')
+QUALITY_ANALYSIS_WIDTH = int(os.getenv('QUALITY_ANALYSIS_WIDTH', str(image_quality.ANALYSIS_WIDTH)))
+quality_gate = image_quality.QualityGate(QUALITY_GATE, QUALITY_ANALYSIS_WIDTH)
+
+# Page detection and perspective correction of saved pages (page_crop.py)
+# in a process pool; the image as taken is kept in ORIGINALS_FOLDER
+PAGE_CROP = os.getenv('PAGE_CROP', '1') == '1'
+PAGE_CROP_PROCESSES = int(os.getenv('PAGE_CROP_PROCESSES', '2'))
+PAGE_CROP_TIMEOUT_SECONDS = float(os.getenv('PAGE_CROP_TIMEOUT_SECONDS', '15'))
+ORIGINALS_FOLDER = os.path.join(UPLOAD_FOLDER, page_crop.ORIGINALS_FOLDER_NAME)
+page_cropper = page_crop.PageCropper(PAGE_CROP_PROCESSES, PAGE_CROP_TIMEOUT_SECONDS, QUALITY_ANALYSIS_WIDTH)
+PAGE_CROP_SECONDS = metrics.histogram('storyreader_page_crop_seconds',
+                                      'Page detection and correction time per image, in the pool worker', ('result',))
+
+# Perceptual hashes of saved pages (page_hashes.py): a page within
+# DUPLICATE_MAX_DISTANCE bits of an earlier one is flagged as its duplicate,
+# and with DUPLICATE_REUSE its OCR text and audio are copied from that page
+DUPLICATE_DETECTION = os.getenv('DUPLICATE_DETECTION', '1') == '1'
+DUPLICATE_MAX_DISTANCE = int(os.getenv('DUPLICATE_MAX_DISTANCE', str(page_hashes.DEFAULT_MAX_DISTANCE)))
+DUPLICATE_REUSE = os.getenv('DUPLICATE_REUSE', '1') == '1'
+DUPLICATE_PAGES = metrics.counter('storyreader_duplicate_pages_total',
+                                  'Saved pages flagged as near-duplicates of an earlier page')
+REUSED_RESULTS = metrics.counter('storyreader_reused_results_total',
+                                 'OCR text and audio copied from a duplicate page instead of recomputed', ('kind',))
+
+# Recent failures for /api/capture/stats; a run of the same error (e.g.
+# debounce hits during auto-capture) takes one slot with a repeat count
+CAPTURE_ERROR_BUFFER_SIZE = int(os.getenv('CAPTURE_ERROR_BUFFER_SIZE', '50'))
+capture_errors = deque(maxlen=CAPTURE_ERROR_BUFFER_SIZE)  # Oldest first
+last_capture_timestamp = None
+capture_stats_lock = threading.Lock()
+
+# Every capture attempt, success or failure, as JSON lines in a rotating file
+# written off the capture path; CAPTURE_EVENT_LOG= (empty) turns it off
+CAPTURE_EVENT_LOG = os.getenv('CAPTURE_EVENT_LOG', os.path.join('logs', 'capture_events.jsonl'))
+capture_events = event_log.EventLog(
+    CAPTURE_EVENT_LOG,
+    max_bytes=int(os.getenv('CAPTURE_EVENT_LOG_MAX_BYTES', str(5 * 1024 * 1024))),
+    backup_count=int(os.getenv('CAPTURE_EVENT_LOG_BACKUPS', '5'))
+) if CAPTURE_EVENT_LOG else None
+
+def record_capture_failure(category, error, **details):
+    """Count a failed capture attempt by category and remember why"""
+    CAPTURES.inc(result='failed')
+    CAPTURE_ERRORS.inc(category=category)
+    attempt_number = int(CAPTURES.total())
+    timestamp = datetime.now().isoformat()
+    with capture_stats_lock:
+        latest = capture_errors[-1] if capture_errors else None
+        if latest is not None and latest['category'] == category and latest['error'] == error:
+            latest['repeats'] += 1
+            latest['last_timestamp'] = timestamp
+            latest['last_attempt_number'] = attempt_number
+        else:
+            capture_errors.append({
+                'timestamp': timestamp,
+                'category': category,
+                'error': error,
+                'attempt_number': attempt_number,
+                'repeats': 1,
+                'last_timestamp': timestamp,
+                'last_attempt_number': attempt_number
+            })
+    if capture_events is not None:
+        capture_events.emit('capture_failed', category=category, error=error, attempt_number=attempt_number,
+                            **details)
+
+def reset_capture_stats_data():
+    """Start capture statistics afresh"""
+    global last_capture_timestamp
+    for metric in (CAPTURES, CAPTURE_ERRORS, CAPTURE_SECONDS, CAPTURE_STAGE_SECONDS):
+        metric.clear()
+    with capture_stats_lock:
+        capture_errors.clear()
+        last_capture_timestamp = None
+
+def capture_stats_snapshot():
+    """Capture statistics as a plain dict; the camera owner sends this over IPC"""
+    successful = int(CAPTURES.value(result='success'))
+    total_time = CAPTURE_SECONDS.summary()['sum']
+    with capture_stats_lock:
+        errors = list(capture_errors)
+    return {
+        'total_captures': int(CAPTURES.total()),
+        'successful_captures': successful,
+        'failed_captures': int(CAPTURES.value(result='failed')),
+        'total_capture_time': total_time,
+        'average_capture_time': total_time / successful if successful else 0.0,
+        'last_capture_timestamp': last_capture_timestamp,
+        'capture_errors': errors,
+        'errors_by_category': {labels['category']: int(series.value) for labels, series in CAPTURE_ERRORS.series()},
+        'event_log': capture_events.info() if capture_events is not None else None,
+        'latency_seconds': {
+            'total': CAPTURE_SECONDS.summary(),
+            **{stage: CAPTURE_STAGE_SECONDS.summary(stage=stage) for stage in CAPTURE_STAGES}
+        }
+    }
+
+# Production mode: a separate camera owner process (camera_service.py) holds the
+# device and HTTP workers reach it over IPC. Unset for the single-process server.
+CAMERA_SERVICE_ADDRESS = os.getenv('CAMERA_SERVICE_ADDRESS')
+if CAMERA_SERVICE_ADDRESS:
+    camera = camera_service.RemoteCamera(CAMERA_SERVICE_ADDRESS)
+
+# Synthetic camera for headless machines and benchmarks: a video file or a
+# folder of page images (e.g. test_captures) replayed instead of the webcam
+CAMERA_SOURCE = os.getenv('CAMERA_SOURCE')
+CAMERA_SOURCE_FPS = float(os.getenv('CAMERA_SOURCE_FPS', '30'))
+CAMERA_SOURCE_HOLD_FRAMES = int(os.getenv('CAMERA_SOURCE_HOLD_FRAMES', '1'))
+
+def is_camera_active():
+    """Whether the camera is running, in this process or in the camera owner"""
+    if CAMERA_SERVICE_ADDRESS:
+        return camera.status()['active']
+    return camera_active
+
+@contextmanager
+def camera_frame():
+    """Yield the next camera frame (or None), borrowing it from shared memory when possible.
+
+    Frames leased from the camera owner are read-only views that are only
+    valid inside the with block; copy them if they must outlive it.
+    """
+    lease_frame = getattr(camera, 'lease_frame', None)
+    if lease_frame is not None:
+        with lease_frame() as frame:
+            yield frame
+        return
+    ret, frame = camera.read()
+    yield frame if ret else None
+
+# Owning folder and MIME type of every file type served by /api/files/<filename>
+FILE_TYPES = {
+    '.jpg': (UPLOAD_FOLDER, 'image/jpeg'),
+    '.jpeg': (UPLOAD_FOLDER, 'image/jpeg'),
+    '.png': (UPLOAD_FOLDER, 'image/png'),
+    '.txt': (TEXT_FOLDER, 'text/plain'),
+    '.json': (TEXT_FOLDER, 'application/json'),
+    '.mp3': (AUDIO_FOLDER, 'audio/mpeg'),
+    '.wav': (AUDIO_FOLDER, 'audio/wav'),
 }
 
+# Local synthesis writes WAV when no MP3 encoder is installed
+AUDIO_EXTENSIONS = ('.mp3', '.wav')
+
+@tracing.traced('file.resolve')
+def resolve_file(filename):
+    """Map a filename to its path and MIME type from the extension, without probing folders"""
+    if secure_filename(filename) != filename:
+        return None
+    
+    file_type = FILE_TYPES.get(os.path.splitext(filename)[1].lower())
+    if file_type is None:
+        return None
+    
+    folder, mimetype = file_type
+    return os.path.join(folder, filename), mimetype
+
+FILE_BYTES_SENT = metrics.counter('storyreader_file_bytes_sent_total',
+                                  'File bytes sent by the app itself (not the front proxy)', ('kind',))
+
+@tracing.traced('file.prepare_response')
+def deliver_file(path, mimetype, stat, cache_control, kind=None):
+    """Send a resolved file, directly or through the front proxy"""
+    if FILE_DELIVERY_MODE == 'x-accel-redirect':
+        # nginx serves the internal location itself, including ETag, 304s and ranges
+        response = app.response_class(mimetype=mimetype)
+        internal_path = os.path.relpath(path).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = f"{X_ACCEL_REDIRECT_PREFIX}/{internal_path}"
+    else:
+        # With USE_X_SENDFILE set, send_file emits an X-Sendfile header and no body
+        response = send_file(os.path.abspath(path), mimetype=mimetype, conditional=True,
+                             etag=True, last_modified=stat.st_mtime)
+        response.headers.setdefault('Accept-Ranges', 'bytes')
+        if not app.config['USE_X_SENDFILE'] and response.status_code in (200, 206):
+            FILE_BYTES_SENT.inc(response.content_length or 0, kind=kind or mimetype.split('/')[0])
+    
+    response.headers['Cache-Control'] = cache_control
+    return response
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -97,27 +373,33 @@ def capture_frame():
 
 def start_camera():
     """Start the camera with enhanced error handling and device detection"""
-    global camera, camera_active, capture_stats
+    global camera, camera_active, active_camera_device
+    
+    if CAMERA_SERVICE_ADDRESS:
+        return camera.start()
     
     # Use lock to prevent concurrent camera access
     with camera_lock:
         # Check if camera is already active
         if camera_active and camera is not None:
-            print("📷 Camera already active, skipping startup")
+            log.info("📷 Camera already active, skipping startup")
             return True
         
-        print("🚀 Starting enhanced camera initialization...")
+        if CAMERA_SOURCE:
+            return start_virtual_camera()
+        
+        log.info("🚀 Starting enhanced camera initialization...")
         
         # Try to find available camera devices
         available_devices = find_available_cameras()
         if not available_devices:
-            print("❌ No camera devices found")
+            log.error("❌ No camera devices found")
             return False
         
         # Try to open camera with the first available device
         for device_id in available_devices:
             try:
-                print(f"🔍 Attempting to open camera device {device_id}")
+                log.debug(f"🔍 Attempting to open camera device {device_id}")
                 
                 # Try multiple backend approaches
                 backends = [
@@ -128,11 +410,11 @@ def start_camera():
                 
                 for backend_id, backend_name in backends:
                     try:
-                        print(f"  🔧 Trying {backend_name} backend...")
+                        log.debug(f"  🔧 Trying {backend_name} backend...")
                         camera = cv2.VideoCapture(device_id, backend_id)
                         
                         if camera.isOpened():
-                            print(f"  ✅ {backend_name} backend opened device {device_id}")
+                            log.debug(f"  ✅ {backend_name} backend opened device {device_id}")
                             
                             # Set camera properties for better compatibility
                             camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
@@ -149,68 +431,82 @@ def start_camera():
                             for attempt in range(5):  # Increased retry attempts
                                 ret, test_frame = camera.read()
                                 if ret and test_frame is not None:
-                                    print(f"✅ Camera device {device_id} opened successfully with {backend_name} (Resolution: {test_frame.shape[1]}x{test_frame.shape[0]})")
+                                    log.info(f"✅ Camera device {device_id} opened successfully with {backend_name} (Resolution: {test_frame.shape[1]}x{test_frame.shape[0]})")
                                     camera_active = True
+                                    active_camera_device = device_id
                                     
                                     # Reset capture statistics when starting fresh
-                                    capture_stats = {
-                                        'total_captures': 0,
-                                        'successful_captures': 0,
-                                        'failed_captures': 0,
-                                        'total_capture_time': 0.0,
-                                        'average_capture_time': 0.0,
-                                        'last_capture_timestamp': None,
-                                        'capture_errors': []
-                                    }
+                                    reset_capture_stats_data()
                                     frame_success = True
                                     break
                                 else:
-                                    print(f"⚠️ Frame read attempt {attempt + 1} failed for device {device_id} with {backend_name}")
+                                    log.debug(f"⚠️ Frame read attempt {attempt + 1} failed for device {device_id} with {backend_name}")
                                     time.sleep(0.5)  # Increased delay between attempts
                             
                             if frame_success:
                                 return True
                             else:
-                                print(f"❌ Device {device_id} failed frame validation with {backend_name}")
+                                log.error(f"❌ Device {device_id} failed frame validation with {backend_name}")
                                 camera.release()
                                 camera = None
                         else:
-                            print(f"  ❌ {backend_name} backend failed to open device {device_id}")
+                            log.debug(f"  ❌ {backend_name} backend failed to open device {device_id}")
                             
                     except Exception as e:
-                        print(f"  ❌ {backend_name} backend error: {e}")
+                        log.debug(f"  ❌ {backend_name} backend error: {e}")
                         if camera:
                             camera.release()
                             camera = None
                         continue
                 
-                print(f"❌ All backends failed for device {device_id}")
+                log.error(f"❌ All backends failed for device {device_id}")
                     
             except Exception as e:
-                print(f"❌ Error testing device {device_id}: {e}")
+                log.error(f"❌ Error testing device {device_id}: {e}")
                 if camera:
                     camera.release()
                     camera = None
                 continue
         
-        print("❌ No working camera devices found")
+        log.error("❌ No working camera devices found")
         
         # Try fallback methods
-        print("🔄 Attempting fallback camera startup methods...")
+        log.info("🔄 Attempting fallback camera startup methods...")
         if start_camera_fallback():
             return True
         
         return False
 
+def start_virtual_camera():
+    """Open the synthetic camera configured by CAMERA_SOURCE (caller holds camera_lock)"""
+    global camera, camera_active, active_camera_device
+    
+    camera = virtual_camera.VirtualCamera(CAMERA_SOURCE, fps=CAMERA_SOURCE_FPS,
+                                          hold_frames=CAMERA_SOURCE_HOLD_FRAMES)
+    if not camera.isOpened():
+        log.error(f"❌ Virtual camera source {CAMERA_SOURCE} has no readable frames")
+        camera = None
+        return False
+    
+    # Same resolution the webcam path asks for
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    
+    camera_active = True
+    active_camera_device = f"virtual:{CAMERA_SOURCE}"
+    reset_capture_stats_data()
+    log.info(f"✅ Virtual camera replaying {CAMERA_SOURCE} at {camera.fps:.0f} fps")
+    return True
+
 def start_camera_fallback():
     """Fallback camera startup method for problematic systems"""
-    global camera, camera_active, capture_stats
+    global camera, camera_active, active_camera_device
     
-    print("🔄 Attempting fallback camera startup...")
+    log.info("🔄 Attempting fallback camera startup...")
     
     # Method 1: Try direct device 0 with longer timeout
     try:
-        print("🔍 Method 1: Direct device 0 with timeout")
+        log.debug("🔍 Method 1: Direct device 0 with timeout")
         camera = cv2.VideoCapture(0)
         
         # Wait a bit for camera to initialize
@@ -222,38 +518,31 @@ def start_camera_fallback():
             for attempt in range(5):
                 ret, test_frame = camera.read()
                 if ret and test_frame is not None:
-                    print("✅ Fallback method 1 successful")
+                    log.info("✅ Fallback method 1 successful")
                     camera_active = True
+                    active_camera_device = 0
                     
                     # Reset capture statistics
-                    capture_stats = {
-                        'total_captures': 0,
-                        'successful_captures': 0,
-                        'failed_captures': 0,
-                        'total_capture_time': 0.0,
-                        'average_capture_time': 0.0,
-                        'last_capture_timestamp': None,
-                        'capture_errors': []
-                    }
+                    reset_capture_stats_data()
                     return True
                 else:
-                    print(f"⚠️ Frame read attempt {attempt + 1} failed, retrying...")
+                    log.warning(f"⚠️ Frame read attempt {attempt + 1} failed, retrying...")
                     time.sleep(0.5)
             
             # If we get here, camera opened but can't read frames
-            print("❌ Camera opened but frame reading failed after retries")
+            log.error("❌ Camera opened but frame reading failed after retries")
             camera.release()
             camera = None
             
     except Exception as e:
-        print(f"❌ Fallback method 1 failed: {e}")
+        log.error(f"❌ Fallback method 1 failed: {e}")
         if camera:
             camera.release()
             camera = None
     
     # Method 2: Try with specific camera properties
     try:
-        print("🔍 Method 2: Device 0 with specific properties")
+        log.debug("🔍 Method 2: Device 0 with specific properties")
         camera = cv2.VideoCapture(0)
         
         if camera.isOpened():
@@ -267,44 +556,43 @@ def start_camera_fallback():
             
             ret, test_frame = camera.read()
             if ret and test_frame is not None:
-                print("✅ Fallback method 2 successful")
+                log.info("✅ Fallback method 2 successful")
                 camera_active = True
+                active_camera_device = 0
                 
                 # Reset capture statistics
-                capture_stats = {
-                    'total_captures': 0,
-                    'successful_captures': 0,
-                    'failed_captures': 0,
-                    'total_capture_time': 0.0,
-                    'average_capture_time': 0.0,
-                    'last_capture_timestamp': None,
-                    'capture_errors': []
-                }
+                reset_capture_stats_data()
                 return True
             else:
-                print("❌ Fallback method 2 failed - no frames")
+                log.error("❌ Fallback method 2 failed - no frames")
                 camera.release()
                 camera = None
                 
     except Exception as e:
-        print(f"❌ Fallback method 2 failed: {e}")
+        log.error(f"❌ Fallback method 2 failed: {e}")
         if camera:
             camera.release()
             camera = None
     
-    print("❌ All fallback methods failed")
+    log.error("❌ All fallback methods failed")
     return False
 
 def find_available_cameras():
     """Find available camera devices for mobile web access"""
+    # Probing devices from a worker would fight the owner for the webcam
+    if CAMERA_SERVICE_ADDRESS:
+        return camera.call('scan')
+    if CAMERA_SOURCE:
+        return [f"virtual:{CAMERA_SOURCE}"]
+    
     available_devices = []
     
-    print("🔍 Starting camera device scan for mobile web access...")
+    log.info("🔍 Starting camera device scan for mobile web access...")
     
     # Simple camera detection for web-based mobile access
     for device_id in [0, 1]:
         try:
-            print(f"🔍 Testing device {device_id}...")
+            log.debug(f"🔍 Testing device {device_id}...")
             test_camera = cv2.VideoCapture(device_id)
             
             if test_camera.isOpened():
@@ -322,23 +610,23 @@ def find_available_cameras():
                 ret, frame = test_camera.read()
                 if ret and frame is not None:
                     available_devices.append(device_id)
-                    print(f"✅ Found working camera at device {device_id} (Resolution: {frame.shape[1]}x{frame.shape[0]})")
+                    log.info(f"✅ Found working camera at device {device_id} (Resolution: {frame.shape[1]}x{frame.shape[0]})")
                 
                 test_camera.release()
             else:
-                print(f"❌ Device {device_id} could not be opened")
+                log.debug(f"❌ Device {device_id} could not be opened")
                 
         except Exception as e:
-            print(f"❌ Error testing device {device_id}: {e}")
+            log.debug(f"❌ Error testing device {device_id}: {e}")
             continue
     
-    print(f"📊 Camera scan complete: {len(available_devices)} working devices found")
+    log.info(f"📊 Camera scan complete: {len(available_devices)} working devices found")
     
     if not available_devices:
-        print("💡 Mobile web access tips:")
-        print("   1. Use your mobile phone's camera through the web interface")
-        print("   2. Ensure you're accessing the app via HTTPS for camera permissions")
-        print("   3. Grant camera permissions when prompted by your browser")
+        log.info("💡 Mobile web access tips:")
+        log.info("   1. Use your mobile phone's camera through the web interface")
+        log.info("   2. Ensure you're accessing the app via HTTPS for camera permissions")
+        log.info("   3. Grant camera permissions when prompted by your browser")
     
     return available_devices
 
@@ -365,112 +653,199 @@ def get_camera_info():
             'device_id': getattr(camera, 'device_id', 'unknown')
         }
     except Exception as e:
-        print(f"Error getting camera info: {e}")
+        log.info(f"Error getting camera info: {e}")
         return None
 
 def stop_camera():
     """Stop the camera"""
-    global camera, camera_active
+    global camera, camera_active, active_camera_device
+    
+    if CAMERA_SERVICE_ADDRESS:
+        camera.stop()
+        return
     
     with camera_lock:
         if camera is not None:
-            print("🛑 Stopping camera...")
+            log.info("🛑 Stopping camera...")
             camera.release()
             camera = None
         camera_active = False
-        print("✅ Camera stopped")
+        active_camera_device = None
+        log.info("✅ Camera stopped")
+
+def quality_message(quality):
+    """The advice for every issue the quality gate found, worst first"""
+    advice = []
+    for issue in quality['issues']:
+        if issue['advice'] not in advice:
+            advice.append(issue['advice'])
+    return '; '.join(advice)
+
+# The gate's report on the latest capture attempt in this process, so a
+# rejected capture can return its scores (None when no frame was scored)
+last_quality_report = None
+
+def latest_quality_report():
+    """Quality report of the latest capture attempt, from the camera owner in production mode"""
+    if CAMERA_SERVICE_ADDRESS:
+        return camera.call('quality_report')
+    return last_quality_report
 
+def page_metadata_path(image_filename):
+    base_filename = os.path.splitext(os.path.basename(image_filename))[0]
+    return os.path.join(TEXT_FOLDER, f"{base_filename}_metadata.json")
+
+# Written to the page's metadata file when it is saved; OCR keeps them
+CAPTURE_METADATA_KEYS = ('capture_quality', 'page_crop', 'duplicate_of')
+
+def save_capture_metadata(image_filename, **fields):
+    """Start the page's metadata file with what was learned at capture time"""
+    metadata = {key: value for key, value in fields.items() if value is not None}
+    if not metadata:
+        return
+    try:
+        with open(page_metadata_path(image_filename), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+    except OSError as e:
+        log.warning(f"⚠️ Could not save capture metadata for {image_filename}: {e}")
+
+def load_capture_metadata(image_filename):
+    """The capture quality report, page crop and duplicate flag saved with the page, where present"""
+    try:
+        with open(page_metadata_path(image_filename), encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {key: metadata[key] for key in CAPTURE_METADATA_KEYS if key in metadata}
+
+def crop_saved_page(filename):
+    """Flatten and crop the page in a saved image in the crop pool; None when turned off.
+
+    The result's `gray` is the corrected page at QUALITY_ANALYSIS_WIDTH when
+    the image was replaced."""
+    if not PAGE_CROP:
+        return None
+    try:
+        result = page_cropper.crop(os.path.join(UPLOAD_FOLDER, filename))
+    except Exception as e:
+        PAGE_CROP_SECONDS.observe(PAGE_CROP_TIMEOUT_SECONDS if isinstance(e, TimeoutError) else 0, result='failed')
+        log.warning(f"⚠️ Page crop failed for {filename}, keeping the image as taken: {e}")
+        return {'cropped': False, 'error': str(e) or type(e).__name__}
+    PAGE_CROP_SECONDS.observe(result['milliseconds'] / 1000, result='cropped' if result['cropped'] else 'no_page')
+    if result['cropped']:
+        width, height = result['page_size']
+        log.info(f"✂️ Cropped {filename} to its page, {width}x{height} "
+                 f"({result['page_fraction']:.0%} of the frame), in {result['milliseconds']:.0f} ms")
+    return result
+
+def register_page_hash(filename, gray):
+    """Hash a newly saved page and return the earlier page it duplicates, or None"""
+    if not DUPLICATE_DETECTION:
+        return None
+    try:
+        hashes = page_hashes.page_hash(gray)
+        matches = [match for match in page_hashes.find_duplicates(hashes, DUPLICATE_MAX_DISTANCE, exclude=filename)
+                   if os.path.exists(os.path.join(UPLOAD_FOLDER, match['filename']))]
+        duplicate = matches[0] if matches else None
+        page_hashes.add_page(filename, hashes, duplicate_of=duplicate and duplicate['filename'],
+                             distance=duplicate and duplicate['distance'])
+    except Exception as e:
+        log.warning(f"⚠️ Page hash update failed for {filename}: {e}")
+        return None
+    if duplicate is not None:
+        DUPLICATE_PAGES.inc()
+        log.info("🔁 %s looks like a duplicate of %s (distance %d)", filename, duplicate['filename'],
+                 duplicate['distance'])
+    return duplicate
+
+def duplicate_message(duplicate):
+    message = f"looks like a duplicate of {duplicate['filename']}"
+    if DUPLICATE_REUSE:
+        message += ", its text and audio will be reused"
+    return message
+
+@tracing.traced('capture')
 def capture_image():
     """Capture and save an image with enhanced features"""
-    global last_capture_time, capture_stats
+    global last_capture_time, last_capture_timestamp, last_quality_report
+    
+    # Debounce and statistics live with the camera in the owner process
+    if CAMERA_SERVICE_ADDRESS:
+        with tracing.span('capture.camera_service'):
+            return camera.capture()
     
+    last_quality_report = None
     capture_start_time = time.time()
     current_time = time.time()
     
-    # Update statistics
-    capture_stats['total_captures'] += 1
-    
     if current_time - last_capture_time < DEBOUNCE_DELAY:
-        capture_stats['failed_captures'] += 1
-        capture_stats['capture_errors'].append({
-            'timestamp': datetime.now().isoformat(),
-            'error': 'Debounce delay active',
-            'attempt_number': capture_stats['total_captures']
-        })
+        record_capture_failure('debounce', 'Debounce delay active')
         return None, "Debounce delay active"
     
     # Check if camera is active
     if not camera_active or camera is None:
-        capture_stats['failed_captures'] += 1
-        capture_stats['capture_errors'].append({
-            'timestamp': datetime.now().isoformat(),
-            'error': 'Camera not active',
-            'attempt_number': capture_stats['total_captures']
-        })
+        record_capture_failure('camera_inactive', 'Camera not active')
         return None, "Camera not active"
     
     # Capture frame with retry mechanism
+    stage_start = time.perf_counter()
     frame = None
     max_retries = 3
-    for attempt in range(max_retries):
-        frame = capture_frame()
-        if frame is not None:
-            break
-        time.sleep(0.1)  # Small delay between attempts
+    with tracing.span('capture.read') as span:
+        for attempt in range(max_retries):
+            frame = capture_frame()
+            if frame is not None:
+                break
+            time.sleep(0.1)  # Small delay between attempts
+        span.set(attempts=attempt + 1)
+    CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - stage_start, stage='read')
     
     if frame is None:
-        capture_stats['failed_captures'] += 1
-        capture_stats['capture_errors'].append({
-            'timestamp': datetime.now().isoformat(),
-            'error': 'Failed to capture frame after multiple attempts',
-            'attempt_number': capture_stats['total_captures']
-        })
+        record_capture_failure('read_failed', 'Failed to capture frame after multiple attempts',
+                               attempts=max_retries)
         return None, "Failed to capture frame after multiple attempts"
     
     # Image quality checks
-    if frame.size == 0:
-        capture_stats['failed_captures'] += 1
-        capture_stats['capture_errors'].append({
-            'timestamp': datetime.now().isoformat(),
-            'error': 'Captured frame is empty',
-            'attempt_number': capture_stats['total_captures']
-        })
-        return None, "Captured frame is empty"
-    
-    # Check image dimensions (minimum 50x50 pixels) - relaxed for testing
-    height, width = frame.shape[:2]
-    if height < 50 or width < 50:  # Relaxed from 100x100 to 50x50 for testing
-        capture_stats['failed_captures'] += 1
-        capture_stats['capture_errors'].append({
-            'timestamp': datetime.now().isoformat(),
-            'error': f'Image too small: {width}x{height} (minimum 50x50)',
-            'attempt_number': capture_stats['total_captures']
-        })
-        return None, "Captured image too small (minimum 50x50 pixels)"
-    
-    # Check image brightness (basic quality check) - very relaxed for debugging
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
-    mean_brightness = np.mean(gray)
-    
-    # For debugging, allow very dark images but log the brightness
-    print(f"🔍 Debug: Image brightness = {mean_brightness:.1f}")
-    
-    if mean_brightness < 1:  # Only reject completely black images
-        capture_stats['failed_captures'] += 1
-        capture_stats['capture_errors'].append({
-            'timestamp': datetime.now().isoformat(),
-            'error': f'Image completely black (brightness: {mean_brightness:.1f})',
-            'attempt_number': capture_stats['total_captures']
-        })
-        return None, "Image completely black - check camera lens"
-    elif mean_brightness > 250:  # Too bright
-        capture_stats['failed_captures'] += 1
-        capture_stats['capture_errors'].append({
-            'timestamp': datetime.now().isoformat(),
-            'error': f'Image too bright (brightness: {mean_brightness:.1f})',
-            'attempt_number': capture_stats['total_captures']
-        })
-        return None, "Image too bright - reduce lighting"
+    stage_start = time.perf_counter()
+    with tracing.span('capture.quality_check') as span:
+        if frame.size == 0:
+            record_capture_failure('empty_frame', 'Captured frame is empty')
+            return None, "Captured frame is empty"
+        
+        # Check image dimensions (minimum 50x50 pixels) - relaxed for testing
+        height, width = frame.shape[:2]
+        if height < 50 or width < 50:  # Relaxed from 100x100 to 50x50 for testing
+            record_capture_failure('too_small', f'Image too small: {width}x{height} (minimum 50x50)',
+                                   width=width, height=height)
+            return None, "Captured image too small (minimum 50x50 pixels)"
+        
+        # Check image brightness (basic quality check) - very relaxed for debugging
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
+        mean_brightness = np.mean(gray)
+        
+        # For debugging, allow very dark images but log the brightness
+        log.debug("🔍 Image brightness = %.1f", mean_brightness)
+        
+        if mean_brightness < 1:  # Only reject completely black images
+            record_capture_failure('too_dark', f'Image completely black (brightness: {mean_brightness:.1f})',
+                                   brightness=round(float(mean_brightness), 2))
+            return None, "Image completely black - check camera lens"
+        elif mean_brightness > 250:  # Too bright
+            record_capture_failure('too_bright', f'Image too bright (brightness: {mean_brightness:.1f})',
+                                   brightness=round(float(mean_brightness), 2))
+            return None, "Image too bright - reduce lighting"
+        span.set(brightness=round(float(mean_brightness), 2))
+        
+        # Blur, glare, contrast and text coverage on a downscaled copy
+        quality = last_quality_report = quality_gate.check(gray)
+        if quality is not None:
+            span.set(quality=quality['verdict'])
+            if quality['verdict'] == 'reject':
+                issue = quality['issues'][0]
+                record_capture_failure(issue['issue'], f"Quality gate: {issue['metric']} past {issue['limit']}",
+                                       quality_scores=quality['scores'])
+                return None, quality_message(quality)
+    CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - stage_start, stage='quality_check')
     
     # Generate filename
     filename = generate_filename()
@@ -478,43 +853,74 @@ def capture_image():
     
     # Save image with quality settings
     try:
-        # Save with high quality JPEG
+        # Encode with high quality JPEG, then write, so each stage is timed on its own
+        stage_start = time.perf_counter()
         encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), 95]
-        success = cv2.imwrite(filepath, frame, encode_params)
+        with tracing.span('capture.encode'):
+            success, encoded = cv2.imencode('.jpg', frame, encode_params)
+        CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - stage_start, stage='encode')
         
         if not success:
-            capture_stats['failed_captures'] += 1
-            capture_stats['capture_errors'].append({
-                'timestamp': datetime.now().isoformat(),
-                'error': 'Failed to save image',
-                'attempt_number': capture_stats['total_captures']
-            })
+            record_capture_failure('encode_failed', 'Failed to save image', filename=filename)
             return None, "Failed to save image"
         
+        stage_start = time.perf_counter()
+        with tracing.span('capture.write', bytes=len(encoded)), open(filepath, 'wb') as f:
+            f.write(encoded.tobytes())
+        CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - stage_start, stage='write')
+        
         # Verify file was created and has content
         if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-            capture_stats['failed_captures'] += 1
-            capture_stats['capture_errors'].append({
-                'timestamp': datetime.now().isoformat(),
-                'error': 'Image file creation failed',
-                'attempt_number': capture_stats['total_captures']
-            })
+            record_capture_failure('write_failed', 'Image file creation failed', filename=filename)
             return None, "Image file creation failed"
         
+        # Replace the frame with the page alone, warped flat; the original is kept
+        stage_start = time.perf_counter()
+        with tracing.span('capture.crop') as span:
+            crop = crop_saved_page(filename)
+            span.set(cropped=bool(crop and crop['cropped']))
+        CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - stage_start, stage='crop')
+        if crop is not None and 'gray' in crop:
+            gray = crop.pop('gray')
+        
+        # Flag a second capture of a page that is already saved
+        stage_start = time.perf_counter()
+        with tracing.span('capture.dedupe') as span:
+            duplicate = register_page_hash(filename, gray)
+            span.set(duplicate=duplicate is not None)
+        CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - stage_start, stage='dedupe')
+        save_capture_metadata(filename, capture_quality=quality, page_crop=crop, duplicate_of=duplicate)
+        
         # Update timestamp and statistics
         last_capture_time = current_time
-        capture_stats['successful_captures'] += 1
-        capture_stats['last_capture_timestamp'] = datetime.now().isoformat()
+        last_capture_timestamp = datetime.now().isoformat()
         
         # Calculate capture time
         capture_time = time.time() - capture_start_time
-        capture_stats['total_capture_time'] += capture_time
-        capture_stats['average_capture_time'] = capture_stats['total_capture_time'] / capture_stats['successful_captures']
+        CAPTURES.inc(result='success')
+        CAPTURE_SECONDS.observe(capture_time)
+        if capture_events is not None:
+            capture_events.emit('capture_succeeded', filename=filename, width=width, height=height,
+                                bytes=len(encoded), brightness=round(float(mean_brightness), 2),
+                                seconds=round(capture_time, 4),
+                                **({'quality': quality['verdict'], 'quality_scores': quality['scores']}
+                                   if quality else {}),
+                                **({'cropped': crop['cropped'], 'crop_ms': crop.get('milliseconds')} if crop else {}),
+                                **({'duplicate_of': duplicate} if duplicate else {}))
+        
+        # Pre-render thumbnails for the file browser off the capture path
+        thumbnails.generate_thumbnails_async(filepath)
         
         # Log successful capture
-        print(f"Image captured successfully: {filename} ({width}x{height}, {os.path.getsize(filepath)} bytes, {capture_time:.3f}s)")
+        log.info("📸 Image captured: %s (%dx%d, %d bytes, %.3fs)", filename, width, height, len(encoded), capture_time)
         
-        return filename, "Image captured successfully"
+        if quality is not None and quality['verdict'] == 'warn':
+            message = f"Image captured with warnings: {quality_message(quality)}"
+        else:
+            message = "Image captured successfully"
+        if duplicate is not None:
+            message += f" - {duplicate_message(duplicate)}"
+        return filename, message
         
     except Exception as e:
         # Clean up failed file if it exists
@@ -524,69 +930,141 @@ def capture_image():
             except:
                 pass
         
-        capture_stats['failed_captures'] += 1
-        capture_stats['capture_errors'].append({
-            'timestamp': datetime.now().isoformat(),
-            'error': f'Error saving image: {str(e)}',
-            'attempt_number': capture_stats['total_captures']
-        })
+        record_capture_failure('save_error', f'Error saving image: {str(e)}', filename=filename)
         return None, f"Error saving image: {str(e)}"
 
-def perform_ocr(image_path):
-    """Perform OCR on the captured image using Google Cloud Vision API with smart formatting"""
+def perform_ocr(image_path, quality=None, deadline=None):
+    """Perform OCR on the captured image with the backend the router picks; errors come back as text"""
     try:
-        # Try Google Cloud Vision if enabled
-        if GOOGLE_CLOUD_VISION_ENABLED and GOOGLE_CLOUD_CREDENTIALS_PATH:
-            try:
-                return perform_google_cloud_ocr(image_path)
-            except Exception as e:
-                print(f"Google Cloud Vision failed: {e}")
-                return f"OCR Error: Google Cloud Vision unavailable - {str(e)}"
-        else:
-            return "OCR Error: Google Cloud Vision not configured"
-            
+        text, _ = ocr_router.recognize(image_path, quality, deadline)
+        return text
     except Exception as e:
+        log.info(f"OCR failed: {e}")
         return f"OCR Error: {str(e)}"
 
-def perform_google_cloud_ocr(image_path):
-    """Perform OCR using Google Cloud Vision API"""
+def make_google_client(client_class, endpoint, asynchronous=False):
+    """Google API client, optionally pointed at another endpoint"""
+    if not endpoint:
+        return client_class()
+    if not CLOUD_API_INSECURE:
+        return client_class(client_options={'api_endpoint': endpoint})
+    
+    # An explicit channel bypasses credential lookup entirely
+    if asynchronous:
+        channel = grpc.aio.insecure_channel(endpoint, options=GRPC_CHANNEL_OPTIONS)
+        transport = client_class.get_transport_class('grpc_asyncio')(channel=channel)
+    else:
+        channel = grpc.insecure_channel(endpoint, options=GRPC_CHANNEL_OPTIONS)
+        transport = client_class.get_transport_class('grpc')(channel=channel)
+    return client_class(transport=transport)
+
+def has_cloud_credentials(endpoint):
+    """Credentials are needed unless the client talks plaintext to a stand-in"""
+    if endpoint and CLOUD_API_INSECURE:
+        return True
+    return bool(GOOGLE_CLOUD_CREDENTIALS_PATH) and os.path.exists(GOOGLE_CLOUD_CREDENTIALS_PATH)
+
+def get_vision_client():
+    """Shared Vision client; its gRPC channel is thread-safe and slow to set up"""
+    global _vision_client
+    if _vision_client is None:
+        _vision_client = make_google_client(vision.ImageAnnotatorClient, VISION_API_ENDPOINT)
+    return _vision_client
+
+def get_tts_client():
+    """Shared Cloud TTS client"""
+    global _tts_client
+    if _tts_client is None:
+        _tts_client = make_google_client(texttospeech.TextToSpeechClient, TTS_API_ENDPOINT)
+    return _tts_client
+
+def perform_google_cloud_ocr(image_path, deadline=None):
+    """Perform OCR using Google Cloud Vision API within `deadline` seconds"""
     try:
-        # Initialize the client
-        client = vision.ImageAnnotatorClient()
-        
         # Read the image file
-        with open(image_path, 'rb') as image_file:
+        with tracing.span('ocr.read_image'), open(image_path, 'rb') as image_file:
             content = image_file.read()
         
         # Create image object
         image = vision.Image(content=content)
         
-        # Perform text detection
-        response = client.text_detection(image=image)
-        texts = response.text_annotations
-        
-        if not texts:
-            return "No text detected in image"
-        
-        # Extract full text (first element contains all text)
-        full_text = texts[0].description
-        
-        # Apply smart formatting
-        formatted_text = smart_format_text(full_text)
-        
-        # Check for errors
-        if response.error.message:
-            raise Exception(f"Google Cloud Vision API error: {response.error.message}")
-        
-        return formatted_text
-        
-    except DefaultCredentialsError:
+        # Perform text detection within the deadline, hedged and retried;
+        # fails fast while the circuit breaker is open
+        with tracing.span('ocr.vision_request', bytes=len(content)):
+            response = vision_breaker.call(
+                vision_hedge.call,
+                lambda timeout: get_vision_client().text_detection(image=image, timeout=timeout),
+                deadline or VISION_DEADLINE_SECONDS
+            )
+        return vision_response_text(response)
+        
+    except google_auth_exceptions.DefaultCredentialsError:
         raise Exception("Google Cloud credentials not found. Please set GOOGLE_APPLICATION_CREDENTIALS environment variable.")
     except Exception as e:
         raise Exception(f"Google Cloud Vision API error: {str(e)}")
 
+def perform_google_cloud_ocr_batch(image_paths, deadline=None):
+    """OCR several pages in one Vision request (at most 16); a failed page comes back as error text"""
+    try:
+        requests = []
+        for image_path in image_paths:
+            with open(image_path, 'rb') as image_file:
+                requests.append({
+                    'image': vision.Image(content=image_file.read()),
+                    'features': [vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)]
+                })
+
+        with tracing.span('ocr.vision_request', pages=len(requests)):
+            batch = vision_breaker.call(
+                vision_hedge.call,
+                lambda timeout: get_vision_client().batch_annotate_images(requests=requests, timeout=timeout),
+                deadline or VISION_DEADLINE_SECONDS
+            )
+
+    except google_auth_exceptions.DefaultCredentialsError:
+        raise Exception("Google Cloud credentials not found. Please set GOOGLE_APPLICATION_CREDENTIALS environment variable.")
+    except Exception as e:
+        raise Exception(f"Google Cloud Vision API error: {str(e)}")
+
+    texts = []
+    for response in batch.responses:
+        try:
+            texts.append(vision_response_text(response))
+        except Exception as e:
+            texts.append(f"OCR Error: {str(e)}")
+    return texts
+
+def vision_availability():
+    """Whether Vision can take a request now, and why not"""
+    if not GOOGLE_CLOUD_VISION_ENABLED:
+        return False, "Disabled"
+    if not has_cloud_credentials(VISION_API_ENDPOINT):
+        return False, "Credentials file not found"
+    if vision_breaker.state == circuit_breaker.OPEN:
+        return False, "Circuit breaker open"
+    return True, None
+
+def vision_response_text(response):
+    """Extract and format the text of a Vision text_detection response"""
+    texts = response.text_annotations
+    
+    if not texts:
+        return "No text detected in image"
+    
+    # Extract full text (first element contains all text)
+    full_text = texts[0].description
+    
+    # Apply smart formatting
+    formatted_text = smart_format_text(full_text)
+    
+    # Check for errors
+    if response.error.message:
+        raise Exception(f"Google Cloud Vision API error: {response.error.message}")
+    
+    return formatted_text
 
 
+@tracing.traced('ocr.format_text')
 def smart_format_text(text):
     """Apply smart formatting to extracted text"""
     if not text:
@@ -633,7 +1111,25 @@ def smart_format_text(text):
     
     return formatted_text.strip()
 
-def save_ocr_metadata(image_path, text, ocr_method, processing_time):
+# OCR backends, tried in the order the router picks per request
+OCR_SECONDS = metrics.histogram('storyreader_ocr_seconds', 'OCR attempt time by backend and result',
+                                ('backend', 'result'))
+OCR_PAGES = metrics.counter('storyreader_ocr_pages_total', 'Pages sent to OCR by backend and result',
+                            ('backend', 'result'))
+
+def observe_ocr(backend, seconds, pages, failed):
+    result = 'error' if failed else 'success'
+    OCR_SECONDS.observe(seconds, backend=backend, result=result)
+    OCR_PAGES.inc(pages, backend=backend, result=result)
+
+ocr_router = ocr_backends.OCRRouter([
+    ocr_backends.VisionBackend(perform_google_cloud_ocr, perform_google_cloud_ocr_batch, vision_availability)
+] + ([
+    ocr_backends.TesseractBackend(lang=TESSERACT_LANG, postprocess=smart_format_text)
+] if TESSERACT_ENABLED else []), default_quality=OCR_QUALITY, observer=observe_ocr)
+
+@tracing.traced('ocr.save_metadata')
+def save_ocr_metadata(image_path, text, ocr_method, processing_time, reused_from=None):
     """Save OCR metadata alongside the extracted text"""
     try:
         # Get image info
@@ -651,9 +1147,14 @@ def save_ocr_metadata(image_path, text, ocr_method, processing_time):
             'confidence_score': 'high' if ocr_method == 'google_cloud_vision' else 'medium'
         }
         
+        if reused_from:
+            metadata['reused_from'] = reused_from
+        
+        # Keep the quality report and duplicate flag written at capture time
+        metadata.update(load_capture_metadata(image_path))
+        
         # Save metadata as JSON
-        base_filename = os.path.splitext(os.path.basename(image_path))[0]
-        metadata_path = os.path.join(TEXT_FOLDER, f"{base_filename}_metadata.json")
+        metadata_path = page_metadata_path(image_path)
         
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, indent=2, ensure_ascii=False)
@@ -661,85 +1162,231 @@ def save_ocr_metadata(image_path, text, ocr_method, processing_time):
         return metadata_path
         
     except Exception as e:
-        print(f"Error saving OCR metadata: {e}")
+        log.info(f"Error saving OCR metadata: {e}")
         return None
 
-def text_to_speech(text, filename):
-    """Convert text to speech using Google Cloud TTS or fallback to gTTS"""
+def text_to_speech(text, filename, latency_target=None):
+    """Convert text to speech with the backend the router picks; None if every backend fails"""
     try:
-        # Try Google Cloud TTS first if enabled
-        if GOOGLE_CLOUD_TTS_ENABLED and os.path.exists(GOOGLE_CLOUD_CREDENTIALS_PATH):
-            return text_to_speech_google_cloud(text, filename)
-        else:
-            # Fallback to gTTS
-            return text_to_speech_gtts(text, filename)
+        audio_path, _ = tts_router.synthesize(text, filename, latency_target)
+        return audio_path
     except Exception as e:
-        print(f"TTS error: {e}")
-        # Fallback to gTTS if Google Cloud TTS fails
-        return text_to_speech_gtts(text, filename)
+        log.error(f"❌ TTS error: {e}")
+        return None
 
 def text_to_speech_google_cloud(text, filename):
     """Convert text to speech using Google Cloud Text-to-Speech"""
     try:
-        # Initialize the client
-        client = texttospeech.TextToSpeechClient()
-        
-        # Set the text input
-        synthesis_input = texttospeech.SynthesisInput(text=text)
-        
-        # Build the voice request
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="en-US",
-            name="en-US-Wavenet-D",  # High-quality neural voice
-            ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL,
-        )
-        
-        # Select the type of audio file you want returned
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=1.0,  # Normal speed
-            pitch=0.0,  # Normal pitch
-            volume_gain_db=0.0,  # Normal volume
-        )
-        
-        # Perform the text-to-speech request
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
-        )
-        
-        # Save the audio file
-        audio_path = os.path.join(AUDIO_FOLDER, f"{filename}.mp3")
-        with open(audio_path, "wb") as out:
-            out.write(response.audio_content)
-            print(f"✅ Google Cloud TTS: Audio content written to {audio_path}")
-        
-        return audio_path
-        
+        # Perform the text-to-speech request within the deadline; fails fast
+        # while the circuit breaker is open
+        with tracing.span('tts.google_request', characters=len(text)):
+            response = tts_breaker.call(
+                lambda: get_tts_client().synthesize_speech(
+                    timeout=TTS_DEADLINE_SECONDS, **google_tts_request(text))
+            )
+        
+        return save_google_tts_audio(response, filename)
+        
+    except circuit_breaker.CircuitOpenError:
+        raise
     except Exception as e:
-        print(f"❌ Google Cloud TTS error: {e}")
+        log.error(f"❌ Google Cloud TTS error: {e}")
         raise e
 
+def google_tts_request(text):
+    """Input, voice and audio config for a Google Cloud synthesize_speech call"""
+    # Set the text input
+    synthesis_input = texttospeech.SynthesisInput(text=text)
+    
+    # Build the voice request
+    voice = texttospeech.VoiceSelectionParams(
+        language_code="en-US",
+        name="en-US-Wavenet-D",  # High-quality neural voice
+        ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL,
+    )
+    
+    # Select the type of audio file you want returned
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.MP3,
+        speaking_rate=1.0,  # Normal speed
+        pitch=0.0,  # Normal pitch
+        volume_gain_db=0.0,  # Normal volume
+    )
+    
+    return {'input': synthesis_input, 'voice': voice, 'audio_config': audio_config}
+
+@tracing.traced('tts.write_audio')
+def save_google_tts_audio(response, filename):
+    """Write the MP3 from a synthesize_speech response to the audio folder"""
+    audio_path = os.path.join(AUDIO_FOLDER, f"{filename}.mp3")
+    with open(audio_path, "wb") as out:
+        out.write(response.audio_content)
+        log.info(f"✅ Google Cloud TTS: Audio content written to {audio_path}")
+    
+    return audio_path
+
 def text_to_speech_gtts(text, filename):
-    """Convert text to speech using gTTS (fallback)"""
+    """Convert text to speech using gTTS; fails fast while its circuit breaker is open"""
     try:
-        tts = gTTS(text=text, lang='en')
+        tts = gtts.gTTS(text=text, lang='en')
         audio_path = os.path.join(AUDIO_FOLDER, f"{filename}.mp3")
-        tts.save(audio_path)
-        print(f"✅ gTTS: Audio content written to {audio_path}")
+        gtts_breaker.call(tts.save, audio_path)
+        log.info(f"✅ gTTS: Audio content written to {audio_path}")
         return audio_path
+    except circuit_breaker.CircuitOpenError:
+        raise
+    except Exception as e:
+        log.error(f"❌ gTTS error: {e}")
+        raise e
+
+def google_tts_availability():
+    """Whether Google Cloud TTS can take a request now, and why not"""
+    if not GOOGLE_CLOUD_TTS_ENABLED:
+        return False, "Disabled"
+    if not has_cloud_credentials(TTS_API_ENDPOINT):
+        return False, "Credentials file not found"
+    if tts_breaker.state == circuit_breaker.OPEN:
+        return False, "Circuit breaker open"
+    return True, None
+
+def gtts_availability():
+    if gtts_breaker.state == circuit_breaker.OPEN:
+        return False, "Circuit breaker open"
+    return True, None
+
+# TTS backends, best-sounding first unless a latency target says otherwise
+TTS_SECONDS = metrics.histogram('storyreader_tts_seconds', 'TTS attempt time by backend and result',
+                                ('backend', 'result'))
+TTS_CHARACTERS = metrics.counter('storyreader_tts_characters_total', 'Characters synthesized by backend',
+                                 ('backend',))
+
+def observe_tts(backend, seconds, characters, failed):
+    TTS_SECONDS.observe(seconds, backend=backend, result='error' if failed else 'success')
+    if not failed:
+        TTS_CHARACTERS.inc(characters, backend=backend)
+
+tts_router = tts_backends.TTSRouter([
+    tts_backends.CloudTTSBackend('google_cloud_tts', 'high', text_to_speech_google_cloud,
+                                 google_tts_availability, typical_chars_per_second=1000.0),
+    tts_backends.CloudTTSBackend('gtts', 'standard', text_to_speech_gtts, gtts_availability,
+                                 typical_chars_per_second=500.0)
+] + ([
+    tts_backends.EspeakBackend(AUDIO_FOLDER, voice=LOCAL_TTS_VOICE, processes=LOCAL_TTS_PROCESSES,
+                               timeout=TTS_DEADLINE_SECONDS)
+] if LOCAL_TTS_ENABLED else []), latency_target=TTS_LATENCY_TARGET_SECONDS, observer=observe_tts)
+
+@tracing.traced('search.index_update')
+def update_search_index(text_filename, text):
+    """Add freshly written OCR text to the full-text search index"""
+    try:
+        text_path = os.path.join(TEXT_FOLDER, text_filename)
+        search_index.index_page(text_filename, text, os.path.getmtime(text_path))
     except Exception as e:
-        print(f"❌ gTTS error: {e}")
+        log.warning(f"⚠️ Search index update failed for {text_filename}: {e}")
+
+def duplicate_sources(filename):
+    """Other saved pages that look like `filename`, closest first; [] when reuse is off"""
+    if not (DUPLICATE_DETECTION and DUPLICATE_REUSE):
+        return []
+    try:
+        hashes = page_hashes.stored_hashes(filename)
+        if hashes is None:
+            # Saved before page hashing, or by another route
+            hashes = page_hashes.hash_image_file(os.path.join(UPLOAD_FOLDER, filename))
+            if hashes is None:
+                return []
+            page_hashes.add_page(filename, hashes)
+        matches = page_hashes.find_duplicates(hashes, DUPLICATE_MAX_DISTANCE, exclude=filename)
+    except Exception as e:
+        log.warning(f"⚠️ Duplicate lookup failed for {filename}: {e}")
+        return []
+    return [match['filename'] for match in matches
+            if os.path.exists(os.path.join(UPLOAD_FOLDER, match['filename']))]
+
+def reusable_ocr_text(filename):
+    """(text, source page) from a duplicate of `filename` that already has OCR text, or None"""
+    for source in duplicate_sources(filename):
+        try:
+            with open(os.path.join(TEXT_FOLDER, source.replace('.jpg', '.txt')), 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            continue
+        # Failed OCR of the other copy is not worth copying
+        if search_index.is_indexable(text):
+            REUSED_RESULTS.inc(kind='ocr')
+            return text, source
+    return None
+
+def reuse_duplicate_audio(filename, text):
+    """Link the audio of a duplicate page with the same text to `filename`; (audio file, source) or None"""
+    for source in duplicate_sources(filename):
+        try:
+            with open(os.path.join(TEXT_FOLDER, source.replace('.jpg', '.txt')), 'r', encoding='utf-8') as f:
+                if f.read() != text:
+                    continue
+        except OSError:
+            continue
+        for extension in AUDIO_EXTENSIONS:
+            source_audio = os.path.join(AUDIO_FOLDER, source.replace('.jpg', extension))
+            if not os.path.exists(source_audio):
+                continue
+            audio_filename = filename.replace('.jpg', extension)
+            audio_path = os.path.join(AUDIO_FOLDER, audio_filename)
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
+            try:
+                os.link(source_audio, audio_path)
+            except OSError:
+                shutil.copyfile(source_audio, audio_path)
+            REUSED_RESULTS.inc(kind='tts')
+            return audio_filename, source
+    return None
+
+def reuse_requested(value):
+    """Whether a request's `reuse` parameter (query string or JSON) allows copying a duplicate's results"""
+    return value not in ('0', 'false', False, 0)
+
+def reused_ocr_result(filename, reuse=True):
+    """(text, source page) for OCR of `filename` copied from a read duplicate, or None.
+
+    Shared by the Flask and ASGI OCR and TTS routes."""
+    if not reuse:
+        return None
+    with tracing.span('ocr.reuse') as span:
+        reused = reusable_ocr_text(filename)
+        span.set(reused=reused is not None)
+    return reused
+
+def reused_audio_result(filename, text, reuse=True):
+    """TTS response data for audio linked from a duplicate page with the same text, or None"""
+    if not reuse:
         return None
+    start_time = time.time()
+    with tracing.span('tts.reuse') as span:
+        reused = reuse_duplicate_audio(filename, text)
+        span.set(reused=reused is not None)
+    if reused is None:
+        return None
+    audio_filename, reused_from = reused
+    return {
+        'success': True,
+        'audio_file': audio_filename,
+        'tts_method': 'duplicate',
+        'reused_from': reused_from,
+        'processing_time': round(time.time() - start_time, 3),
+        'message': f'Audio reused from duplicate page {reused_from}'
+    }
 
 def simulate_shutter_sound():
     """Simulate camera shutter sound (console beep)"""
     try:
-        # Print a visual indicator for shutter sound
-        print("📸 *shutter sound*")
+        # Log a visual indicator for shutter sound
+        log.debug("📸 *shutter sound*")
         # You could also add actual audio feedback here if desired
     except:
         pass
 
+@tracing.traced('image.info')
 def get_image_info(image_path):
     """Get detailed information about a captured image"""
     try:
@@ -778,6 +1425,133 @@ def get_image_info(image_path):
     except Exception as e:
         return None
 
+# Time to produce each Flask response (to the first byte for streams); the
+# async OCR/TTS routes are timed by the router observers instead
+HTTP_REQUEST_SECONDS = metrics.histogram('storyreader_http_request_seconds', 'Time to produce a response by route',
+                                         ('route', 'method', 'status'))
+
+# Each request is traced from arrival until its body has been sent; the trace
+# id goes back in X-Trace-Id and an incoming traceparent/X-Trace-Id is kept
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', '1') == '1'
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '500'))
+TRACE_EXPORT = os.getenv('TRACE_EXPORT', 'file')  # file | otlp | none
+TRACE_FILE = os.getenv('TRACE_FILE', os.path.join('logs', 'traces.jsonl'))
+OTLP_ENDPOINT = os.getenv('OTLP_ENDPOINT', 'http://127.0.0.1:4318')
+# Long-lived or self-referential routes would crowd out the traces worth reading
+UNTRACED_ROUTES = {'/api/stream', '/metrics', '/api/traces/slowest', '/api/traces/<trace_id>',
+                   '/api/profiling/<profile_id>', '/static/<path:filename>'}
+
+if TRACE_EXPORT == 'otlp':
+    trace_exporter = tracing.OTLPExporter(OTLP_ENDPOINT, service_name='storyreader')
+elif TRACE_EXPORT == 'file' and TRACE_FILE:
+    trace_exporter = tracing.FileExporter(
+        TRACE_FILE,
+        max_bytes=int(os.getenv('TRACE_FILE_MAX_BYTES', str(10 * 1024 * 1024))),
+        backup_count=int(os.getenv('TRACE_FILE_BACKUPS', '5'))
+    )
+else:
+    trace_exporter = None
+tracing.configure(enabled=TRACING_ENABLED, buffer_size=TRACE_BUFFER_SIZE, exporter=trace_exporter)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if route not in UNTRACED_ROUTES:
+        trace_id, parent_span_id = tracing.trace_context_from_headers(request.headers)
+        g.trace = tracing.tracer.start_trace(f"{request.method} {route}", trace_id, parent_span_id,
+                                             route=route, method=request.method, path=request.path)
+
+@app.after_request
+def observe_request(response):
+    lazy_imports.record_first_response()
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method,
+                                     status=response.status_code)
+    trace = g.pop('trace', None)
+    if trace is not None:
+        trace.root.set(status=response.status_code)
+        response.headers['X-Trace-Id'] = trace.trace_id
+        handler_done = time.perf_counter()
+
+        def finish_trace():
+            # Runs once the server has sent the body, so file transfers count too
+            tracing.tracer.add_span(trace, 'response.send', handler_done, time.perf_counter(),
+                                    bytes=response.content_length)
+            tracing.tracer.finish_trace(trace)
+
+        if response.direct_passthrough and hasattr(response.response, 'close'):
+            # send_file hands the server a file wrapper to sendfile() and the
+            # server closes only that, never the response itself
+            close_file = response.response.close
+
+            def close_and_finish():
+                try:
+                    close_file()
+                finally:
+                    finish_trace()
+
+            response.response.close = close_and_finish
+        else:
+            response.call_on_close(finish_trace)
+    return response
+
+@app.teardown_request
+def detach_trace(error=None):
+    # No response was built, so after_request never handed the trace on
+    tracing.tracer.finish_trace(g.pop('trace', None), error)
+    # Worker threads are reused; the next request must not inherit this trace
+    tracing.tracer.detach()
+
+# Opt-in profiling of live requests (see profiling.py). Without PROFILING_TOKEN
+# the hooks below are never installed, so requests pay nothing for it
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join('logs', 'profiles'))
+profiler = profiling.Profiler(PROFILE_DIR) if PROFILING_TOKEN else None
+
+def profiling_authorized():
+    supplied = request.headers.get('X-Profile-Token', '')
+    return profiler is not None and hmac.compare_digest(supplied.encode(), PROFILING_TOKEN.encode())
+
+def start_request_profile():
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if route.startswith('/api/profiling'):
+        return
+    # X-Profile: cprofile|sample profiles just this request
+    one_off_mode = request.headers.get('X-Profile')
+    if one_off_mode not in profiling.MODES or not profiling_authorized():
+        one_off_mode = None
+    handle = profiler.begin_request(route, one_off_mode)
+    if handle is not None:
+        g.request_profile = handle
+        handle.resume()
+
+def finish_request_profile(response):
+    handle = g.pop('request_profile', None)
+    if handle is None:
+        return response
+    handle.pause()
+    if handle.session.trigger == 'header':
+        response.headers['X-Profile-Id'] = handle.session.id
+    if response.is_streamed and not response.direct_passthrough:
+        # The body is produced after the view returns, e.g. /api/stream frames
+        response.response = handle.profile_stream(response.response)
+    else:
+        handle.end()
+    return response
+
+def abandon_request_profile(error=None):
+    handle = g.pop('request_profile', None)
+    if handle is not None:
+        handle.end()
+
+if profiler is not None:
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.teardown_request(abandon_request_profile)
+
 @app.route('/')
 def index():
     """Main page with camera interface"""
@@ -823,28 +1597,27 @@ def start_camera_api():
 def troubleshoot_camera():
     """Troubleshoot camera issues with comprehensive diagnostics"""
     try:
-        print("🔧 Starting comprehensive camera troubleshooting...")
-        
-        # Check system camera status
-        check_system_camera_status()
+        log.info("🔧 Starting comprehensive camera troubleshooting...")
         
-        # Check system camera availability
-        system_cameras = find_available_cameras()
+        # Device scan and permissions from the health monitor; ?refresh=1 probes again now
+        devices, devices_checked = health_checks.result('camera_devices', refresh=request.args.get('refresh') == '1')
+        system_cameras = devices['available_devices'] if devices else []
         
         # Check current camera status
         current_status = {
-            'camera_active': camera_active,
+            'camera_active': is_camera_active(),
             'camera_opened': camera.isOpened() if camera else False,
-            'available_devices': system_cameras
+            'available_devices': system_cameras,
+            'devices_checked': devices_checked
         }
         
         # Check permissions
-        permissions_status = check_camera_permissions()
+        permissions_status = devices['camera_access'] if devices else 'unknown'
         current_status['permissions'] = permissions_status
         
         # Try to start camera with fallback
-        if not camera_active:
-            print("🔧 Troubleshooting: Attempting camera startup...")
+        if not is_camera_active():
+            log.info("🔧 Troubleshooting: Attempting camera startup...")
             success = start_camera()
             current_status['startup_attempted'] = True
             current_status['startup_successful'] = success
@@ -908,6 +1681,8 @@ def stop_camera_api():
 def camera_diagnostics():
     """Get comprehensive camera diagnostics for troubleshooting"""
     try:
+        devices, devices_checked = health_checks.result('camera_devices', refresh=request.args.get('refresh') == '1')
+        devices = devices or {}
         diagnostics = {
             'timestamp': datetime.now().isoformat(),
             'system_info': {
@@ -916,52 +1691,22 @@ def camera_diagnostics():
                 'python_version': f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
             },
             'camera_status': {
-                'active': camera_active,
+                'active': is_camera_active(),
                 'opened': camera.isOpened() if camera else False,
                 'camera_object': str(camera) if camera else None
             },
             'device_scan': {
-                'available_devices': find_available_cameras(),
-                'device_details': []
+                'available_devices': devices.get('available_devices', []),
+                'device_details': devices.get('device_details', []),
+                'checked': devices_checked
             },
             'permissions_check': {
-                'camera_access': check_camera_permissions(),
-                'file_access': check_file_permissions()
+                'camera_access': devices.get('camera_access', 'unknown'),
+                'file_access': devices.get('file_access', 'unknown')
             },
             'recommendations': []
         }
         
-        # Add device details
-        for device_id in diagnostics['device_scan']['available_devices']:
-            try:
-                test_cam = cv2.VideoCapture(device_id)
-                if test_cam.isOpened():
-                    width = int(test_cam.get(cv2.CAP_PROP_FRAME_WIDTH))
-                    height = int(test_cam.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                    fps = test_cam.get(cv2.CAP_PROP_FPS)
-                    
-                    diagnostics['device_scan']['device_details'].append({
-                        'device_id': device_id,
-                        'resolution': f"{width}x{height}",
-                        'fps': fps,
-                        'status': 'working'
-                    })
-                    
-                    # Test frame capture
-                    ret, frame = test_cam.read()
-                    if ret and frame is not None:
-                        diagnostics['device_scan']['device_details'][-1]['frame_capture'] = 'success'
-                    else:
-                        diagnostics['device_scan']['device_details'][-1]['frame_capture'] = 'failed'
-                    
-                    test_cam.release()
-            except Exception as e:
-                diagnostics['device_scan']['device_details'].append({
-                    'device_id': device_id,
-                    'status': 'error',
-                    'error': str(e)
-                })
-        
         # Generate recommendations
         if not diagnostics['device_scan']['available_devices']:
             diagnostics['recommendations'].append("No camera devices detected. Check hardware connections.")
@@ -991,21 +1736,21 @@ def test_camera_frame():
             }), 400
         
         # Capture a test frame
-        ret, frame = camera.read()
-        if not ret or frame is None:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to capture frame'
-            }), 400
-        
-        # Analyze frame properties
-        height, width = frame.shape[:2]
-        channels = frame.shape[2] if len(frame.shape) == 3 else 1
-        
-        # Check brightness
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
-        mean_brightness = np.mean(gray)
-        std_brightness = np.std(gray)
+        with camera_frame() as frame:
+            if frame is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Failed to capture frame'
+                }), 400
+            
+            # Analyze frame properties
+            height, width = frame.shape[:2]
+            channels = frame.shape[2] if len(frame.shape) == 3 else 1
+            
+            # Check brightness
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
+            mean_brightness = np.mean(gray)
+            std_brightness = np.std(gray)
         
         frame_info = {
             'success': True,
@@ -1033,44 +1778,28 @@ def test_camera_frame():
 
 def check_camera_permissions():
     """Check camera permissions for mobile web access"""
+    if CAMERA_SERVICE_ADDRESS:
+        return camera.call('permissions')
+    
     try:
-        print("🔐 Checking camera permissions for mobile web access...")
+        log.info("🔐 Checking camera permissions for mobile web access...")
         
         # Try to open camera directly
         try:
             test_cam = cv2.VideoCapture(0)
             if test_cam.isOpened():
                 test_cam.release()
-                print("✅ Camera access appears to be granted")
+                log.info("✅ Camera access appears to be granted")
                 return 'granted'
             else:
-                print("⚠️ Camera could not be opened - may be permission issue")
+                log.warning("⚠️ Camera could not be opened - may be permission issue")
                 return 'denied_or_unknown'
         except Exception as e:
-            print(f"❌ Camera access test failed: {e}")
+            log.error(f"❌ Camera access test failed: {e}")
             return 'denied_or_unknown'
     except Exception:
         return 'unknown'
 
-def check_system_camera_status():
-    """Check system-level camera status for mobile web access"""
-    try:
-        print("🔍 Checking camera system status for mobile web access...")
-        
-        # Simple camera hardware check
-        try:
-            test_cam = cv2.VideoCapture(0)
-            if test_cam.isOpened():
-                print("✅ Camera hardware detected and accessible")
-                test_cam.release()
-            else:
-                print("⚠️ Camera hardware not accessible")
-        except Exception as e:
-            print(f"⚠️ Could not check camera hardware: {e}")
-            
-    except Exception as e:
-        print(f"❌ Error checking system camera status: {e}")
-
 def check_file_permissions():
     """Check if we can write to the images directory"""
     try:
@@ -1082,13 +1811,96 @@ def check_file_permissions():
     except Exception:
         return 'not_writable'
 
+def active_device_scan():
+    """Scan result naming the device in use, built without opening any device"""
+    device = camera.status().get('device') if CAMERA_SERVICE_ADDRESS else active_camera_device
+    return {
+        'available_devices': [] if device is None else [device],
+        'device_details': [] if device is None else [{'device_id': device, 'status': 'in_use'}],
+        'camera_access': 'granted',
+        'file_access': check_file_permissions()
+    }
+
+def scan_camera_devices():
+    """Available devices, per-device details and permissions; opens devices, so the health monitor runs it"""
+    # Serialized with camera start/stop so a scan never races an open
+    with camera_lock:
+        # Opening the device the app is streaming from would steal its frames;
+        # in production every worker would make the owner do it
+        if is_camera_active():
+            previous = health_checks.last_value('camera_devices')
+            return previous if previous is not None else active_device_scan()
+        available_devices = find_available_cameras()
+        device_details = []
+        # A worker must not open devices the camera owner holds
+        scanned_devices = [] if CAMERA_SERVICE_ADDRESS or CAMERA_SOURCE else available_devices
+        for device_id in scanned_devices:
+            try:
+                test_cam = cv2.VideoCapture(device_id)
+                if test_cam.isOpened():
+                    width = int(test_cam.get(cv2.CAP_PROP_FRAME_WIDTH))
+                    height = int(test_cam.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                    fps = test_cam.get(cv2.CAP_PROP_FPS)
+                    
+                    # Test frame capture
+                    ret, frame = test_cam.read()
+                    device_details.append({
+                        'device_id': device_id,
+                        'resolution': f"{width}x{height}",
+                        'fps': fps,
+                        'status': 'working',
+                        'frame_capture': 'success' if ret and frame is not None else 'failed'
+                    })
+                    
+                    test_cam.release()
+            except Exception as e:
+                device_details.append({
+                    'device_id': device_id,
+                    'status': 'error',
+                    'error': str(e)
+                })
+        return {
+            'available_devices': available_devices,
+            'device_details': device_details,
+            'camera_access': check_camera_permissions(),
+            'file_access': check_file_permissions()
+        }
+
+def cloud_backend_health(enabled, endpoint, get_client):
+    """Whether a Google client can be set up, as {'available': bool, 'error': str or None}"""
+    if not enabled:
+        return {'available': False, 'error': None}
+    if not (GOOGLE_CLOUD_CREDENTIALS_PATH or endpoint):
+        return {'available': False, 'error': "No credentials path configured"}
+    if not has_cloud_credentials(endpoint):
+        return {'available': False, 'error': "Credentials file not found"}
+    try:
+        get_client()
+    except Exception as e:
+        return {'available': False, 'error': str(e)}
+    return {'available': True, 'error': None}
+
+# Status endpoints answer from these cached results instead of probing
+# devices and building cloud clients on every page load
+HEALTH_MONITOR_ENABLED = os.getenv('HEALTH_MONITOR_ENABLED', '1') == '1'
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv('HEALTH_CHECK_INTERVAL_SECONDS', '30'))
+CAMERA_SCAN_INTERVAL_SECONDS = float(os.getenv('CAMERA_SCAN_INTERVAL_SECONDS', '60'))
+health_checks = health_monitor.HealthMonitor(initial_delay=PRELOAD_DELAY_SECONDS)
+health_checks.register('google_cloud_vision',
+                       lambda: cloud_backend_health(GOOGLE_CLOUD_VISION_ENABLED, VISION_API_ENDPOINT, get_vision_client),
+                       HEALTH_CHECK_INTERVAL_SECONDS)
+health_checks.register('google_cloud_tts',
+                       lambda: cloud_backend_health(GOOGLE_CLOUD_TTS_ENABLED, TTS_API_ENDPOINT, get_tts_client),
+                       HEALTH_CHECK_INTERVAL_SECONDS)
+health_checks.register('camera_devices', scan_camera_devices, CAMERA_SCAN_INTERVAL_SECONDS)
+
 @app.route('/api/camera/status')
 def camera_status():
     """Get detailed camera status and information"""
     try:
         # Get basic status
         status_data = {
-            'active': camera_active,
+            'active': is_camera_active(),
             'opened': camera.isOpened() if camera else False,
             'timestamp': datetime.now().isoformat()
         }
@@ -1113,9 +1925,15 @@ def camera_status():
                     'error': str(e)
                 }
         
-        # Add available devices information
-        available_devices = find_available_cameras()
+        # Shared-memory frame transport counters in production mode
+        if CAMERA_SERVICE_ADDRESS:
+            status_data['frame_transport'] = camera.transport_stats()
+        
+        # Add available devices information (from the last background scan)
+        devices, devices_checked = health_checks.result('camera_devices', refresh=request.args.get('refresh') == '1')
+        available_devices = devices['available_devices'] if devices else []
         status_data['available_devices'] = available_devices
+        status_data['devices_checked'] = devices_checked
         
         # Add system information
         status_data['system_info'] = {
@@ -1155,14 +1973,26 @@ def capture_api():
                 'timestamp': datetime.now().isoformat(),
                 'image_info': image_info
             }
+            # Read back from the metadata file, which the camera owner process writes in production mode
+            capture_metadata = load_capture_metadata(filename)
+            if 'capture_quality' in capture_metadata:
+                response_data['quality'] = capture_metadata['capture_quality']
+            if 'page_crop' in capture_metadata:
+                response_data['page_crop'] = capture_metadata['page_crop']
+            if 'duplicate_of' in capture_metadata:
+                response_data['duplicate_of'] = capture_metadata['duplicate_of']
             
             return jsonify(response_data)
         else:
-            return jsonify({
+            response_data = {
                 'success': False,
                 'message': message,
                 'timestamp': datetime.now().isoformat()
-            }), 400
+            }
+            quality = latest_quality_report()
+            if quality is not None and quality['verdict'] == 'reject':
+                response_data['quality'] = quality
+            return jsonify(response_data), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -1202,8 +2032,28 @@ def upload_mobile_image():
         filename = f"mobile_{timestamp}_p001.jpg"
         filepath = os.path.join(UPLOAD_FOLDER, filename)
         
+        # Score the upload before keeping it
+        data = file.read()
+        gray = quality = None
+        if quality_gate.enabled or DUPLICATE_DETECTION:
+            gray = image_quality.decode_gray(data, QUALITY_ANALYSIS_WIDTH)
+            if gray is None:
+                return jsonify({
+                    'success': False,
+                    'message': 'Could not decode image'
+                }), 400
+            quality = quality_gate.check(gray)
+            if quality is not None and quality['verdict'] == 'reject':
+                return jsonify({
+                    'success': False,
+                    'message': quality_message(quality),
+                    'quality': quality,
+                    'timestamp': datetime.now().isoformat()
+                }), 422
+        
         # Save the file
-        file.save(filepath)
+        with open(filepath, 'wb') as f:
+            f.write(data)
         
         # Verify file was saved
         if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
@@ -1212,9 +2062,21 @@ def upload_mobile_image():
                 'message': 'Failed to save mobile image'
             }), 500
         
+        # Keep only the page, warped flat; the upload as sent is kept
+        crop = crop_saved_page(filename)
+        if crop is not None and 'gray' in crop:
+            gray = crop.pop('gray')
+        
+        # Flag a re-upload of a page that is already saved
+        duplicate = register_page_hash(filename, gray) if gray is not None else None
+        save_capture_metadata(filename, capture_quality=quality, page_crop=crop, duplicate_of=duplicate)
+        
         # Get image information
         image_info = get_image_info(filepath)
         
+        # Pre-render thumbnails for the file browser
+        thumbnails.generate_thumbnails_async(filepath)
+        
         # Simulate shutter sound
         simulate_shutter_sound()
         
@@ -1226,6 +2088,15 @@ def upload_mobile_image():
             'file_size': os.path.getsize(filepath),
             'image_info': image_info
         }
+        if quality is not None:
+            response_data['quality'] = quality
+            if quality['verdict'] == 'warn':
+                response_data['message'] = f"Mobile image uploaded with warnings: {quality_message(quality)}"
+        if crop is not None:
+            response_data['page_crop'] = crop
+        if duplicate is not None:
+            response_data['duplicate_of'] = duplicate
+            response_data['message'] += f" - {duplicate_message(duplicate)}"
         
         return jsonify(response_data)
         
@@ -1244,57 +2115,37 @@ def ocr_api(filename):
     if not os.path.exists(image_path):
         return jsonify({'error': 'Image not found'}), 404
     
+    # Optional per-request deadline in seconds (?deadline=5) and routing
+    # preference (?quality=best|fast|offline)
+    deadline = parse_deadline(request.args.get('deadline'))
+    quality = request.args.get('quality')
+    
     # Start timing
     start_time = time.time()
     
     try:
-        # Determine OCR method
-        if GOOGLE_CLOUD_VISION_ENABLED and GOOGLE_CLOUD_CREDENTIALS_PATH:
+        # A duplicate of an already read page gets that page's text (?reuse=0 reads it anyway)
+        reused = reused_ocr_result(filename, reuse_requested(request.args.get('reuse')))
+        if reused is not None:
+            text, reused_from = reused
+            ocr_method = 'duplicate'
+        else:
+            reused_from = None
+            # The router tries the backends in order and falls back on failure
             try:
-                text = perform_google_cloud_ocr(image_path)
-                ocr_method = 'google_cloud_vision'
+                text, ocr_method = ocr_router.recognize(image_path, quality, deadline)
+            except ocr_backends.OCRBackendUnavailable as e:
+                text = f"OCR Error: {str(e)}"
+                ocr_method = 'not_configured'
             except Exception as e:
-                print(f"Google Cloud Vision failed: {e}")
-                text = f"OCR Error: Google Cloud Vision unavailable - {str(e)}"
+                log.info(f"OCR failed: {e}")
+                text = f"OCR Error: {str(e)}"
                 ocr_method = 'failed'
-        else:
-            text = "OCR Error: Google Cloud Vision not configured"
-            ocr_method = 'not_configured'
         
         # Calculate processing time
         processing_time = time.time() - start_time
         
-        # Save text to file
-        text_filename = filename.replace('.jpg', '.txt')
-        text_path = os.path.join(TEXT_FOLDER, text_filename)
-        
-        with open(text_path, 'w', encoding='utf-8') as f:
-            f.write(text)
-        
-        # Save metadata
-        metadata_path = save_ocr_metadata(image_path, text, ocr_method, processing_time)
-        
-        # Prepare response
-        response_data = {
-            'success': True,
-            'text': text,
-            'text_file': text_filename,
-            'ocr_method': ocr_method,
-            'processing_time': round(processing_time, 3),
-            'confidence_score': 'high' if ocr_method == 'google_cloud_vision' else 'medium',
-            'metadata_file': os.path.basename(metadata_path) if metadata_path else None
-        }
-        
-        # Add text statistics
-        if text and text != "No text detected in image":
-            response_data.update({
-                'text_length': len(text),
-                'word_count': len(text.split()),
-                'line_count': len(text.splitlines()),
-                'text_preview': text[:200] + '...' if len(text) > 200 else text
-            })
-        
-        return jsonify(response_data)
+        return jsonify(store_ocr_result(filename, image_path, text, ocr_method, processing_time, reused_from))
         
     except Exception as e:
         processing_time = time.time() - start_time
@@ -1306,6 +2157,113 @@ def ocr_api(filename):
         }
         return jsonify(error_response), 500
 
+@app.route('/api/ocr/batch', methods=['POST'])
+def ocr_batch_api():
+    """OCR several pages at once; Vision takes up to 16 per request"""
+    data = request.get_json(silent=True) or {}
+    filenames = data.get('filenames') or []
+    if not isinstance(filenames, list) or not filenames:
+        return jsonify({'error': 'No filenames provided'}), 400
+
+    filenames = [secure_filename(name) for name in filenames]
+    missing = [name for name in filenames if not os.path.exists(os.path.join(UPLOAD_FOLDER, name))]
+    if missing:
+        return jsonify({'error': 'Image not found', 'missing': missing}), 404
+
+    image_paths = [os.path.join(UPLOAD_FOLDER, name) for name in filenames]
+    deadline = parse_deadline(data.get('deadline'))
+    start_time = time.time()
+
+    # Duplicates of already read pages get that page's text; the rest go to OCR
+    reused = {}
+    reuse = reuse_requested(data.get('reuse', True))
+    for name in filenames:
+        found = reused_ocr_result(name, reuse)
+        if found is not None:
+            reused[name] = found
+    to_read = [(name, path) for name, path in zip(filenames, image_paths) if name not in reused]
+
+    ocr_method = 'duplicate'
+    texts = []
+    if to_read:
+        try:
+            texts, ocr_method = ocr_router.recognize_batch([path for _, path in to_read], data.get('quality'),
+                                                           deadline)
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'processing_time': round(time.time() - start_time, 3),
+                'ocr_method': 'failed'
+            }), 500
+    read_texts = dict(zip((name for name, _ in to_read), texts))
+
+    processing_time = time.time() - start_time
+    results = []
+    for name, path in zip(filenames, image_paths):
+        if name in reused:
+            text, reused_from = reused[name]
+            results.append(store_ocr_result(name, path, text, 'duplicate', processing_time / len(filenames),
+                                            reused_from))
+        else:
+            results.append(store_ocr_result(name, path, read_texts[name], ocr_method,
+                                            processing_time / len(filenames)))
+
+    return jsonify({
+        'success': True,
+        'ocr_method': ocr_method,
+        'pages': len(results),
+        'processing_time': round(processing_time, 3),
+        'results': results
+    })
+
+def parse_deadline(value):
+    """Per-request OCR deadline from a query parameter, clamped to a sane range"""
+    try:
+        return min(max(float(value), 0.1), 120.0) if value else None
+    except (TypeError, ValueError):
+        return None
+
+@tracing.traced('ocr.store')
+def store_ocr_result(filename, image_path, text, ocr_method, processing_time, reused_from=None):
+    """Save OCR text and metadata for an image and build the API response"""
+    # Save text to file
+    text_filename = filename.replace('.jpg', '.txt')
+    text_path = os.path.join(TEXT_FOLDER, text_filename)
+    
+    with tracing.span('ocr.write_text'), open(text_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    
+    # Keep the search index in step with the text folder
+    update_search_index(text_filename, text)
+    
+    # Save metadata
+    metadata_path = save_ocr_metadata(image_path, text, ocr_method, processing_time, reused_from)
+    
+    # Prepare response
+    response_data = {
+        'success': True,
+        'text': text,
+        'text_file': text_filename,
+        'ocr_method': ocr_method,
+        'processing_time': round(processing_time, 3),
+        'confidence_score': 'high' if ocr_method == 'google_cloud_vision' else 'medium',
+        'metadata_file': os.path.basename(metadata_path) if metadata_path else None
+    }
+    if reused_from:
+        response_data['reused_from'] = reused_from
+    
+    # Add text statistics
+    if text and text != "No text detected in image":
+        response_data.update({
+            'text_length': len(text),
+            'word_count': len(text.split()),
+            'line_count': len(text.splitlines()),
+            'text_preview': text[:200] + '...' if len(text) > 200 else text
+        })
+    
+    return response_data
+
 @app.route('/api/tts/text', methods=['POST'])
 def tts_text_api():
     """Convert text input to speech"""
@@ -1320,22 +2278,9 @@ def tts_text_api():
         
         # Generate a unique filename for this text
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        audio_filename = f"text_tts_{timestamp}.mp3"
-        
-        # Convert to speech
-        audio_path = text_to_speech(text, f"text_tts_{timestamp}")
         
-        if audio_path:
-            return jsonify({
-                'success': True,
-                'audio_file': os.path.basename(audio_path),
-                'message': 'Text converted to speech successfully'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': 'Failed to convert text to speech'
-            }), 500
+        # Convert to speech, optionally within a latency target in seconds
+        return tts_response(text, f"text_tts_{timestamp}", parse_deadline(data.get('latency_target')))
             
     except Exception as e:
         return jsonify({
@@ -1346,6 +2291,8 @@ def tts_text_api():
 @app.route('/api/tts/<filename>', methods=['POST'])
 def tts_api(filename):
     """Convert text to speech"""
+    reuse = reuse_requested(request.args.get('reuse'))
+    
     # First perform OCR if text doesn't exist
     text_filename = filename.replace('.jpg', '.txt')
     text_path = os.path.join(TEXT_FOLDER, text_filename)
@@ -1356,78 +2303,201 @@ def tts_api(filename):
         if not os.path.exists(image_path):
             return jsonify({'error': 'Image not found'}), 404
         
-        text = perform_ocr(image_path)
-        with open(text_path, 'w', encoding='utf-8') as f:
-            f.write(text)
+        with tracing.span('tts.ocr'):
+            reused = reused_ocr_result(filename, reuse)
+            text = reused[0] if reused is not None else perform_ocr(image_path)
+            with open(text_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            update_search_index(text_filename, text)
     else:
-        with open(text_path, 'r', encoding='utf-8') as f:
+        with tracing.span('tts.read_text'), open(text_path, 'r', encoding='utf-8') as f:
             text = f.read()
     
-    # Convert to speech
-    audio_path = text_to_speech(text, filename.replace('.jpg', ''))
+    # A duplicate page with the same text shares the other page's audio
+    reused_audio = reused_audio_result(filename, text, reuse)
+    if reused_audio is not None:
+        return jsonify(reused_audio)
     
-    if audio_path:
-        return jsonify({
-            'success': True,
-            'audio_file': os.path.basename(audio_path),
-            'message': 'Text converted to speech successfully'
-        })
-    else:
+    # Convert to speech, optionally within a latency target (?latency_target=3)
+    return tts_response(text, filename.replace('.jpg', ''), parse_deadline(request.args.get('latency_target')))
+
+def tts_response(text, audio_name, latency_target=None):
+    """Synthesize with the routed TTS backend and build the API response"""
+    start_time = time.time()
+    try:
+        audio_path, tts_method = tts_router.synthesize(text, audio_name, latency_target)
+    except Exception as e:
+        log.error(f"❌ TTS error: {e}")
         return jsonify({
             'success': False,
             'message': 'Failed to convert text to speech'
         }), 500
+    
+    return jsonify({
+        'success': True,
+        'audio_file': os.path.basename(audio_path),
+        'tts_method': tts_method,
+        'processing_time': round(time.time() - start_time, 3),
+        'message': 'Text converted to speech successfully'
+    })
 
 @app.route('/api/files')
 def list_files():
     """List all captured files"""
     files = []
     
+    # Pages flagged as duplicates, {'filename', 'distance'} as in capture and upload responses
+    duplicates = {}
+    if DUPLICATE_DETECTION:
+        try:
+            duplicates = page_hashes.recorded_duplicates()
+        except Exception as e:
+            log.warning(f"⚠️ Could not read duplicate pages: {e}")
+    
     # List images
     for filename in os.listdir(UPLOAD_FOLDER):
         if filename.endswith('.jpg'):
             filepath = os.path.join(UPLOAD_FOLDER, filename)
             stat = os.stat(filepath)
+            version = thumbnails.version_from_stat(stat)
             files.append({
                 'filename': filename,
                 'type': 'image',
                 'size': stat.st_size,
+                'url': f"/api/files/{filename}?v={version}",
+                'thumbnail_url': f"/api/thumbnails/{filename}?size=small&v={version}",
+                'preview_url': f"/api/thumbnails/{filename}?size=medium&v={version}",
                 'created': datetime.fromtimestamp(stat.st_ctime).isoformat(),
                 'has_text': os.path.exists(os.path.join(TEXT_FOLDER, filename.replace('.jpg', '.txt'))),
-                'has_audio': os.path.exists(os.path.join(AUDIO_FOLDER, filename.replace('.jpg', '.mp3')))
+                'has_audio': any(os.path.exists(os.path.join(AUDIO_FOLDER, filename.replace('.jpg', extension)))
+                                 for extension in AUDIO_EXTENSIONS)
             })
+            if filename in duplicates:
+                files[-1]['duplicate_of'] = duplicates[filename]
     
     # Sort by creation time (newest first)
     files.sort(key=lambda x: x['created'], reverse=True)
     
     return jsonify({'files': files})
 
+@app.route('/api/search')
+def search_api():
+    """Full-text search over OCR'd pages"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    book = request.args.get('book') or None
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    
+    start_time = time.time()
+    try:
+        results = search_index.search(query, book=book, limit=limit, offset=offset)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Search failed: {str(e)}'
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'query': query,
+        'book': book,
+        'results': results,
+        'query_time_ms': round((time.time() - start_time) * 1000, 2)
+    })
+
+@app.route('/api/search/books')
+def search_books_api():
+    """List books available for search filtering"""
+    return jsonify({'success': True, 'books': search_index.list_books()})
+
 @app.route('/api/files/<filename>')
 def get_file(filename):
     """Get a specific file"""
-    # Check if it's an image
+    resolved = resolve_file(filename)
+    if resolved is None:
+        return jsonify({'error': 'File not found'}), 404
+    
+    path, mimetype = resolved
+    try:
+        with tracing.span('file.stat'):
+            stat = os.stat(path)
+    except FileNotFoundError:
+        return jsonify({'error': 'File not found'}), 404
+    
+    # A URL carrying the current version always names the same bytes
+    if request.args.get('v') == thumbnails.version_from_stat(stat):
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        # Text and audio are regenerated under the same name, so revalidate
+        cache_control = 'no-cache'
+    
+    # Conditional handling answers If-None-Match/If-Modified-Since with 304 and
+    # Range requests with 206, so seeking in audio doesn't re-download it
+    return deliver_file(path, mimetype, stat, cache_control)
+
+@app.route('/api/files/<filename>/original')
+def get_original_file(filename):
+    """The image as taken, for a page that was cropped out of it"""
+    if secure_filename(filename) != filename or not allowed_file(filename):
+        return jsonify({'error': 'File not found'}), 404
+    
+    path = os.path.join(ORIGINALS_FOLDER, filename)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return jsonify({'error': 'Original not found'}), 404
+    
+    mimetype = FILE_TYPES[os.path.splitext(filename)[1].lower()][1]
+    cache_control = ('public, max-age=31536000, immutable'
+                     if request.args.get('v') == thumbnails.version_from_stat(stat) else 'no-cache')
+    return deliver_file(path, mimetype, stat, cache_control)
+
+@app.route('/api/thumbnails/<filename>')
+def get_thumbnail(filename):
+    """Serve a cached thumbnail of a captured image"""
+    if secure_filename(filename) != filename or not allowed_file(filename):
+        return jsonify({'error': 'File not found'}), 404
+    
     image_path = os.path.join(UPLOAD_FOLDER, filename)
-    if os.path.exists(image_path):
-        return send_file(image_path, mimetype='image/jpeg')
+    if not os.path.exists(image_path):
+        return jsonify({'error': 'File not found'}), 404
     
-    # Check if it's a text file
-    text_path = os.path.join(TEXT_FOLDER, filename)
-    if os.path.exists(text_path):
-        return send_file(text_path, mimetype='text/plain')
+    size = request.args.get('size', thumbnails.DEFAULT_SIZE)
+    if size not in thumbnails.THUMBNAIL_SIZES:
+        return jsonify({'error': f'Unknown thumbnail size: {size}'}), 400
     
-    # Check if it's an audio file
-    audio_path = os.path.join(AUDIO_FOLDER, filename)
-    if os.path.exists(audio_path):
-        return send_file(audio_path, mimetype='audio/mpeg')
+    try:
+        thumbnail_path = thumbnails.get_thumbnail(image_path, size)
+    except Exception as e:
+        return jsonify({'error': f'Failed to generate thumbnail: {str(e)}'}), 500
     
-    return jsonify({'error': 'File not found'}), 404
+    # Versioned URLs never change content, so browsers may keep them forever
+    if request.args.get('v') == thumbnails.source_version(image_path):
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'no-cache'
+    
+    return deliver_file(thumbnail_path, thumbnails.THUMBNAIL_MIMETYPE, os.stat(thumbnail_path), cache_control,
+                        kind='thumbnail')
 
 @app.route('/api/files/<filename>/info')
 def get_file_info(filename):
     """Get detailed information about a specific file"""
+    resolved = resolve_file(filename)
+    if resolved is None or not os.path.exists(resolved[0]):
+        return jsonify({'error': 'File not found'}), 404
+    
+    path, mimetype = resolved
+    
     # Check if it's an image
-    image_path = os.path.join(UPLOAD_FOLDER, filename)
-    if os.path.exists(image_path):
+    image_path = path
+    if mimetype.startswith('image/'):
         image_info = get_image_info(image_path)
         if image_info:
             return jsonify({
@@ -1440,8 +2510,8 @@ def get_file_info(filename):
             return jsonify({'error': 'Failed to get image information'}), 500
     
     # Check if it's a text file
-    text_path = os.path.join(TEXT_FOLDER, filename)
-    if os.path.exists(text_path):
+    text_path = path
+    if mimetype.startswith('text/') or mimetype == 'application/json':
         try:
             stat = os.stat(text_path)
             with open(text_path, 'r', encoding='utf-8') as f:
@@ -1465,8 +2535,8 @@ def get_file_info(filename):
             return jsonify({'error': f'Failed to read text file: {str(e)}'}), 500
     
     # Check if it's an audio file
-    audio_path = os.path.join(AUDIO_FOLDER, filename)
-    if os.path.exists(audio_path):
+    audio_path = path
+    if mimetype.startswith('audio/'):
         try:
             stat = os.stat(audio_path)
             audio_info = {
@@ -1489,26 +2559,33 @@ def get_file_info(filename):
 @app.route('/api/capture/stats')
 def get_capture_stats():
     """Get capture statistics and performance metrics"""
+    stats = camera.call('stats') if CAMERA_SERVICE_ADDRESS else capture_stats_snapshot()
+    
     # Calculate success rate
     success_rate = 0
-    if capture_stats['total_captures'] > 0:
-        success_rate = (capture_stats['successful_captures'] / capture_stats['total_captures']) * 100
+    if stats['total_captures'] > 0:
+        success_rate = (stats['successful_captures'] / stats['total_captures']) * 100
     
     # Get recent errors (last 10)
-    recent_errors = capture_stats['capture_errors'][-10:] if capture_stats['capture_errors'] else []
+    recent_errors = stats['capture_errors'][-10:] if stats['capture_errors'] else []
     
     stats_data = {
         'success': True,
         'statistics': {
-            'total_captures': capture_stats['total_captures'],
-            'successful_captures': capture_stats['successful_captures'],
-            'failed_captures': capture_stats['failed_captures'],
+            'total_captures': stats['total_captures'],
+            'successful_captures': stats['successful_captures'],
+            'failed_captures': stats['failed_captures'],
             'success_rate_percent': round(success_rate, 2),
-            'total_capture_time': round(capture_stats['total_capture_time'], 3),
-            'average_capture_time': round(capture_stats['average_capture_time'], 3),
-            'last_capture_timestamp': capture_stats['last_capture_timestamp'],
-            'recent_errors': recent_errors
+            'total_capture_time': round(stats['total_capture_time'], 3),
+            'average_capture_time': round(stats['average_capture_time'], 3),
+            'last_capture_timestamp': stats['last_capture_timestamp'],
+            'recent_errors': recent_errors,
+            'errors_by_category': stats.get('errors_by_category', {}),
+            'event_log': stats.get('event_log'),
+            # p50/p95/p99 per stage over the last 1, 5 and 15 minutes
+            'latency_seconds': stats.get('latency_seconds')
         },
+        'stream': stream_stats_snapshot(),
         'timestamp': datetime.now().isoformat()
     }
     
@@ -1517,17 +2594,10 @@ def get_capture_stats():
 @app.route('/api/capture/stats/reset', methods=['POST'])
 def reset_capture_stats():
     """Reset capture statistics"""
-    global capture_stats
-    
-    capture_stats = {
-        'total_captures': 0,
-        'successful_captures': 0,
-        'failed_captures': 0,
-        'total_capture_time': 0.0,
-        'average_capture_time': 0.0,
-        'last_capture_timestamp': None,
-        'capture_errors': []
-    }
+    if CAMERA_SERVICE_ADDRESS:
+        camera.call('reset_stats')
+    else:
+        reset_capture_stats_data()
     
     return jsonify({
         'success': True,
@@ -1535,45 +2605,138 @@ def reset_capture_stats():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for this process, plus capture metrics from the camera owner"""
+    if metrics.sharing():
+        # Every worker and the camera owner, summed from their shared snapshots
+        return app.response_class(metrics.render_shared(), content_type=metrics.CONTENT_TYPE)
+    if not CAMERA_SERVICE_ADDRESS:
+        return app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+    # Both processes record startup and import metrics; a process label keeps their series apart
+    sources = [({'process': 'worker'}, metrics.snapshot())]
+    try:
+        sources.append(({'process': 'camera'}, camera.call('metrics')))
+    except (EOFError, OSError, camera_service.CameraServiceError) as e:
+        log.warning(f"⚠️ Camera owner metrics unavailable: {e}")
+    return app.response_class(metrics.render_snapshots(sources), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/health')
+def health_status():
+    """Latest background health check results, with when each was taken"""
+    return jsonify({
+        'monitor_running': health_checks.info()['running'],
+        'checks': {name: {'result': health_checks.last_value(name), **info}
+                   for name, info in health_checks.info()['checks'].items()}
+    })
+
+@app.route('/api/startup')
+def startup_status():
+    """Time to first response and which deferred modules have been imported"""
+    return jsonify({
+        **lazy_imports.startup_info(),
+        **lazy_imports.status(),
+        'preload': {'modules': PRELOAD_MODULES, 'delay_seconds': PRELOAD_DELAY_SECONDS}
+    })
+
+@app.route('/api/traces/slowest')
+def slowest_traces():
+    """Slowest recent requests served by this worker, with their spans"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    minutes = request.args.get('minutes', type=float)
+    traces = tracing.tracer.slowest(limit, minutes * 60 if minutes else None, request.args.get('name'))
+    return jsonify({
+        'success': True,
+        'worker_pid': os.getpid(),
+        'tracing': tracing.tracer.info(),
+        'traces': [trace.to_dict() for trace in traces]
+    })
+
+@app.route('/api/traces/<trace_id>')
+def get_trace(trace_id):
+    """One recent trace by id, as returned in X-Trace-Id"""
+    trace = tracing.tracer.get(trace_id.lower())
+    if trace is None:
+        return jsonify({'error': 'Trace not found (it may have been served by another worker)'}), 404
+    return jsonify({'success': True, 'trace': trace.to_dict()})
+
+def profiling_denied():
+    """Error response unless profiling is enabled and the request has the token"""
+    if profiler is None:
+        return jsonify({'error': 'Profiling is disabled (set PROFILING_TOKEN)'}), 404
+    if not profiling_authorized():
+        return jsonify({'error': 'Missing or wrong X-Profile-Token'}), 403
+    return None
+
+@app.route('/api/profiling')
+def profiling_status():
+    """Running and finished profiling sessions of this worker"""
+    denied = profiling_denied()
+    if denied:
+        return denied
+    return jsonify({'success': True, 'worker_pid': os.getpid(), **profiler.status()})
+
+@app.route('/api/profiling/start', methods=['POST'])
+def start_profiling():
+    """Profile the next N requests and/or T seconds, optionally only on some routes"""
+    denied = profiling_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    routes = data.get('routes')
+    if isinstance(routes, str):
+        routes = [routes]
+    try:
+        session = profiler.start(
+            mode=data.get('mode', 'cprofile'),
+            routes=routes,
+            max_requests=int(data['requests']) if data.get('requests') else None,
+            seconds=float(data['seconds']) if data.get('seconds') else None,
+            interval=float(data.get('interval_ms', 5)) / 1000.0
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    log.info("🔬 Profiling session %s started (%s)", session.id, session.mode)
+    return jsonify({'success': True, 'worker_pid': os.getpid(), 'session': session.info()})
+
+@app.route('/api/profiling/stop', methods=['POST'])
+def stop_profiling():
+    """End the running session now and write what it has collected"""
+    denied = profiling_denied()
+    if denied:
+        return denied
+    session = profiler.stop()
+    if session is None:
+        return jsonify({'success': False, 'error': 'No profiling session running'}), 404
+    return jsonify({'success': True, 'session': session.info()})
+
+@app.route('/api/profiling/<profile_id>')
+def download_profile(profile_id):
+    """The .pstats or collapsed-stacks file of a finished session"""
+    denied = profiling_denied()
+    if denied:
+        return denied
+    session = profiler.find(profile_id)
+    if session is None or not session.path or not os.path.exists(session.path):
+        return jsonify({'error': 'Profile not found (it may be on another worker)'}), 404
+    mimetype = 'application/octet-stream' if session.mode == 'cprofile' else 'text/plain'
+    return send_file(os.path.abspath(session.path), mimetype=mimetype, as_attachment=True,
+                     download_name=os.path.basename(session.path))
+
 @app.route('/api/ocr/info')
 def get_ocr_info():
     """Get OCR system information and configuration"""
     try:
-        # Check Google Cloud Vision availability
-        google_vision_available = False
-        google_vision_error = None
-        
-        if GOOGLE_CLOUD_VISION_ENABLED:
-            if GOOGLE_CLOUD_CREDENTIALS_PATH:
-                if os.path.exists(GOOGLE_CLOUD_CREDENTIALS_PATH):
-                    try:
-                        # Test Google Cloud Vision client initialization
-                        client = vision.ImageAnnotatorClient()
-                        google_vision_available = True
-                    except Exception as e:
-                        google_vision_error = str(e)
-                else:
-                    google_vision_error = "Credentials file not found"
-            else:
-                google_vision_error = "No credentials path configured"
-        
-        # Check Google Cloud TTS availability
-        google_tts_available = False
-        google_tts_error = None
-        
-        if GOOGLE_CLOUD_TTS_ENABLED:
-            if GOOGLE_CLOUD_CREDENTIALS_PATH:
-                if os.path.exists(GOOGLE_CLOUD_CREDENTIALS_PATH):
-                    try:
-                        # Test Google Cloud TTS client initialization
-                        client = texttospeech.TextToSpeechClient()
-                        google_tts_available = True
-                    except Exception as e:
-                        google_tts_error = str(e)
-                else:
-                    google_tts_error = "Credentials file not found"
-            else:
-                google_tts_error = "No credentials path configured"
+        # Client setup is checked in the background; ?refresh=1 checks again now
+        refresh = request.args.get('refresh') == '1'
+        vision_health, vision_checked = health_checks.result('google_cloud_vision', refresh=refresh)
+        tts_health, tts_checked = health_checks.result('google_cloud_tts', refresh=refresh)
+        vision_health = vision_health or {'available': False, 'error': vision_checked['error']}
+        tts_health = tts_health or {'available': False, 'error': tts_checked['error']}
+        google_vision_available, google_vision_error = vision_health['available'], vision_health['error']
+        google_tts_available, google_tts_error = tts_health['available'], tts_health['error']
 
         ocr_info = {
             'success': True,
@@ -1582,26 +2745,51 @@ def get_ocr_info():
                     'enabled': GOOGLE_CLOUD_VISION_ENABLED,
                     'available': google_vision_available,
                     'credentials_path': GOOGLE_CLOUD_CREDENTIALS_PATH,
+                    'api_endpoint': VISION_API_ENDPOINT or 'vision.googleapis.com',
                     'error': google_vision_error,
-                    'priority': 'primary' if google_vision_available else 'unavailable'
+                    'priority': 'primary' if google_vision_available else 'unavailable',
+                    'checked': vision_checked,
+                    'deadline_seconds': VISION_DEADLINE_SECONDS,
+                    'circuit_breaker': vision_breaker.snapshot(),
+                    'hedging': vision_hedge.snapshot(),
+                    'backend': ocr_router.get('google_cloud_vision').capabilities()
+                },
+                'tesseract': {
+                    'enabled': TESSERACT_ENABLED,
+                    'language': TESSERACT_LANG,
+                    'priority': 'fallback',
+                    **(ocr_router.get('tesseract').capabilities() if TESSERACT_ENABLED else {'available': False})
                 }
             },
+            'ocr_router': ocr_router.info(),
             'tts_systems': {
                 'google_cloud_tts': {
                     'enabled': GOOGLE_CLOUD_TTS_ENABLED,
                     'available': google_tts_available,
                     'credentials_path': GOOGLE_CLOUD_CREDENTIALS_PATH,
+                    'api_endpoint': TTS_API_ENDPOINT or 'texttospeech.googleapis.com',
                     'error': google_tts_error,
-                    'priority': 'primary' if google_tts_available else 'fallback_to_gtts'
+                    'priority': 'primary' if google_tts_available else 'fallback_to_gtts',
+                    'checked': tts_checked,
+                    'deadline_seconds': TTS_DEADLINE_SECONDS,
+                    'circuit_breaker': tts_breaker.snapshot(),
+                    'backend': tts_router.get('google_cloud_tts').capabilities()
                 },
                 'gtts': {
                     'enabled': True,
-                    'available': True,
-                    'priority': 'fallback'
+                    'priority': 'fallback',
+                    'circuit_breaker': gtts_breaker.snapshot(),
+                    **tts_router.get('gtts').capabilities()
+                },
+                'espeak': {
+                    'enabled': LOCAL_TTS_ENABLED,
+                    'priority': 'offline_fallback',
+                    **(tts_router.get('espeak').capabilities() if LOCAL_TTS_ENABLED else {'available': False})
                 }
             },
-            'recommended_method': 'google_cloud_vision' if google_vision_available else 'none',
-            'recommended_tts': 'google_cloud_tts' if google_tts_available else 'gtts',
+            'tts_router': tts_router.info(),
+            'recommended_method': next((backend.name for backend in ocr_router.candidates()), 'none'),
+            'recommended_tts': next((backend.name for backend in tts_router.candidates(1000)), 'none'),
             'timestamp': datetime.now().isoformat()
         }
         
@@ -1624,6 +2812,13 @@ def delete_file(filename):
     if os.path.exists(image_path):
         os.remove(image_path)
         deleted_files.append(filename)
+        thumbnails.remove_thumbnails(filename)
+    
+    # Delete the image as taken, kept when the page was cropped out of it
+    original_path = os.path.join(ORIGINALS_FOLDER, filename)
+    if os.path.exists(original_path):
+        os.remove(original_path)
+        deleted_files.append(f"{page_crop.ORIGINALS_FOLDER_NAME}/{filename}")
     
     # Delete associated text file
     text_filename = filename.replace('.jpg', '.txt')
@@ -1631,13 +2826,30 @@ def delete_file(filename):
     if os.path.exists(text_path):
         os.remove(text_path)
         deleted_files.append(text_filename)
+        try:
+            search_index.remove_page(text_filename)
+        except Exception as e:
+            log.warning(f"⚠️ Search index update failed for {text_filename}: {e}")
+    
+    if DUPLICATE_DETECTION:
+        try:
+            page_hashes.remove_page(filename)
+        except Exception as e:
+            log.warning(f"⚠️ Page hash update failed for {filename}: {e}")
+    
+    # Delete OCR and capture quality metadata
+    metadata_path = page_metadata_path(filename)
+    if os.path.exists(metadata_path):
+        os.remove(metadata_path)
+        deleted_files.append(os.path.basename(metadata_path))
     
-    # Delete associated audio file
-    audio_filename = filename.replace('.jpg', '.mp3')
-    audio_path = os.path.join(AUDIO_FOLDER, audio_filename)
-    if os.path.exists(audio_path):
-        os.remove(audio_path)
-        deleted_files.append(audio_filename)
+    # Delete associated audio files
+    for extension in AUDIO_EXTENSIONS:
+        audio_filename = filename.replace('.jpg', extension)
+        audio_path = os.path.join(AUDIO_FOLDER, audio_filename)
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+            deleted_files.append(audio_filename)
     
     return jsonify({
         'success': True,
@@ -1645,6 +2857,30 @@ def delete_file(filename):
         'message': f'Deleted {len(deleted_files)} files'
     })
 
+STREAM_CLIENTS = metrics.gauge('storyreader_stream_clients', 'Open /api/stream connections')
+STREAM_FRAMES = metrics.counter('storyreader_stream_frames_total', 'Frames sent to stream clients')
+STREAM_FRAME_INTERVAL = metrics.histogram('storyreader_stream_frame_interval_seconds',
+                                          'Time between consecutive frames sent to one client')
+STREAM_ENCODE_SECONDS = metrics.histogram('storyreader_stream_encode_seconds', 'JPEG encode time per stream frame')
+
+def stream_stats_snapshot():
+    """Live stream figures for /api/capture/stats"""
+    interval = STREAM_FRAME_INTERVAL.percentiles(60)['p50']
+    return {
+        'clients': int(STREAM_CLIENTS.value() or 0),
+        'frames_sent': int(STREAM_FRAMES.value()),
+        'fps_per_client_1m': round(1.0 / interval, 2) if interval else None,
+        'encode_seconds': STREAM_ENCODE_SECONDS.summary()
+    }
+
+def counted_stream(frames):
+    """Track a stream connection in the open-streams gauge until it closes"""
+    STREAM_CLIENTS.inc()
+    try:
+        yield from frames
+    finally:
+        STREAM_CLIENTS.dec()
+
 @app.route('/api/stream')
 def video_stream():
     """Stream camera feed with enhanced error handling"""
@@ -1653,6 +2889,7 @@ def video_stream():
         frame_count = 0
         error_count = 0
         max_errors = 10  # Increased error tolerance
+        last_frame_at = None
         
         # Warm up the camera with a few initial reads
         for _ in range(5):  # Increased warm-up frames
@@ -1663,48 +2900,72 @@ def video_stream():
             except:
                 pass
         
-        while camera_active and camera and camera.isOpened():
+        while is_camera_active() and camera and camera.isOpened():
             try:
-                ret, frame = camera.read()
-                if ret and frame is not None:
-                    # Convert frame to JPEG
-                    ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
+                with camera_frame() as frame:
+                    captured = frame is not None
+                    if captured:
+                        # Convert frame to JPEG straight from the leased buffer
+                        with STREAM_ENCODE_SECONDS.time():
+                            ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
+                    frame = None
+                if captured:
                     if ret:
                         frame_bytes = buffer.tobytes()
                         frame_count += 1
                         error_count = 0  # Reset error count on successful frame
                         
+                        now = time.perf_counter()
+                        if last_frame_at is not None:
+                            STREAM_FRAME_INTERVAL.observe(now - last_frame_at)
+                        last_frame_at = now
+                        STREAM_FRAMES.inc()
+                        
                         yield (b'--frame\r\n'
                                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
                     else:
                         error_count += 1
-                        print(f"⚠️ Frame encoding failed (error {error_count}/{max_errors})")
+                        stream_log.warning("⚠️ Frame encoding failed (error %d/%d)", error_count, max_errors)
                 else:
                     error_count += 1
-                    print(f"⚠️ Frame capture failed (error {error_count}/{max_errors})")
+                    stream_log.warning("⚠️ Frame capture failed (error %d/%d)", error_count, max_errors)
                 
                 # Stop if too many consecutive errors
                 if error_count >= max_errors:
-                    print("❌ Too many consecutive errors, stopping video stream")
+                    stream_log.error("❌ Too many consecutive errors, stopping video stream")
                     break
                 
                 time.sleep(0.1)  # 10 FPS
                 
             except Exception as e:
                 error_count += 1
-                print(f"❌ Video stream error: {e} (error {error_count}/{max_errors})")
+                stream_log.error("❌ Video stream error: %s (error %d/%d)", e, error_count, max_errors)
                 
                 if error_count >= max_errors:
-                    print("❌ Too many errors, stopping video stream")
+                    stream_log.error("❌ Too many errors, stopping video stream")
                     break
                 
                 time.sleep(0.1)
         
-        print(f"📹 Video stream ended. Total frames: {frame_count}, Errors: {error_count}")
+        stream_log.info("📹 Video stream ended. Total frames: %d, Errors: %d", frame_count, error_count)
     
-    return app.response_class(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return app.response_class(counted_stream(generate()), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+def start_background_tasks():
+    """Preload deferred modules and start the health monitor; call once the server is (about to be) listening"""
+    if PRELOAD_MODULES and lazy_imports.LAZY_IMPORTS:
+        lazy_imports.preload(PRELOAD_MODULES, delay=PRELOAD_DELAY_SECONDS)
+    if HEALTH_MONITOR_ENABLED:
+        health_checks.start()
+    metrics.start_sharing('worker')
+    if DUPLICATE_DETECTION:
+        # Read the stored page hashes before the first capture needs them
+        threading.Thread(target=page_hashes.load, name='page-hash-load', daemon=True).start()
+
+lazy_imports.record_startup('app_imported')
 
 if __name__ == '__main__':
+    start_background_tasks()
     # Check if SSL certificates exist for HTTPS
     ssl_cert = 'cert.pem'
     ssl_key = 'key.pem'
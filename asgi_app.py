@@ -0,0 +1,387 @@
+"""
+ASGI entry point with async OCR and TTS endpoints
+
+Under WSGI every in-flight Vision or TTS call holds a server thread for its
+whole network round trip, so throughput is capped by the thread count.
+This app serves POST /api/ocr/<filename>, /api/tts/<filename> and
+/api/tts/text as coroutines on the async Google clients, so hundreds of
+cloud calls can wait concurrently on one event loop. Every other route is
+handed to the Flask app on a thread pool.
+
+    uvicorn asgi_app:application --host 0.0.0.0 --port 5001
+
+or, with the camera owner and several workers:
+
+    python run_production.py --asgi --workers 4
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from tempfile import SpooledTemporaryFile
+from urllib.parse import parse_qs
+
+from asgiref.sync import AsyncToSync, sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import app as flask_app
+import circuit_breaker
+import lazy_imports
+import ocr_backends
+import tracing
+
+log = logging.getLogger(__name__)
+
+# The same deferred modules app.py uses; preloaded once the server is up
+vision = lazy_imports.lazy_module('google.cloud.vision')
+texttospeech = lazy_imports.lazy_module('google.cloud.texttospeech')
+google_auth_exceptions = lazy_imports.lazy_module('google.auth.exceptions')
+
+# Threads for everything still served by Flask (files, camera, streams);
+# cloud calls no longer need one each
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '16'))
+
+OCR_ROUTE = re.compile(r'^/api/ocr/(?P<filename>[^/]+)$')
+TTS_ROUTE = re.compile(r'^/api/tts/(?P<filename>[^/]+)$')
+
+_wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+
+class ClientDisconnected(Exception):
+    """Raised in a Flask thread when its ASGI client has gone away"""
+
+class ThreadedWsgiInstance(WsgiToAsgiInstance):
+    """asgiref's WSGI adapter, but on a thread pool and aware of disconnects.
+
+    The stock adapter runs every WSGI request on one shared thread, so a
+    single MJPEG stream would block all other Flask routes; it also keeps
+    iterating a streaming response after the client has left.
+    """
+
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False,
+                                 executor=_wsgi_executor)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError('WSGI wrapper received a non-HTTP scope')
+        self.scope = scope
+        self.disconnected = False
+
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            async def watch_disconnect():
+                while (await receive())['type'] != 'http.disconnect':
+                    pass
+                self.disconnected = True
+
+            async def send_while_connected(message):
+                if self.disconnected:
+                    raise ClientDisconnected()
+                await send(message)
+
+            watcher = asyncio.ensure_future(watch_disconnect())
+            self.sync_send = AsyncToSync(send_while_connected)
+            try:
+                await self.run_wsgi_app(body)
+            except ClientDisconnected:
+                pass
+            finally:
+                watcher.cancel()
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+def closing_wsgi_app(wsgi_application):
+    """Close the response iterable once it has been sent, as PEP 3333 requires.
+
+    asgiref never calls close(), so send_file left its file open and Flask's
+    call_on_close callbacks (which finish request traces) never ran.
+    """
+    def application(environ, start_response):
+        iterable = wsgi_application(environ, start_response)
+        try:
+            for chunk in iterable:
+                yield chunk
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+    return application
+
+flask_asgi = ThreadedWsgiToAsgi(closing_wsgi_app(flask_app.app))
+
+# Async Google clients are bound to the event loop they are created on, so
+# they are created lazily inside it and shared by every request
+_vision_client = None
+_tts_client = None
+
+def vision_client():
+    global _vision_client
+    if _vision_client is None:
+        _vision_client = flask_app.make_google_client(vision.ImageAnnotatorAsyncClient,
+                                                      flask_app.VISION_API_ENDPOINT, asynchronous=True)
+    return _vision_client
+
+def tts_client():
+    global _tts_client
+    if _tts_client is None:
+        _tts_client = flask_app.make_google_client(texttospeech.TextToSpeechAsyncClient,
+                                                   flask_app.TTS_API_ENDPOINT, asynchronous=True)
+    return _tts_client
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+async def perform_google_cloud_ocr(image_path, deadline=None):
+    """Async twin of app.perform_google_cloud_ocr"""
+    try:
+        with tracing.span('ocr.read_image'):
+            content = await asyncio.to_thread(read_bytes, image_path)
+        request = {
+            'image': vision.Image(content=content),
+            'features': [vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)]
+        }
+        with tracing.span('ocr.vision_request', bytes=len(content)):
+            batch = await flask_app.vision_breaker.call_async(
+                flask_app.vision_hedge.call_async,
+                lambda timeout: vision_client().batch_annotate_images(requests=[request], timeout=timeout),
+                deadline or flask_app.VISION_DEADLINE_SECONDS
+            )
+        return flask_app.vision_response_text(batch.responses[0])
+    except google_auth_exceptions.DefaultCredentialsError:
+        raise Exception("Google Cloud credentials not found. Please set GOOGLE_APPLICATION_CREDENTIALS environment variable.")
+    except Exception as e:
+        raise Exception(f"Google Cloud Vision API error: {str(e)}")
+
+async def perform_ocr(image_path, quality=None, deadline=None):
+    """Async twin of app.perform_ocr; errors come back as text"""
+    try:
+        text, _ = await flask_app.ocr_router.recognize_async(image_path, quality, deadline)
+        return text
+    except Exception as e:
+        log.warning(f"OCR failed: {e}")
+        return f"OCR Error: {str(e)}"
+
+# Vision calls from the async endpoints go through the async client; local
+# engines keep running on worker threads
+flask_app.ocr_router.get('google_cloud_vision').use_async(perform_google_cloud_ocr)
+
+async def text_to_speech_google_cloud(text, filename):
+    """Async twin of app.text_to_speech_google_cloud"""
+    with tracing.span('tts.google_request', characters=len(text)):
+        response = await flask_app.tts_breaker.call_async(
+            lambda: tts_client().synthesize_speech(timeout=flask_app.TTS_DEADLINE_SECONDS,
+                                                   **flask_app.google_tts_request(text))
+        )
+    return await asyncio.to_thread(flask_app.save_google_tts_audio, response, filename)
+
+# Same for Cloud TTS; gTTS stays blocking on a thread and espeak-ng in its
+# process pool
+flask_app.tts_router.get('google_cloud_tts').use_async(text_to_speech_google_cloud)
+
+async def tts_response(text, audio_name, latency_target=None):
+    """Async twin of app.tts_response: (status, response data)"""
+    start_time = time.time()
+    try:
+        audio_path, tts_method = await flask_app.tts_router.synthesize_async(text, audio_name, latency_target)
+    except Exception as e:
+        log.error(f"❌ TTS error: {e}")
+        return 500, {'success': False, 'message': 'Failed to convert text to speech'}
+    return 200, {
+        'success': True,
+        'audio_file': os.path.basename(audio_path),
+        'tts_method': tts_method,
+        'processing_time': round(time.time() - start_time, 3),
+        'message': 'Text converted to speech successfully'
+    }
+
+# Endpoints ----------------------------------------------------------------
+
+async def ocr_api(filename, query):
+    """Perform OCR on captured image with enhanced processing and metadata"""
+    image_path = os.path.join(flask_app.UPLOAD_FOLDER, filename)
+
+    if not os.path.exists(image_path):
+        return 404, {'error': 'Image not found'}
+
+    deadline = flask_app.parse_deadline(query.get('deadline', [None])[0])
+    quality = query.get('quality', [None])[0]
+    reuse = flask_app.reuse_requested(query.get('reuse', [None])[0])
+    start_time = time.time()
+    try:
+        # A duplicate of an already read page gets that page's text (?reuse=0 reads it anyway)
+        reused = await asyncio.to_thread(flask_app.reused_ocr_result, filename, reuse)
+        if reused is not None:
+            text, reused_from = reused
+            ocr_method = 'duplicate'
+        else:
+            reused_from = None
+            try:
+                text, ocr_method = await flask_app.ocr_router.recognize_async(image_path, quality, deadline)
+            except ocr_backends.OCRBackendUnavailable as e:
+                text = f"OCR Error: {str(e)}"
+                ocr_method = 'not_configured'
+            except Exception as e:
+                log.warning(f"OCR failed: {e}")
+                text = f"OCR Error: {str(e)}"
+                ocr_method = 'failed'
+
+        processing_time = time.time() - start_time
+        response_data = await asyncio.to_thread(flask_app.store_ocr_result, filename, image_path, text,
+                                                ocr_method, processing_time, reused_from)
+        return 200, response_data
+
+    except Exception as e:
+        return 500, {
+            'success': False,
+            'error': str(e),
+            'processing_time': round(time.time() - start_time, 3),
+            'ocr_method': 'failed'
+        }
+
+async def tts_text_api(body):
+    """Convert text input to speech"""
+    try:
+        data = json.loads(body) if body else None
+        if not data or 'text' not in data:
+            return 400, {'error': 'No text provided'}
+
+        text = data['text'].strip()
+        if not text:
+            return 400, {'error': 'Empty text provided'}
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return await tts_response(text, f"text_tts_{timestamp}", flask_app.parse_deadline(data.get('latency_target')))
+
+    except Exception as e:
+        return 500, {'success': False, 'message': f'Error processing text: {str(e)}'}
+
+async def tts_api(filename, query):
+    """Convert text to speech, running OCR first if the page has no text yet"""
+    reuse = flask_app.reuse_requested(query.get('reuse', [None])[0])
+    text_filename = filename.replace('.jpg', '.txt')
+    text_path = os.path.join(flask_app.TEXT_FOLDER, text_filename)
+
+    if not os.path.exists(text_path):
+        image_path = os.path.join(flask_app.UPLOAD_FOLDER, filename)
+        if not os.path.exists(image_path):
+            return 404, {'error': 'Image not found'}
+
+        with tracing.span('tts.ocr'):
+            reused = await asyncio.to_thread(flask_app.reused_ocr_result, filename, reuse)
+            text = reused[0] if reused is not None else await perform_ocr(image_path)
+            await asyncio.to_thread(write_text, text_path, text)
+            await asyncio.to_thread(flask_app.update_search_index, text_filename, text)
+    else:
+        with tracing.span('tts.read_text'):
+            text = await asyncio.to_thread(read_text, text_path)
+
+    # A duplicate page with the same text shares the other page's audio
+    reused_audio = await asyncio.to_thread(flask_app.reused_audio_result, filename, text, reuse)
+    if reused_audio is not None:
+        return 200, reused_audio
+
+    latency_target = flask_app.parse_deadline(query.get('latency_target', [None])[0])
+    return await tts_response(text, filename.replace('.jpg', ''), latency_target)
+
+# ASGI plumbing ------------------------------------------------------------
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def send_json(send, status, data, trace=None):
+    body = json.dumps(data).encode('utf-8')
+    headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+        # Same open CORS policy as flask_cors.CORS(app)
+        (b'access-control-allow-origin', b'*')
+    ]
+    if trace is not None:
+        headers.append((b'x-trace-id', trace.trace_id.encode()))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+def match_async_route(scope):
+    """Return (route, coroutine factory) for the async endpoints, or None for Flask"""
+    if scope['type'] != 'http' or scope['method'] != 'POST':
+        return None
+    path = scope['path']
+    if path == '/api/ocr/batch':
+        return None  # One Vision request per batch; Flask serves it on a thread
+    if path == '/api/tts/text':
+        return '/api/tts/text', tts_text_api
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    match = OCR_ROUTE.match(path)
+    if match:
+        return '/api/ocr/<filename>', lambda body: ocr_api(match.group('filename'), query)
+    match = TTS_ROUTE.match(path)
+    if match:
+        return '/api/tts/<filename>', lambda body: tts_api(match.group('filename'), query)
+    return None
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # uvicorn binds right after startup completes; the delay keeps the imports
+                # and first health checks behind it
+                flask_app.start_background_tasks()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    matched = match_async_route(scope)
+    if matched is None:
+        await flask_asgi(scope, receive, send)
+        return
+    route, handler = matched
+
+    body = await read_body(receive)
+    if body is None:
+        return
+    # Flask routes are traced by the Flask app itself
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    trace_id, parent_span_id = tracing.trace_context_from_headers(headers)
+    with tracing.tracer.trace(f"POST {route}", trace_id, parent_span_id,
+                              route=route, method='POST', path=scope['path']) as trace:
+        status, data = await handler(body)
+        if trace is not None:
+            trace.root.set(status=status)
+        with tracing.span('response.send'):
+            await send_json(send, status, data, trace)
+    lazy_imports.record_first_response()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Concurrent OCR/TTS benchmark: threaded WSGI vs the async ASGI endpoints
+
+Fires POST /api/ocr/<image>, /api/tts/<image> or /api/tts/text at one or
+more running servers with an increasing number of concurrent clients.
+With WSGI, requests beyond the thread count queue behind in-flight cloud
+calls; with asgi_app.py they all wait on the event loop together.
+
+    gunicorn -c gunicorn.conf.py --workers 1 --threads 8 wsgi:app          # port 5001
+    uvicorn asgi_app:application --port 5002
+    python benchmarks/bench_cloud_concurrency.py \\
+        --target wsgi=http://127.0.0.1:5001 --target asgi=http://127.0.0.1:5002 --json cloud.json
+
+Every request is a real (billed) Vision or TTS call unless the servers
+point at the local stand-ins (benchmarks/fake_cloud_server.py, selected with
+VISION_API_ENDPOINT / TTS_API_ENDPOINT and CLOUD_API_INSECURE=1).
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+from common import run_http_load
+
+def first_image(base_url):
+    """Pick a page from the library to OCR over and over"""
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    conn.request('GET', '/api/files')
+    files = json.loads(conn.getresponse().read())['files']
+    conn.close()
+    if not files:
+        raise SystemExit(f"❌ No images at {base_url}; capture or upload a page first")
+    return files[0]['filename']
+
+def request_for(kind, base_url, text):
+    """(paths, body, headers) for one benchmark kind"""
+    if kind == 'tts-text':
+        body = json.dumps({'text': text})
+        return ['/api/tts/text'], body, {'Content-Type': 'application/json'}
+    image = quote(first_image(base_url))
+    return [f"/api/{kind}/{image}"], None, None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare concurrent cloud OCR/TTS throughput')
+    parser.add_argument('--target', action='append', required=True, help='name=url (repeatable)')
+    parser.add_argument('--kind', choices=['ocr', 'tts', 'tts-text'], default='ocr')
+    parser.add_argument('--levels', default='8,32,128,256', help='Comma separated client counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level')
+    parser.add_argument('--text', default='The quick brown fox jumps over the lazy dog.',
+                        help='Text for --kind tts-text')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    levels = [int(value) for value in args.levels.split(',')]
+    results = {
+        'benchmark': 'cloud_concurrency',
+        'kind': args.kind,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'targets': []
+    }
+
+    print(f"{'target':>10} {'clients':>8} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for target in args.target:
+        name, _, url = target.partition('=')
+        paths, body, headers = request_for(args.kind, url, args.text)
+        entry = {'name': name, 'url': url, 'levels': []}
+        for level in levels:
+            result = run_http_load(url, paths, level, args.duration, method='POST', body=body, headers=headers)
+            result['clients'] = level
+            entry['levels'].append(result)
+            latency = result['latency_ms']
+            print(f"{name:>10} {level:>8} {result['requests_per_s']:>10} {latency['p50']!s:>10} "
+                  f"{latency['p95']!s:>10} {latency['p99']!s:>10} {result['errors']:>8}")
+        results['targets'].append(entry)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Concurrent-request throughput benchmark
+
+Drives a running server with an increasing number of concurrent clients
+and reports requests/s and latency percentiles per level. Use it to
+compare the single-process dev server with production mode:
+
+    python app.py
+    python benchmarks/bench_concurrency.py --url http://127.0.0.1:5001 --json dev.json
+
+    python run_production.py --workers 4
+    python benchmarks/bench_concurrency.py --url http://127.0.0.1:5001 --json prod.json
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import time
+from urllib.parse import urlsplit
+
+from common import run_http_load
+
+# /api/camera/status is left out: it probes camera devices on every call and
+# would measure the hardware rather than the server
+DEFAULT_ENDPOINTS = [
+    '/api/files',
+    '/api/capture/stats',
+    '{image}',
+    '{thumbnail}'
+]
+
+def resolve_endpoints(base_url, endpoints):
+    """Fill in {image}/{thumbnail} placeholders with real URLs from the library"""
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    conn.request('GET', '/api/files')
+    files = json.loads(conn.getresponse().read())['files']
+    conn.close()
+
+    paths = []
+    for endpoint in endpoints:
+        if endpoint == '{image}':
+            paths.extend(entry['url'] for entry in files[:50])
+        elif endpoint == '{thumbnail}':
+            paths.extend(entry['thumbnail_url'] for entry in files[:50])
+        else:
+            paths.append(endpoint)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure throughput at increasing concurrency')
+    parser.add_argument('--url', default='http://127.0.0.1:5001')
+    parser.add_argument('--levels', default='1,4,16,64', help='Comma separated client counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level')
+    parser.add_argument('--endpoint', action='append',
+                        help='Path to request (repeatable); {image} and {thumbnail} expand from /api/files')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    paths = resolve_endpoints(args.url, args.endpoint or DEFAULT_ENDPOINTS)
+    results = {
+        'benchmark': 'concurrency',
+        'url': args.url,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'paths': len(paths),
+        'levels': []
+    }
+
+    print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for level in [int(value) for value in args.levels.split(',')]:
+        result = run_http_load(args.url, paths, level, args.duration)
+        result['clients'] = level
+        results['levels'].append(result)
+        latency = result['latency_ms']
+        print(f"{level:>8} {result['requests_per_s']:>10} {latency['p50']!s:>10} "
+              f"{latency['p95']!s:>10} {latency['p99']!s:>10} {result['errors']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
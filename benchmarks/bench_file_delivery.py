@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+File delivery benchmark
+
+Compares image/audio/thumbnail throughput when Flask streams the bytes
+itself (FILE_DELIVERY_MODE=direct) and when it hands them to nginx with
+X-Accel-Redirect (see deploy/nginx.conf). Benchmark one mode at a time
+against the same library:
+
+    python app.py
+    python benchmarks/bench_file_delivery.py --target direct=http://127.0.0.1:5001 --json direct.json
+
+    FILE_DELIVERY_MODE=x-accel-redirect python app.py
+    nginx -p "$PWD" -c deploy/nginx.conf
+    python benchmarks/bench_file_delivery.py --target x-accel-redirect=http://127.0.0.1:8080 --json proxy.json
+
+Several --target options may be given when both setups are reachable at once.
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import time
+from urllib.parse import urlsplit
+
+from common import run_http_load
+
+def fetch_paths(base_url, kinds):
+    """Collect URLs to fetch from the file listing"""
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    conn.request('GET', '/api/files')
+    files = json.loads(conn.getresponse().read())['files']
+    conn.close()
+
+    paths = []
+    for entry in files:
+        if 'image' in kinds:
+            paths.append(entry.get('url') or f"/api/files/{entry['filename']}")
+        if 'thumbnail' in kinds and entry.get('thumbnail_url'):
+            paths.append(entry['thumbnail_url'])
+        if 'audio' in kinds and entry.get('has_audio'):
+            paths.append(f"/api/files/{entry['filename'].rsplit('.', 1)[0]}.mp3")
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare direct and proxy file delivery throughput')
+    parser.add_argument('--target', action='append', required=True,
+                        help='name=base_url, may be given several times')
+    parser.add_argument('--kinds', default='image,thumbnail,audio',
+                        help='Comma separated file kinds to fetch')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per target')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    kinds = set(args.kinds.split(','))
+    results = {
+        'benchmark': 'file_delivery',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'targets': {}
+    }
+
+    for target in args.target:
+        name, _, base_url = target.partition('=')
+        paths = fetch_paths(base_url, kinds)
+        if not paths:
+            print(f"❌ {name}: no files to fetch at {base_url}")
+            return 1
+
+        print(f"🚀 {name}: {len(paths)} URLs, {args.concurrency} clients, {args.duration}s")
+        result = run_http_load(base_url, paths, args.concurrency, args.duration)
+        results['targets'][name] = result
+        print(f"   {result['requests_per_s']} req/s, {result['mb_per_s']} MB/s, "
+              f"p50 {result['latency_ms']['p50']}ms, p99 {result['latency_ms']['p99']}ms, "
+              f"{result['errors']} errors")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+    else:
+        print(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
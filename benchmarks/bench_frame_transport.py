@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Frame transport benchmark: pickled multiprocessing.Queue vs shared-memory ring
+
+A producer process publishes synthetic camera frames and a consumer process
+receives them and "encodes" each one (a checksum over the whole frame, so
+every byte is touched). Reports per-frame latency percentiles, CPU time per
+frame on both sides and how many times each frame is copied.
+
+    python benchmarks/bench_frame_transport.py --frames 500 --resolution 640x480 --json transport.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import latency_summary
+from frame_transport import FrameRing
+
+def make_frames(shape, count=8):
+    """A few distinct frames so nothing can be cached between sends"""
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, size=shape, dtype=np.uint8) for _ in range(count)]
+
+def consume(frame):
+    return int(frame[::4, ::4].sum())
+
+# Pickled queue ------------------------------------------------------------
+
+def queue_producer(queue, shape, frames, interval, ready):
+    samples = make_frames(shape)
+    ready.wait()
+    cpu_start = time.process_time()
+    for i in range(frames):
+        # A Queue pickles the array on put and unpickles a new one on get
+        queue.put((time.monotonic_ns(), samples[i % len(samples)]))
+        time.sleep(interval)
+    queue.put(None)
+    queue.put(('cpu', time.process_time() - cpu_start))
+
+def run_queue(shape, frames, interval):
+    queue = mp.Queue(maxsize=4)
+    ready = mp.Event()
+    producer = mp.Process(target=queue_producer, args=(queue, shape, frames, interval, ready))
+    producer.start()
+    ready.set()
+
+    latencies = []
+    cpu_start = time.process_time()
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        published_ns, frame = item
+        consume(frame)
+        latencies.append((time.monotonic_ns() - published_ns) / 1e9)
+    consumer_cpu = time.process_time() - cpu_start
+    producer_cpu = queue.get()[1]
+    producer.join()
+
+    return {
+        'transport': 'queue',
+        'frames_received': len(latencies),
+        'latency_ms': latency_summary(latencies),
+        'producer_cpu_us_per_frame': round(producer_cpu / frames * 1e6, 1),
+        'consumer_cpu_us_per_frame': round(consumer_cpu / max(len(latencies), 1) * 1e6, 1),
+        # Serialize into the pipe buffer, write, read, rebuild the array
+        'copies_per_frame': 3
+    }
+
+# Shared-memory ring -------------------------------------------------------
+
+def ring_producer(shape, frames, interval, names, ready, results):
+    ring = FrameRing.create(shape)
+    names.put(ring.name)
+    samples = make_frames(shape)
+    ready.wait()
+    cpu_start = time.process_time()
+    for i in range(frames):
+        ring.publish(samples[i % len(samples)])
+        time.sleep(interval)
+    results.put((time.process_time() - cpu_start, ring.report()))
+    # Give the consumer time to see the last frame before the block goes away
+    time.sleep(0.5)
+    ring.close()
+
+def run_ring(shape, frames, interval):
+    names, results = mp.Queue(), mp.Queue()
+    ready = mp.Event()
+    producer = mp.Process(target=ring_producer, args=(shape, frames, interval, names, ready, results))
+    producer.start()
+    ring = FrameRing.attach(names.get())
+    ready.set()
+
+    latencies = []
+    sequence = 0
+    cpu_start = time.process_time()
+    while sequence < frames:
+        lease = ring.lease(0, sequence, timeout=2.0, poll_interval=0.0005)
+        if lease is None:
+            break
+        with lease:
+            consume(lease.frame)
+            latencies.append((time.monotonic_ns() - lease.published_ns) / 1e9)
+            sequence = lease.sequence
+    consumer_cpu = time.process_time() - cpu_start
+    producer_cpu, producer_report = results.get()
+    reader_report = ring.report()
+    producer.join()
+    ring.close()
+
+    leased = max(reader_report['frames_leased'], 1)
+    return {
+        'transport': 'shared_memory',
+        'frames_received': len(latencies),
+        'latency_ms': latency_summary(latencies),
+        'producer_cpu_us_per_frame': round(producer_cpu / frames * 1e6, 1),
+        'consumer_cpu_us_per_frame': round(consumer_cpu / max(len(latencies), 1) * 1e6, 1),
+        'copies_per_frame': round((producer_report['copies']['publish'] / frames)
+                                  + reader_report['copies']['reader'] / leased, 3),
+        'stale_leases': reader_report['stale_leases'],
+        'frames_dropped': producer_report['frames_dropped']
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare frame transports between processes')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--resolution', default='640x480', help='WIDTHxHEIGHT')
+    parser.add_argument('--fps', type=float, default=30.0, help='Producer frame rate (0 = as fast as possible)')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.resolution.lower().split('x'))
+    shape = (height, width, 3)
+    interval = 1.0 / args.fps if args.fps > 0 else 0.0
+
+    results = {
+        'benchmark': 'frame_transport',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'resolution': args.resolution,
+        'frames': args.frames,
+        'fps': args.fps,
+        'results': [run_queue(shape, args.frames, interval), run_ring(shape, args.frames, interval)]
+    }
+
+    print(f"{'transport':>14} {'recv':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'prod µs':>9} {'cons µs':>9} {'copies':>7}")
+    for result in results['results']:
+        latency = result['latency_ms']
+        print(f"{result['transport']:>14} {result['frames_received']:>6} {latency['p50']!s:>8} "
+              f"{latency['p95']!s:>8} {latency['p99']!s:>8} {result['producer_cpu_us_per_frame']:>9} "
+              f"{result['consumer_cpu_us_per_frame']:>9} {result['copies_per_frame']:>7}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
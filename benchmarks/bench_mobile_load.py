@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Load harness: how many phones can stream and upload before the server saturates
+
+Each simulated phone keeps /api/stream open and, in a loop with think time,
+uploads a JPEG to /api/upload/mobile, runs OCR and TTS on it and refreshes
+/api/files, like the mobile page does. Client counts ramp up in steps; every
+step reports throughput and a latency histogram per endpoint, and the first
+step where errors, latency or stream frame rate go past the limits is the
+saturation point.
+
+By default the app runs locally against the virtual camera and the fake
+Vision/TTS servers, so no network or credentials are needed.
+
+    python benchmarks/bench_mobile_load.py --clients 1,2,4,8,16,32 --json mobile.json
+    python benchmarks/bench_mobile_load.py --server asgi --step-duration 30
+    python benchmarks/bench_mobile_load.py --target http://127.0.0.1:5000 --no-stream
+
+A step is saturated when any of these hold:
+
+    error rate above --error-limit (1%)
+    an endpoint's p95 above --latency-factor (3x) its p95 at the first step
+        and above --latency-floor (250 ms), so fast endpoints do not trip on noise
+    mean stream frame rate per client below --min-fps (5)
+    total throughput growing by under half the increase in clients
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from common import (ROOT, free_port, latency_summary, local_stack_env, process_memory, server_worker_pid,
+                    start_app_server, start_fake_cloud, stop_processes)
+
+ENDPOINTS = ('upload', 'ocr', 'tts', 'files')
+# Upper bounds in milliseconds, like Prometheus histogram buckets
+HISTOGRAM_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+class EndpointStats:
+    """Latencies, errors and a bucketed histogram for one endpoint"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.buckets = [0] * len(HISTOGRAM_BUCKETS_MS)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            self.latencies.append(seconds)
+            for index, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+                if ms <= bound:
+                    self.buckets[index] += 1
+                    break
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        requests = len(self.latencies)
+        attempts = requests + self.errors
+        return {
+            'requests': requests,
+            'errors': self.errors,
+            'error_rate': round(self.errors / attempts, 4) if attempts else 0.0,
+            'requests_per_s': round(requests / elapsed, 2),
+            'latency_ms': latency_summary(self.latencies),
+            'histogram_ms': {('+Inf' if bound == float('inf') else str(bound)): count
+                             for bound, count in zip(HISTOGRAM_BUCKETS_MS, self.buckets)}
+        }
+
+def multipart_image(image_bytes):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="page.jpg"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n').encode() + image_bytes + f'\r\n--{boundary}--\r\n'.encode()
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+class MobileClient:
+    """One phone: a stream reader thread and an upload -> OCR -> TTS -> files loop"""
+
+    def __init__(self, host, port, upload_body, upload_headers, stats, stop, think_time, stream, seed):
+        self.host = host
+        self.port = port
+        self.upload_body = upload_body
+        self.upload_headers = upload_headers
+        self.stats = stats
+        self.stop = stop
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.stream_fps = None
+        self.stream_error = None
+        self.threads = [threading.Thread(target=self.run_actions, daemon=True)]
+        if stream:
+            self.threads.append(threading.Thread(target=self.run_stream, daemon=True))
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def join(self, timeout):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+    def timed(self, conn, endpoint, method, path, body=None, headers=None):
+        """Issue one request, record it and return (connection, parsed JSON or None)"""
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            self.stats[endpoint].error()
+            conn.close()
+            return self.connect(), None
+        if response.status >= 400:
+            self.stats[endpoint].error()
+            return conn, None
+        self.stats[endpoint].add(time.perf_counter() - start)
+        try:
+            return conn, json.loads(payload)
+        except ValueError:
+            return conn, None
+
+    def think(self):
+        # Jitter so clients do not move in lockstep
+        self.stop.wait(self.think_time * self.rng.uniform(0.5, 1.5))
+
+    def run_actions(self):
+        conn = self.connect()
+        self.think()
+        while not self.stop.is_set():
+            conn, uploaded = self.timed(conn, 'upload', 'POST', '/api/upload/mobile',
+                                        self.upload_body, self.upload_headers)
+            filename = uploaded.get('filename') if uploaded else None
+            if filename and not self.stop.is_set():
+                conn, _ = self.timed(conn, 'ocr', 'POST', f'/api/ocr/{filename}')
+            if filename and not self.stop.is_set():
+                conn, _ = self.timed(conn, 'tts', 'POST', f'/api/tts/{filename}')
+            if not self.stop.is_set():
+                conn, _ = self.timed(conn, 'files', 'GET', '/api/files')
+            self.think()
+        conn.close()
+
+    def run_stream(self):
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+            conn.request('GET', '/api/stream')
+            response = conn.getresponse()
+            if response.status != 200:
+                self.stream_error = f'HTTP {response.status}'
+                return
+            frames = 0
+            counting_from = None
+            tail = b''
+            while not self.stop.is_set():
+                chunk = response.read1(65536)
+                if not chunk:
+                    self.stream_error = 'stream closed'
+                    break
+                data = tail + chunk
+                # A boundary inside the carried-over tail was counted last time
+                seen = data.count(b'--frame\r\n') - tail.count(b'--frame\r\n')
+                tail = data[-16:]
+                if seen:
+                    # Start the clock at the first frame so warm-up is not counted
+                    if counting_from is None:
+                        counting_from = time.perf_counter()
+                    else:
+                        frames += seen
+            conn.close()
+            if counting_from is not None:
+                self.stream_fps = frames / max(0.001, time.perf_counter() - counting_from)
+        except (OSError, http.client.HTTPException) as e:
+            self.stream_error = str(e) or type(e).__name__
+
+def run_step(host, port, clients, duration, upload, think_time, stream):
+    stats = {endpoint: EndpointStats() for endpoint in ENDPOINTS}
+    stop = threading.Event()
+    body, headers = upload
+    phones = [MobileClient(host, port, body, headers, stats, stop, think_time, stream, seed)
+              for seed in range(clients)]
+    started = time.perf_counter()
+    for phone in phones:
+        phone.start()
+    time.sleep(duration)
+    stop.set()
+    for phone in phones:
+        phone.join(timeout=60)
+    elapsed = time.perf_counter() - started
+
+    endpoints = {endpoint: stats[endpoint].summary(elapsed) for endpoint in ENDPOINTS}
+    requests = sum(summary['requests'] for summary in endpoints.values())
+    errors = sum(summary['errors'] for summary in endpoints.values())
+    step = {
+        'clients': clients,
+        'elapsed_s': round(elapsed, 2),
+        'requests_per_s': round(requests / elapsed, 2),
+        'error_rate': round(errors / (requests + errors), 4) if requests + errors else 0.0,
+        'endpoints': endpoints
+    }
+    if stream:
+        rates = [phone.stream_fps or 0.0 for phone in phones]
+        step['stream'] = {
+            'fps_per_client_mean': round(sum(rates) / clients, 2),
+            'fps_per_client_min': round(min(rates), 2),
+            'failed': sum(1 for phone in phones if phone.stream_error)
+        }
+    return step
+
+def saturation_reasons(step, baseline, previous, args):
+    reasons = []
+    if step['error_rate'] > args.error_limit:
+        reasons.append(f"error rate {step['error_rate']:.1%}")
+    for endpoint in ENDPOINTS:
+        p95 = step['endpoints'][endpoint]['latency_ms']['p95']
+        base = baseline['endpoints'][endpoint]['latency_ms']['p95']
+        if p95 and base and p95 > max(base * args.latency_factor, args.latency_floor):
+            reasons.append(f"{endpoint} p95 {p95:.0f} ms vs {base:.0f} ms at {baseline['clients']} clients")
+    if 'stream' in step:
+        fps = step['stream']['fps_per_client_mean']
+        if fps < args.min_fps:
+            reasons.append(f"stream {fps} fps per client")
+    if previous and previous['requests_per_s']:
+        client_growth = step['clients'] / previous['clients'] - 1
+        throughput_growth = step['requests_per_s'] / previous['requests_per_s'] - 1
+        if client_growth > 0 and throughput_growth < client_growth / 2:
+            reasons.append(f"throughput +{throughput_growth:.0%} for +{client_growth:.0%} clients")
+    return reasons
+
+def print_step(step):
+    stream = step.get('stream')
+    stream_note = f", stream {stream['fps_per_client_mean']} fps/client" if stream else ''
+    print(f"\n👥 {step['clients']} clients: {step['requests_per_s']} req/s, "
+          f"{step['error_rate']:.1%} errors{stream_note}")
+    print(f"  {'endpoint':<8} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for endpoint, summary in step['endpoints'].items():
+        latency = summary['latency_ms']
+        print(f"  {endpoint:<8} {summary['requests_per_s']:>7} {latency['p50'] or '-':>8} "
+              f"{latency['p95'] or '-':>8} {latency['p99'] or '-':>8} {summary['errors']:>7}")
+    if step.get('saturated'):
+        print(f"  🔥 Saturated: {'; '.join(step['saturated'])}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ramp simulated mobile clients until the server saturates')
+    parser.add_argument('--clients', default='1,2,4,8,16,32', help='Client counts to step through')
+    parser.add_argument('--step-duration', type=float, default=20.0, help='Seconds per step')
+    parser.add_argument('--think-time', type=float, default=1.0, help='Mean pause between a client\'s cycles')
+    parser.add_argument('--no-stream', action='store_true', help='Do not hold /api/stream open')
+    parser.add_argument('--page-image', default=os.path.join(ROOT, 'test_ocr_document.jpg'),
+                        help='JPEG the phones upload; also what the virtual camera shows')
+    parser.add_argument('--target', help='Base URL of a running server instead of starting the local stack')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi')
+    parser.add_argument('--threads', type=int, default=32, help='gunicorn threads for --server wsgi')
+    parser.add_argument('--vision-latency', default='lognormal:150:0.3')
+    parser.add_argument('--tts-latency', default='lognormal:200:0.3')
+    parser.add_argument('--error-limit', type=float, default=0.01)
+    parser.add_argument('--latency-factor', type=float, default=3.0)
+    parser.add_argument('--latency-floor', type=float, default=250.0, help='Milliseconds; see above')
+    parser.add_argument('--min-fps', type=float, default=5.0)
+    parser.add_argument('--keep-going', action='store_true', help='Run every step even after saturation')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    client_counts = [int(count) for count in args.clients.split(',')]
+    with open(args.page_image, 'rb') as f:
+        upload = multipart_image(f.read())
+    stream = not args.no_stream
+
+    workdir = None
+    server = fake_cloud = None
+    server_pid = None
+    try:
+        if args.target:
+            parts = urlsplit(args.target)
+            host, port = parts.hostname, parts.port or 80
+        else:
+            workdir = tempfile.mkdtemp(prefix='story-reader-load-')
+            cloud_port = free_port()
+            fake_cloud = start_fake_cloud(cloud_port, args.vision_latency, args.tts_latency)
+            host, port = '127.0.0.1', free_port()
+            print(f"🚀 Starting {args.server} server on port {port} with fake cloud on {cloud_port}")
+            server = start_app_server(port, workdir, local_stack_env(os.path.abspath(args.page_image), cloud_port),
+                                      args.server, args.threads)
+            server_pid = server_worker_pid(server)
+
+        if stream:
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            conn.request('POST', '/api/camera/start')
+            status = conn.getresponse().status
+            conn.close()
+            if status != 200:
+                print(f"⚠️ Camera did not start (HTTP {status}); stream figures will be zero")
+
+        steps = []
+        saturation = None
+        for clients in client_counts:
+            step = run_step(host, port, clients, args.step_duration, upload, args.think_time, stream)
+            if server_pid:
+                step['server_memory'] = process_memory(server_pid)
+            previous = steps[-1] if steps else None
+            step['saturated'] = saturation_reasons(step, steps[0] if steps else step, previous, args)
+            steps.append(step)
+            print_step(step)
+            if step['saturated'] and saturation is None:
+                saturation = clients
+                if not args.keep_going:
+                    break
+    finally:
+        stop_processes(server, fake_cloud)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    healthy = [step['clients'] for step in steps if not step['saturated'] and
+               (saturation is None or step['clients'] < saturation)]
+    results = {
+        'benchmark': 'mobile_load',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {key: value for key, value in vars(args).items() if key != 'json'},
+        'saturation_clients': saturation,
+        'max_healthy_clients': max(healthy) if healthy else None,
+        'steps': steps
+    }
+    print(f"\n📈 Max healthy clients: {results['max_healthy_clients']}, "
+          f"saturated at: {saturation if saturation is not None else 'not reached'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
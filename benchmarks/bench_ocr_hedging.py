@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+OCR tail-latency benchmark: hedged vs plain Vision calls
+
+Runs the same OCR workload with hedging off and on and reports p50/p95/p99
+latency, extra calls sent and hedge wins. By default the Vision backend is
+simulated in-process: most calls take around --base-ms, --slow-rate of
+them take --slow-ms, and --error-rate fail with UNAVAILABLE. With --live
+the real Vision API is called on the given image (billed).
+
+    python benchmarks/bench_ocr_hedging.py --requests 400 --concurrency 8 --json hedging.json
+    python benchmarks/bench_ocr_hedging.py --live images/20241201_143022_p001.jpg --requests 50
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.api_core import exceptions as google_exceptions
+
+import hedging
+from common import latency_summary
+
+class SimulatedVision:
+    """Heavy-tailed fake Vision backend that honours the gRPC timeout"""
+
+    def __init__(self, base_ms, jitter, slow_rate, slow_ms, error_rate, seed=0):
+        self.base = base_ms / 1000.0
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow = slow_ms / 1000.0
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+            latency = self.base * self._rng.lognormvariate(0, self.jitter)
+        if roll < self.error_rate:
+            return latency * 0.2, google_exceptions.ServiceUnavailable('simulated outage')
+        if roll < self.error_rate + self.slow_rate:
+            return self.slow, None
+        return latency, None
+
+    def text_detection(self, timeout):
+        latency, error = self._draw()
+        if latency > timeout:
+            time.sleep(timeout)
+            raise google_exceptions.DeadlineExceeded('simulated deadline')
+        time.sleep(latency)
+        if error:
+            raise error
+        return 'text'
+
+def live_backend(image_path):
+    """Call the real Vision API through the app's shared client"""
+    import app
+    from google.cloud import vision
+
+    with open(image_path, 'rb') as f:
+        image = vision.Image(content=f.read())
+
+    class LiveVision:
+        calls = 0
+
+        def text_detection(self, timeout):
+            LiveVision.calls += 1
+            return app.get_vision_client().text_detection(image=image, timeout=timeout)
+
+    return LiveVision()
+
+def run(backend, enabled, args):
+    policy = hedging.HedgePolicy('bench', enabled=enabled, percentile=args.percentile,
+                                 budget_ratio=args.budget, max_retries=args.retries)
+    # Seed the latency tracker so the hedge delay starts at the percentile
+    # rather than the cold-start default
+    for _ in range(policy.min_samples):
+        policy.latencies.add(backend.base * random.lognormvariate(0, backend.jitter)
+                             if isinstance(backend, SimulatedVision) else 1.0)
+
+    calls_before = backend.calls
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def one_request(_):
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            policy.call(backend.text_detection, args.deadline)
+            ok = True
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            failures += 0 if ok else 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    snapshot = policy.snapshot()
+    backend_calls = backend.calls - calls_before
+    return {
+        'hedging': enabled,
+        'requests': args.requests,
+        'failures': failures,
+        'elapsed_s': round(elapsed, 2),
+        'latency_ms': latency_summary(latencies),
+        'backend_calls': backend_calls,
+        'extra_call_ratio': round(backend_calls / args.requests - 1, 3),
+        'hedges_sent': snapshot['hedges_sent'],
+        'hedge_wins': snapshot['hedge_wins'],
+        'hedges_denied': snapshot['hedges_denied'],
+        'retries': snapshot['retries'],
+        'deadline_exceeded': snapshot['deadline_exceeded'],
+        'final_hedge_delay_ms': round(snapshot['hedge_delay_seconds'] * 1000, 1)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare OCR latency with hedging on and off')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--deadline', type=float, default=10.0, help='Per-request deadline in seconds')
+    parser.add_argument('--percentile', type=float, default=95, help='Hedge after this latency percentile')
+    parser.add_argument('--budget', type=float, default=0.1, help='Max hedges as a fraction of calls')
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--base-ms', type=float, default=100.0, help='Typical simulated call latency')
+    parser.add_argument('--jitter', type=float, default=0.25, help='Lognormal sigma of normal calls')
+    parser.add_argument('--slow-rate', type=float, default=0.03, help='Fraction of pathologically slow calls')
+    parser.add_argument('--slow-ms', type=float, default=1000.0, help='Latency of a slow call')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='Fraction of UNAVAILABLE errors')
+    parser.add_argument('--live', metavar='IMAGE', help='Call the real Vision API on this image instead')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'ocr_hedging',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'backend': 'live' if args.live else 'simulated',
+        'settings': {key: value for key, value in vars(args).items() if key != 'json'},
+        'runs': []
+    }
+
+    print(f"{'hedging':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+          f"{'extra':>7} {'hedges':>7} {'wins':>6} {'retries':>8} {'failed':>7}")
+    for enabled in (False, True):
+        if args.live:
+            backend = live_backend(args.live)
+        else:
+            backend = SimulatedVision(args.base_ms, args.jitter, args.slow_rate, args.slow_ms, args.error_rate)
+        result = run(backend, enabled, args)
+        results['runs'].append(result)
+        latency = result['latency_ms']
+        print(f"{'on' if enabled else 'off':>8} {latency['p50']!s:>9} {latency['p95']!s:>9} "
+              f"{latency['p99']!s:>9} {latency['max']!s:>9} {result['extra_call_ratio']:>7} "
+              f"{result['hedges_sent']:>7} {result['hedge_wins']:>6} {result['retries']:>8} {result['failures']:>7}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
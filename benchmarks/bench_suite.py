@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite: capture, streaming, file listing, OCR/TTS, memory
+
+Runs every measurement against a synthetic camera (virtual_camera.py) and
+the local Vision/TTS stand-ins (fake_cloud_server.py), so it needs no
+webcam, credentials or network and gives comparable numbers run to run.
+Everything happens in throwaway working directories.
+
+    in-process (Flask app imported here)
+        capture   capture_image() latency, debounce disabled
+        files     GET /api/files latency at each --library-sizes page count
+        logging   caller-side cost of a log call vs print() on a slow terminal
+
+    in fresh interpreters, with lazy imports and with LAZY_IMPORTS=0
+        startup   python -X importtime for `import app`, then time from launching
+                  the server to its first response and to a first OCR answer
+
+    over HTTP (app started under gunicorn, or uvicorn with --server asgi)
+        stream    frames/s each client gets from /api/stream per client count
+        ocr, tts  POST /api/ocr|tts/<page> throughput at each --cloud-levels
+
+    memory        peak/current RSS of this process and the server after each phase
+
+    python benchmarks/bench_suite.py --json baseline.json
+    python benchmarks/bench_suite.py --quick --only capture,files --json quick.json
+    python benchmarks/bench_suite.py --json after.json --compare baseline.json
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import (ROOT, app_server_command, free_port, http_request, latency_summary, local_stack_env,
+                    process_memory, run_http_load, server_worker_pid, start_app_server, start_fake_cloud,
+                    stop_processes)
+
+sys.path.insert(0, ROOT)
+
+PHASES = ('startup', 'capture', 'files', 'logging', 'stream', 'ocr', 'tts')
+
+# Helpers ------------------------------------------------------------------
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def populate_library(images_dir, text_dir, page_image, start, count):
+    """Add pages start..count-1, hard-linked to one image so 100k pages cost no disk"""
+    for index in range(start, count):
+        filename = f"20240101_{index // 1000:06d}_p{index % 1000 + 1:03d}.jpg"
+        target = os.path.join(images_dir, filename)
+        try:
+            os.link(page_image, target)
+        except OSError:
+            shutil.copyfile(page_image, target)
+        # Every other page has been OCR'd
+        if index % 2 == 0:
+            with open(os.path.join(text_dir, filename.replace('.jpg', '.txt')), 'w') as f:
+                f.write('page text')
+
+# In-process phases --------------------------------------------------------
+
+class SlowSink(io.StringIO):
+    """Stand-in for a terminal or journald that takes `delay` seconds per write"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return len(text)
+
+def bench_logging(calls, sink_delay):
+    """Microseconds per call as seen by the calling thread, and the listener's drain time"""
+    import logging
+    import logging.handlers
+    import queue
+
+    import logging_setup
+
+    def per_call(function):
+        start = time.perf_counter()
+        for index in range(calls):
+            function(index)
+        return round((time.perf_counter() - start) / calls * 1e6, 3)
+
+    results = {'calls': calls, 'sink_delay_ms': sink_delay * 1000}
+    sink = SlowSink(sink_delay)
+    results['print_us'] = per_call(lambda index: print('📸 Image captured:', index, file=sink))
+
+    for fmt in ('text', 'json'):
+        log_queue = queue.Queue(maxsize=calls * 2)
+        handler = logging.StreamHandler(SlowSink(sink_delay))
+        handler.setFormatter(logging_setup.JsonFormatter() if fmt == 'json' else
+                             logging.Formatter(logging_setup.TEXT_FORMAT))
+        listener = logging.handlers.QueueListener(log_queue, handler)
+        logger = logging.getLogger(f'bench.logging.{fmt}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(logging_setup.NonBlockingQueueHandler(log_queue))
+        listener.start()
+        results[f'info_{fmt}_us'] = per_call(lambda index: logger.info('📸 Image captured: %s', index))
+        drain_start = time.perf_counter()
+        listener.stop()
+        results[f'info_{fmt}_drain_s'] = round(time.perf_counter() - drain_start, 3)
+        if fmt == 'text':
+            results['debug_disabled_us'] = per_call(lambda index: logger.debug('🔍 Image brightness = %.1f', 0.5))
+
+    limited = logging.getLogger('bench.logging.limited')
+    limited.propagate = False
+    limited.addHandler(logging.NullHandler())
+    limited.addFilter(logging_setup.RateLimitFilter(burst=5, interval=10.0))
+    results['rate_limited_us'] = per_call(lambda index: limited.warning('⚠️ Frame capture failed (error %d/%d)', 1, 10))
+    return results
+
+def bench_capture(app, captures):
+    app.DEBOUNCE_DELAY = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not app.start_camera():
+            return {'error': 'virtual camera failed to start'}
+        latencies = []
+        failures = 0
+        stages = ('quality_check', 'crop', 'dedupe')
+        before = {stage: app.CAPTURE_STAGE_SECONDS.summary(digits=6, stage=stage) for stage in stages}
+        started = time.perf_counter()
+        for _ in range(captures):
+            start = time.perf_counter()
+            filename, _message = app.capture_image()
+            latencies.append(time.perf_counter() - start)
+            failures += 0 if filename else 1
+        elapsed = time.perf_counter() - started
+        after = {stage: app.CAPTURE_STAGE_SECONDS.summary(digits=6, stage=stage) for stage in stages}
+        app.stop_camera()
+    results = {
+        'captures': captures,
+        'failures': failures,
+        'captures_per_second': round(captures / elapsed, 2),
+        'latency_ms': latency_summary(latencies),
+        'quality_gate': app.QUALITY_GATE,
+        'page_crop': app.PAGE_CROP
+    }
+    for stage in stages:
+        runs = after[stage]['count'] - before[stage]['count']
+        results[f'{stage}_mean_ms'] = round((after[stage]['sum'] - before[stage]['sum']) / runs * 1000, 3) if runs else None
+    return results
+
+def bench_files(app, page_image, sizes, repeats):
+    client = app.app.test_client()
+    results = []
+    existing = 0
+    for size in sizes:
+        populate_started = time.perf_counter()
+        populate_library(app.UPLOAD_FOLDER, app.TEXT_FOLDER, page_image, existing, size)
+        existing = size
+        populate_seconds = time.perf_counter() - populate_started
+
+        latencies = []
+        payload = 0
+        for _ in range(repeats if size < 100000 else max(1, repeats // 3)):
+            start = time.perf_counter()
+            response = client.get('/api/files')
+            body = response.get_data()
+            latencies.append(time.perf_counter() - start)
+            payload = len(body)
+        results.append({
+            'pages': size,
+            'requests': len(latencies),
+            'response_bytes': payload,
+            'latency_ms': latency_summary(latencies),
+            'populate_s': round(populate_seconds, 2),
+            'memory': process_memory()
+        })
+        print(f"  /api/files {size:>7} pages: p50 {results[-1]['latency_ms']['p50']} ms")
+    return results
+
+# Startup phase ------------------------------------------------------------
+
+def import_profile(workdir, env, top):
+    """Total `import app` time from -X importtime and the slowest imports it pulls in directly"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=workdir,
+                               env=dict(env, PYTHONPATH=ROOT), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               text=True)
+    if completed.returncode != 0:
+        return {'import_app_ms': None, 'error': completed.stderr.strip().splitlines()[-1]}
+    # Children are printed before their parent, indented two spaces per level
+    modules = []
+    children = []
+    total_us = None
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative_us), name.strip()))
+        elif depth == 0:
+            if name.strip() == 'app':
+                total_us = int(cumulative_us)
+                modules = sorted(children, reverse=True)
+            children = []
+    return {
+        'import_app_ms': round(total_us / 1000, 1) if total_us is not None else None,
+        'slowest_imports_ms': {name: round(us / 1000, 1) for us, name in modules[:top]}
+    }
+
+def launch_to_first_response(workdir, env, server, threads, page):
+    """Seconds from spawning the server to its first answer, then the first OCR request's latency"""
+    port = free_port()
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    started = time.perf_counter()
+    process = subprocess.Popen(app_server_command(port, server, threads), cwd=workdir, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    try:
+        first_response = None
+        while first_response is None and time.perf_counter() - started < 60:
+            try:
+                status, _ = http_request(port, 'GET', '/api/files', timeout=10)
+                if status == 200:
+                    first_response = time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        if first_response is None:
+            return {'error': f'server did not answer, see {workdir}/server.log'}
+        # Straight away, before a background preload could have finished
+        ocr_started = time.perf_counter()
+        ocr_status, _ = http_request(port, 'POST', f'/api/ocr/{page}')
+        first_ocr = time.perf_counter() - ocr_started
+        _, body = http_request(port, 'GET', '/api/startup')
+        return {
+            'first_response_s': round(first_response, 3),
+            'first_ocr_ms': round(first_ocr * 1000, 1),
+            'first_ocr_status': ocr_status,
+            'server_milestones_s': json.loads(body).get('milestones')
+        }
+    finally:
+        stop_processes(process)
+        log.close()
+
+def bench_startup(workdir, env, page_image, server, threads, runs, top):
+    results = {}
+    page = '20240101_120000_p001.jpg'
+    for mode, lazy in (('lazy', '1'), ('eager', '0')):
+        mode_dir = os.path.join(workdir, f'startup_{mode}')
+        os.makedirs(os.path.join(mode_dir, 'images'))
+        shutil.copyfile(page_image, os.path.join(mode_dir, 'images', page))
+        mode_env = dict(env, LAZY_IMPORTS=lazy, LOG_LEVEL='WARNING')
+        result = import_profile(mode_dir, mode_env, top)
+        launches = [launch_to_first_response(mode_dir, mode_env, server, threads, page) for _ in range(runs)]
+        errors = [launch['error'] for launch in launches if 'error' in launch]
+        if errors:
+            result['error'] = errors[0]
+        else:
+            # The median launch, by time to first response
+            result.update(sorted(launches, key=lambda launch: launch['first_response_s'])[len(launches) // 2])
+        results[mode] = result
+        print(f"  {mode:>5}: import app {result['import_app_ms']} ms, first response "
+              f"{result.get('first_response_s')} s, first OCR {result.get('first_ocr_ms')} ms")
+    return results
+
+# HTTP phases --------------------------------------------------------------
+
+def bench_stream(port, client_counts, duration):
+    status, _ = http_request(port, 'POST', '/api/camera/start')
+    if status != 200:
+        return {'error': f'camera start returned {status}'}
+
+    results = []
+    for clients in client_counts:
+        frames = [0] * clients
+        stop_at = time.time() + duration + 1.5  # the stream warms up for about a second
+
+        def reader(slot):
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            conn.request('GET', '/api/stream')
+            response = conn.getresponse()
+            counting_from = None
+            tail = b''
+            while time.time() < stop_at:
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                data = tail + chunk
+                # A boundary inside the carried-over tail was counted last time
+                seen = data.count(b'--frame\r\n') - tail.count(b'--frame\r\n')
+                tail = data[-16:]
+                if seen:
+                    if counting_from is None:
+                        counting_from = time.time()
+                    else:
+                        frames[slot] += seen
+            conn.close()
+            if counting_from:
+                frames[slot] = frames[slot] / max(0.001, time.time() - counting_from)
+
+        threads = [threading.Thread(target=reader, args=(slot,)) for slot in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        per_client = sorted(frames)
+        results.append({
+            'clients': clients,
+            'fps_per_client_mean': round(sum(per_client) / clients, 2),
+            'fps_per_client_min': round(per_client[0], 2),
+            'fps_total': round(sum(per_client), 2)
+        })
+        print(f"  stream {clients:>3} clients: {results[-1]['fps_per_client_mean']} fps each")
+
+    http_request(port, 'POST', '/api/camera/stop')
+    return results
+
+def bench_cloud(port, kind, page, levels, duration, server_pid):
+    path = f'/api/{kind}/{page}'
+    results = []
+    for level in levels:
+        result = run_http_load(f'http://127.0.0.1:{port}', [path], level, duration, method='POST')
+        result['concurrency'] = level
+        result['server_memory'] = process_memory(server_pid)
+        results.append(result)
+        print(f"  {kind} {level:>4} clients: {result['requests_per_s']} req/s, {result['errors']} errors, "
+              f"p50 {result['latency_ms']['p50']} ms")
+    return results
+
+# Orchestration ------------------------------------------------------------
+
+
+def flatten(data, prefix=''):
+    """Numeric leaves of a result tree as {'a.b.c': value}, list items keyed by their first field"""
+    values = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            values.update(flatten(value, f'{prefix}{key}.'))
+    elif isinstance(data, list):
+        for index, item in enumerate(data):
+            label = index
+            if isinstance(item, dict):
+                for key in ('pages', 'clients', 'concurrency'):
+                    if key in item:
+                        label = f'{key}={item[key]}'
+                        break
+            values.update(flatten(item, f'{prefix}{label}.'))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        values[prefix.rstrip('.')] = data
+    return values
+
+def compare(old, new, threshold):
+    """Print metrics that moved by more than `threshold` (a fraction)"""
+    before = flatten(old['results'])
+    after = flatten(new['results'])
+    print(f"\n📊 Changes over {threshold:.0%} against {old.get('git_revision')} ({old.get('timestamp')})")
+    changed = 0
+    for key in sorted(before.keys() & after.keys()):
+        if before[key] and abs(after[key] - before[key]) / abs(before[key]) > threshold:
+            changed += 1
+            print(f"  {key:<60} {before[key]:>12} -> {after[key]:<12} ({(after[key] - before[key]) / abs(before[key]):+.0%})")
+    if not changed:
+        print("  none")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the end-to-end benchmark suite')
+    parser.add_argument('--only', help=f"Comma separated phases out of {','.join(PHASES)}")
+    parser.add_argument('--quick', action='store_true', help='Smaller libraries and shorter runs')
+    parser.add_argument('--page-image', default=os.path.join(ROOT, 'test_ocr_document.jpg'),
+                        help='Page the virtual camera shows and OCR/TTS run on')
+    parser.add_argument('--captures', type=int, default=100)
+    parser.add_argument('--log-calls', type=int, default=2000)
+    parser.add_argument('--log-sink-delay', type=float, default=0.2, help='Milliseconds per write to the slow sink')
+    parser.add_argument('--startup-runs', type=int, default=3, help='Server launches per import mode')
+    parser.add_argument('--startup-top', type=int, default=10, help='Slowest imports to list')
+    parser.add_argument('--library-sizes', default='1000,10000,100000')
+    parser.add_argument('--file-repeats', type=int, default=10)
+    parser.add_argument('--stream-clients', default='1,2,4,8')
+    parser.add_argument('--cloud-levels', default='1,8,32')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per stream/cloud level')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi')
+    parser.add_argument('--threads', type=int, default=32, help='gunicorn threads for --server wsgi')
+    parser.add_argument('--vision-latency', default='lognormal:150:0.3')
+    parser.add_argument('--tts-latency', default='lognormal:200:0.3')
+    parser.add_argument('--keep', action='store_true', help='Keep the working directories')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--compare', help='Earlier results file to diff against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change reported by --compare')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        # Only shrink what was not set explicitly
+        quick = {'captures': 30, 'startup_runs': 1, 'library_sizes': '1000,10000', 'stream_clients': '1,4',
+                 'cloud_levels': '1,8', 'duration': 3.0}
+        for key, value in quick.items():
+            if getattr(args, key) == parser.get_default(key):
+                setattr(args, key, value)
+    phases = [phase.strip() for phase in args.only.split(',')] if args.only else list(PHASES)
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        parser.error(f"Unknown phases: {', '.join(sorted(unknown))}")
+
+    page_image = os.path.abspath(args.page_image)
+    workdir = tempfile.mkdtemp(prefix='story-reader-bench-')
+    cloud_port = free_port()
+    env = local_stack_env(page_image, cloud_port)
+
+    results = {
+        'benchmark': 'suite',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': git_revision(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'settings': {key: value for key, value in vars(args).items() if key not in ('json', 'compare')},
+        'results': {'memory': {}}
+    }
+
+    fake_cloud = start_fake_cloud(cloud_port, args.vision_latency, args.tts_latency)
+    server = None
+    try:
+        if 'startup' in phases:
+            # Before anything is imported here; each measurement is a fresh interpreter anyway
+            print(f"⏱️  Startup time ({args.server})")
+            results['results']['startup'] = bench_startup(workdir, env, page_image, args.server, args.threads,
+                                                          args.startup_runs, args.startup_top)
+
+        # In-process phases share this process's working directory and env
+        if {'capture', 'files'} & set(phases):
+            inprocess_dir = os.path.join(workdir, 'inprocess')
+            os.makedirs(inprocess_dir)
+            os.chdir(inprocess_dir)
+            os.environ.update(env, LOG_LEVEL='WARNING')
+            with contextlib.redirect_stdout(io.StringIO()):
+                import app
+            app.app.root_path = ROOT
+            results['results']['memory']['after_import'] = process_memory()
+
+            if 'capture' in phases:
+                print("📷 Capture latency")
+                results['results']['capture'] = bench_capture(app, args.captures)
+                results['results']['memory']['after_capture'] = process_memory()
+                print(f"  p50 {results['results']['capture']['latency_ms']['p50']} ms")
+            if 'files' in phases:
+                print("📁 /api/files against library size")
+                sizes = [int(size) for size in args.library_sizes.split(',')]
+                results['results']['files'] = bench_files(app, page_image, sizes, args.file_repeats)
+                results['results']['memory']['after_files'] = process_memory()
+            os.chdir(ROOT)
+
+        if 'logging' in phases:
+            print("📝 Logging overhead")
+            results['results']['logging'] = bench_logging(args.log_calls, args.log_sink_delay / 1000.0)
+            logging_results = results['results']['logging']
+            print(f"  print {logging_results['print_us']} µs, queued info {logging_results['info_text_us']} µs "
+                  f"(json {logging_results['info_json_us']} µs), disabled debug {logging_results['debug_disabled_us']} µs")
+
+        if {'stream', 'ocr', 'tts'} & set(phases):
+            server_dir = os.path.join(workdir, 'server')
+            os.makedirs(os.path.join(server_dir, 'images'))
+            page = '20240101_120000_p001.jpg'
+            shutil.copyfile(page_image, os.path.join(server_dir, 'images', page))
+
+            port = free_port()
+            print(f"🚀 Starting {args.server} server on port {port}")
+            server = start_app_server(port, server_dir, env, args.server, args.threads)
+            server_pid = server_worker_pid(server)
+            results['results']['memory']['server_idle'] = process_memory(server_pid)
+
+            if 'stream' in phases:
+                print("🎥 Stream FPS per client count")
+                clients = [int(count) for count in args.stream_clients.split(',')]
+                results['results']['stream'] = bench_stream(port, clients, args.duration)
+                results['results']['memory']['server_after_stream'] = process_memory(server_pid)
+            for kind in ('ocr', 'tts'):
+                if kind in phases:
+                    print(f"☁️  {kind.upper()} throughput")
+                    levels = [int(level) for level in args.cloud_levels.split(',')]
+                    results['results'][kind] = bench_cloud(port, kind, page, levels, args.duration, server_pid)
+                    results['results']['memory'][f'server_after_{kind}'] = process_memory(server_pid)
+    finally:
+        stop_processes(server, fake_cloud)
+        if args.keep:
+            print(f"📂 Working directories kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results['results']['memory']['benchmark_process'] = process_memory()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results, args.threshold)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
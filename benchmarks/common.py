@@ -0,0 +1,201 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import http.client
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def latency_summary(latencies):
+    """p50/p95/p99/max in milliseconds for a list of durations in seconds"""
+    values = sorted(latencies)
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+    return {
+        'p50': round(percentile(values, 50) * 1000, 2),
+        'p95': round(percentile(values, 95) * 1000, 2),
+        'p99': round(percentile(values, 99) * 1000, 2),
+        'max': round(values[-1] * 1000, 2)
+    }
+
+def run_http_load(base_url, paths, concurrency, duration, method='GET', body=None, headers=None):
+    """Hammer a server with keep-alive connections for a fixed time.
+
+    Each of `concurrency` threads picks random paths and issues requests
+    back to back; returns throughput and latency percentiles.
+    """
+    parts = urlsplit(base_url)
+    latencies = []
+    counters = {'requests': 0, 'bytes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def connect():
+        return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        conn = connect()
+        local_latencies = []
+        local_bytes = 0
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths)
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                payload = response.read()
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = connect()
+                continue
+            if response.status >= 400:
+                local_errors += 1
+                continue
+            local_latencies.append(time.perf_counter() - start)
+            local_bytes += len(payload)
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            counters['requests'] += len(local_latencies)
+            counters['bytes'] += local_bytes
+            counters['errors'] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': counters['requests'],
+        'errors': counters['errors'],
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(counters['requests'] / elapsed, 1),
+        'mb_per_s': round(counters['bytes'] / elapsed / 1e6, 2),
+        'latency_ms': latency_summary(latencies)
+    }
+
+# Local stack: the app against the virtual camera and fake cloud services ----
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def http_request(port, method, path, body=None, headers=None, timeout=60):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+def process_memory(pid='self'):
+    """Current and peak RSS in MB from /proc (Linux), else peak from getrusage"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return {
+            'rss_mb': round(int(fields['VmRSS'].split()[0]) / 1024, 1),
+            'peak_rss_mb': round(int(fields['VmHWM'].split()[0]) / 1024, 1)
+        }
+    except (OSError, KeyError):
+        if pid != 'self':
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+        return {'rss_mb': None, 'peak_rss_mb': round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)}
+
+def local_stack_env(page_image, cloud_port):
+    """Environment that points the app at the virtual camera and the fake cloud server"""
+    env = dict(os.environ,
+               CAMERA_SOURCE=page_image,
+               VISION_API_ENDPOINT=f'127.0.0.1:{cloud_port}',
+               TTS_API_ENDPOINT=f'127.0.0.1:{cloud_port}',
+               CLOUD_API_INSECURE='1',
+               # Measure the cloud path, not whichever local engines are installed
+               TESSERACT_ENABLED='0',
+               LOCAL_TTS_ENABLED='0')
+    env.pop('CAMERA_SERVICE_ADDRESS', None)
+    return env
+
+def start_fake_cloud(port, vision_latency, tts_latency, extra_args=()):
+    command = [sys.executable, os.path.join(BENCH_DIR, 'fake_cloud_server.py'), '--port', str(port),
+               '--vision-latency', vision_latency, '--tts-latency', tts_latency, '--seed', '1', *extra_args]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_for_port(port):
+        process.kill()
+        raise RuntimeError('fake cloud server did not start')
+    return process
+
+def app_server_command(port, server='wsgi', threads=32):
+    if server == 'asgi':
+        return [sys.executable, '-m', 'uvicorn', 'asgi_app:application', '--app-dir', ROOT,
+                '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning']
+    # Not gunicorn.conf.py: that expects a separate camera owner process
+    return [sys.executable, '-m', 'gunicorn', '--pythonpath', ROOT, '--bind', f'127.0.0.1:{port}',
+            '--workers', '1', '--worker-class', 'gthread', '--threads', str(threads),
+            '--timeout', '120', 'wsgi:app']
+
+def start_app_server(port, workdir, env, server='wsgi', threads=32):
+    """Serve the app from `workdir` under gunicorn (wsgi) or uvicorn (asgi)"""
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen(app_server_command(port, server, threads), cwd=workdir, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    if not wait_for_port(port, timeout=60):
+        process.kill()
+        raise RuntimeError(f'app server did not start, see {workdir}/server.log')
+    # gunicorn binds before its worker has imported the app
+    http_request(port, 'GET', '/api/files')
+    return process
+
+def server_worker_pid(process):
+    """gunicorn serves from a forked worker; measure that rather than the arbiter"""
+    try:
+        with open(f'/proc/{process.pid}/task/{process.pid}/children') as f:
+            children = f.read().split()
+        return int(children[0]) if children else process.pid
+    except OSError:
+        return process.pid
+
+def stop_processes(*processes):
+    for process in processes:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
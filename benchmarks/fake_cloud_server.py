@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the Google Cloud Vision and Text-to-Speech APIs
+
+Serves the ImageAnnotator and TextToSpeech gRPC services on one plaintext
+port, so the capture -> OCR -> TTS pipeline can be load-tested without
+credentials or quota. Every response is canned; latency is drawn from a
+configurable distribution and a fraction of calls fail with a gRPC status.
+Calls honour the client's deadline like the real services.
+
+    python benchmarks/fake_cloud_server.py --port 50051 \\
+        --vision-latency lognormal:150:0.3 --vision-error-rate 0.02 \\
+        --tts-latency bimodal:200:0.05:2000
+    VISION_API_ENDPOINT=127.0.0.1:50051 TTS_API_ENDPOINT=127.0.0.1:50051 CLOUD_API_INSECURE=1 python app.py
+
+Latency specs (milliseconds):
+
+    fixed:MS                       always MS
+    uniform:LOW:HIGH               uniform between LOW and HIGH
+    lognormal:MEDIAN:SIGMA         heavy-tailed around MEDIAN
+    bimodal:MS:SLOW_RATE:SLOW_MS   mostly MS, SLOW_RATE of calls take SLOW_MS
+
+TTS latency grows with the text by --tts-ms-per-char.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import signal
+import sys
+
+import grpc
+from google.cloud import texttospeech, vision
+
+VISION_SERVICE = 'google.cloud.vision.v1.ImageAnnotator'
+TTS_SERVICE = 'google.cloud.texttospeech.v1.TextToSpeech'
+
+DEFAULT_TEXT = """CHAPTER ONE
+
+The house stood at the end of a long lane, half hidden by the old oak
+trees that lined the drive. Nobody had lived there for years, or so the
+villagers said, but on some nights a light could be seen in the window
+at the top of the tower.
+
+Anna had heard the stories all her life."""
+
+# One silent MPEG-1 Layer III frame: 128 kbit/s, 44.1 kHz, 26 ms of audio
+SILENT_MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+SPOKEN_CHARS_PER_SECOND = 15
+
+class LatencyModel:
+    """Latency distribution parsed from a spec such as 'lognormal:150:0.3'"""
+
+    def __init__(self, spec, seed=None):
+        self.spec = spec
+        kind, *params = spec.split(':')
+        self.kind = kind
+        self.params = [float(value) for value in params]
+        expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2, 'bimodal': 3}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Bad latency spec '{spec}'")
+        self._rng = random.Random(seed)
+
+    def sample(self):
+        """One latency in seconds"""
+        if self.kind == 'fixed':
+            ms = self.params[0]
+        elif self.kind == 'uniform':
+            ms = self._rng.uniform(*self.params)
+        elif self.kind == 'lognormal':
+            median, sigma = self.params
+            ms = median * self._rng.lognormvariate(0, sigma)
+        else:
+            ms, slow_rate, slow_ms = self.params
+            if self._rng.random() < slow_rate:
+                ms = slow_ms
+        return ms / 1000.0
+
+class FakeService:
+    """Latency, error injection and counters shared by both fake APIs"""
+
+    def __init__(self, name, latency, error_rate, error_code, seed=None):
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self._rng = random.Random(seed)
+        self.stats = {'calls': 0, 'errors_injected': 0, 'deadline_exceeded': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    async def respond(self, context, extra_latency=0.0):
+        """Wait out the simulated latency, or abort like the real service would"""
+        self.stats['calls'] += 1
+        self.stats['in_flight'] += 1
+        self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+        try:
+            latency = self.latency.sample() + extra_latency
+            failing = self._rng.random() < self.error_rate
+            if failing:
+                # Errors come back faster than answers
+                latency *= 0.2
+
+            remaining = context.time_remaining()
+            if remaining is not None and latency > remaining:
+                await asyncio.sleep(max(0.0, remaining))
+                self.stats['deadline_exceeded'] += 1
+                await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, 'Deadline exceeded')
+
+            await asyncio.sleep(latency)
+            if failing:
+                self.stats['errors_injected'] += 1
+                await context.abort(self.error_code, f'Injected {self.error_code.name} from fake {self.name}')
+        finally:
+            self.stats['in_flight'] -= 1
+
+def vision_handler(service, text):
+    annotation = vision.AnnotateImageResponse(
+        text_annotations=[vision.EntityAnnotation(description=text, locale='en')],
+        full_text_annotation=vision.TextAnnotation(text=text)
+    )
+
+    async def batch_annotate_images(request, context):
+        await service.respond(context)
+        return vision.BatchAnnotateImagesResponse(responses=[annotation for _ in request.requests])
+
+    return grpc.method_handlers_generic_handler(VISION_SERVICE, {
+        'BatchAnnotateImages': grpc.unary_unary_rpc_method_handler(
+            batch_annotate_images,
+            request_deserializer=vision.BatchAnnotateImagesRequest.deserialize,
+            response_serializer=vision.BatchAnnotateImagesResponse.serialize
+        )
+    })
+
+def tts_handler(service, audio, ms_per_char):
+    async def synthesize_speech(request, context):
+        text = request.input.text or request.input.ssml
+        await service.respond(context, extra_latency=len(text) * ms_per_char / 1000.0)
+        if audio is not None:
+            content = audio
+        else:
+            # Roughly as long as the text would take to read aloud
+            frames = max(1, int(len(text) / SPOKEN_CHARS_PER_SECOND / 0.026))
+            content = SILENT_MP3_FRAME * frames
+        return texttospeech.SynthesizeSpeechResponse(audio_content=content)
+
+    return grpc.method_handlers_generic_handler(TTS_SERVICE, {
+        'SynthesizeSpeech': grpc.unary_unary_rpc_method_handler(
+            synthesize_speech,
+            request_deserializer=texttospeech.SynthesizeSpeechRequest.deserialize,
+            response_serializer=texttospeech.SynthesizeSpeechResponse.serialize
+        )
+    })
+
+async def report(services, interval):
+    while True:
+        await asyncio.sleep(interval)
+        print(json.dumps({service.name: service.stats for service in services}), flush=True)
+
+async def serve(args):
+    error_code = grpc.StatusCode[args.error_code]
+    vision_service = FakeService('vision', LatencyModel(args.vision_latency, args.seed),
+                                 args.vision_error_rate, error_code, args.seed)
+    tts_service = FakeService('tts', LatencyModel(args.tts_latency, args.seed),
+                              args.tts_error_rate, error_code, args.seed)
+
+    text = DEFAULT_TEXT
+    if args.vision_text:
+        with open(args.vision_text, 'r', encoding='utf-8') as f:
+            text = f.read()
+    audio = None
+    if args.tts_audio:
+        with open(args.tts_audio, 'rb') as f:
+            audio = f.read()
+
+    server = grpc.aio.server(options=[('grpc.max_receive_message_length', 32 * 1024 * 1024),
+                                      ('grpc.max_send_message_length', 32 * 1024 * 1024)])
+    server.add_generic_rpc_handlers((vision_handler(vision_service, text),
+                                     tts_handler(tts_service, audio, args.tts_ms_per_char)))
+    server.add_insecure_port(f'{args.host}:{args.port}')
+    await server.start()
+    print(f"🧪 Fake Vision + TTS listening on {args.host}:{args.port} "
+          f"(vision {args.vision_latency}, {args.vision_error_rate:.0%} errors; "
+          f"tts {args.tts_latency} + {args.tts_ms_per_char} ms/char, {args.tts_error_rate:.0%} errors)", flush=True)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    reporter = asyncio.ensure_future(report((vision_service, tts_service), args.report)) if args.report else None
+
+    await stop.wait()
+    if reporter:
+        reporter.cancel()
+    await server.stop(grace=1)
+    print(json.dumps({'vision': vision_service.stats, 'tts': tts_service.stats}))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fake Google Cloud Vision and TTS gRPC servers')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=50051)
+    parser.add_argument('--vision-latency', default='lognormal:150:0.3', help='Latency spec for Vision calls')
+    parser.add_argument('--vision-error-rate', type=float, default=0.0)
+    parser.add_argument('--vision-text', help='File with the text every OCR call returns')
+    parser.add_argument('--tts-latency', default='lognormal:200:0.3', help='Latency spec for TTS calls')
+    parser.add_argument('--tts-ms-per-char', type=float, default=0.2, help='Extra TTS latency per character')
+    parser.add_argument('--tts-error-rate', type=float, default=0.0)
+    parser.add_argument('--tts-audio', help='MP3 file every TTS call returns (default: silence)')
+    parser.add_argument('--error-code', default='UNAVAILABLE', choices=[code.name for code in grpc.StatusCode],
+                        help='gRPC status of injected errors')
+    parser.add_argument('--report', type=float, default=0, help='Print counters every N seconds')
+    parser.add_argument('--seed', type=int, help='Seed for repeatable latency and errors')
+    args = parser.parse_args(argv)
+
+    for spec in (args.vision_latency, args.tts_latency):
+        try:
+            LatencyModel(spec)
+        except ValueError as e:
+            parser.error(str(e))
+
+    asyncio.run(serve(args))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an OpenTelemetry collector's OTLP/HTTP JSON receiver
+
+Accepts POST /v1/traces as the app sends them with TRACE_EXPORT=otlp, keeps
+counters and optionally appends every span to a JSON-lines file, so trace
+export can be checked and load-tested without running a real collector.
+GET /stats reports what arrived, including the slowest root spans.
+
+    python benchmarks/fake_otlp_collector.py --port 4318 --output otlp_spans.jsonl
+    TRACE_EXPORT=otlp OTLP_ENDPOINT=http://127.0.0.1:4318 python app.py
+"""
+
+import argparse
+import gzip
+import heapq
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Collector:
+    """What the receiver has seen so far"""
+
+    def __init__(self, output=None, keep_slowest=20):
+        self.output = open(output, 'a', encoding='utf-8') if output else None
+        self.keep_slowest = keep_slowest
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'spans': 0, 'traces': 0, 'rejected': 0}
+        self.slowest = []  # min-heap of (duration_ms, name, trace id)
+
+    def receive(self, payload):
+        spans = [span
+                 for resource in payload.get('resourceSpans', [])
+                 for scope in resource.get('scopeSpans', [])
+                 for span in scope.get('spans', [])]
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['spans'] += len(spans)
+            for span in spans:
+                if span.get('parentSpanId'):
+                    continue
+                self.stats['traces'] += 1
+                duration_ms = (int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])) / 1e6
+                entry = (duration_ms, span.get('name'), span.get('traceId'))
+                if len(self.slowest) < self.keep_slowest:
+                    heapq.heappush(self.slowest, entry)
+                else:
+                    heapq.heappushpop(self.slowest, entry)
+            if self.output is not None:
+                for span in spans:
+                    self.output.write(json.dumps(span) + '\n')
+                self.output.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                **self.stats,
+                'slowest': [{'duration_ms': round(duration, 3), 'name': name, 'trace_id': trace_id}
+                            for duration, name, trace_id in sorted(self.slowest, reverse=True)]
+            }
+
+def make_handler(collector):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, data):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path != '/v1/traces':
+                self._reply(404, {'error': 'not found'})
+                return
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            try:
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                payload = json.loads(body)
+            except ValueError:
+                with collector.lock:
+                    collector.stats['rejected'] += 1
+                self._reply(400, {'error': 'expected OTLP/JSON'})
+                return
+            collector.receive(payload)
+            # An empty ExportTraceServiceResponse: everything accepted
+            self._reply(200, {})
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._reply(200, collector.snapshot())
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake OTLP/HTTP JSON trace collector')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4318)
+    parser.add_argument('--output', help='Append every received span to this JSON-lines file')
+    args = parser.parse_args()
+
+    collector = Collector(args.output)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(collector))
+    print(f"🛰️ Fake OTLP collector on http://{args.host}:{args.port}/v1/traces", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(collector.snapshot(), indent=2), flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Camera owner process for production mode
+
+Only one process may hold the webcam. In production this service opens
+the device, keeps reading frames on a single publisher thread and answers
+camera commands (start, stop, read, capture, stats, ...) from the HTTP
+workers over a multiprocessing connection. Workers set
+CAMERA_SERVICE_ADDRESS and use RemoteCamera in place of cv2.VideoCapture.
+
+    CAMERA_SERVICE_AUTHKEY=$(openssl rand -hex 32) python camera_service.py --address 127.0.0.1:6001
+
+Workers must use the same CAMERA_SERVICE_AUTHKEY; run_production.py
+generates one for each run.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+
+from frame_transport import DEFAULT_MAX_READERS, FrameRing
+
+log = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = '127.0.0.1:6001'
+# Shared secret between the owner and its workers. There is no default: a
+# well-known key would let any local process drive the camera
+CAMERA_SERVICE_AUTHKEY = os.getenv('CAMERA_SERVICE_AUTHKEY', '').encode()
+AUTHKEY_MISSING = 'CAMERA_SERVICE_AUTHKEY is not set; give the camera service and the workers the same key, or use run_production.py'
+
+# How long a worker trusts the owner's camera state before asking again
+STATUS_CACHE_SECONDS = 0.5
+
+def parse_address(address):
+    """'host:port' becomes a TCP address, anything else a Unix socket path"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+class CameraServiceError(Exception):
+    """Raised in a worker when the camera owner reports a failure"""
+
+class PublishedCamera:
+    """Wraps the owner's cv2.VideoCapture so a single thread reads the device.
+
+    Every reader (MJPEG streams, captures, frame tests) gets the most recent
+    frame instead of competing for camera.read(), which is not thread-safe.
+    Frames are also copied once into a shared-memory ring for readers in
+    other processes.
+    """
+
+    def __init__(self, capture):
+        self._capture = capture
+        self._condition = threading.Condition()
+        self._frame = None
+        self._sequence = 0
+        self.ring = None
+        self._running = True
+        self._thread = threading.Thread(target=self._publish, name='camera-publisher', daemon=True)
+        self._thread.start()
+
+    def _publish(self):
+        failures = 0
+        while self._running:
+            ret, frame = self._capture.read()
+            if not ret or frame is None:
+                failures += 1
+                time.sleep(min(0.05 * failures, 1.0))
+                continue
+            failures = 0
+            self._publish_shared(frame)
+            with self._condition:
+                self._frame = frame
+                self._sequence += 1
+                self._condition.notify_all()
+
+    def _publish_shared(self, frame):
+        """Copy the frame into the shared ring, recreating it if the resolution changed"""
+        try:
+            shape = frame.shape if frame.ndim == 3 else frame.shape + (1,)
+            if self.ring is None or self.ring.shape != shape:
+                if self.ring is not None:
+                    self.ring.close()
+                self.ring = FrameRing.create(shape)
+                log.info(f"🧠 Frame ring {self.ring.name} created for {shape[1]}x{shape[0]} frames")
+            self.ring.publish(frame)
+        except Exception as e:
+            log.warning(f"⚠️ Shared frame publish failed: {e}")
+
+    def transport_stats(self):
+        return self.ring.report() if self.ring is not None else None
+
+    def read(self, timeout=1.0):
+        """Wait for the next published frame, like cv2.VideoCapture.read()"""
+        with self._condition:
+            sequence = self._sequence
+            self._condition.wait_for(lambda: self._sequence != sequence or not self._running, timeout)
+            if self._frame is None:
+                return False, None
+            # The publisher replaces the reference on every frame and never
+            # writes into a published array, so readers can share it
+            return True, self._frame
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    def isOpened(self):
+        return self._running and self._capture.isOpened()
+
+    def get(self, prop):
+        return self._capture.get(prop)
+
+    def set(self, prop, value):
+        return self._capture.set(prop, value)
+
+    def release(self):
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        self._thread.join(timeout=2)
+        self._capture.release()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+class RemoteCamera:
+    """cv2.VideoCapture-like proxy used by HTTP workers to reach the camera owner"""
+
+    def __init__(self, address):
+        if not CAMERA_SERVICE_AUTHKEY:
+            raise CameraServiceError(AUTHKEY_MISSING)
+        self.address = parse_address(address)
+        self._local = threading.local()
+        self._status = None
+        self._status_time = 0.0
+        self._rings = {}
+        # Threads using each attached ring; the last one to leave closes it
+        self._ring_users = {}
+        self._rings_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = Client(self.address, authkey=CAMERA_SERVICE_AUTHKEY)
+            self._local.connection = conn
+        return conn
+
+    def call(self, command, **kwargs):
+        """Send one command to the camera owner and return its result"""
+        conn = self._connection()
+        try:
+            conn.send((command, kwargs))
+            status, result = conn.recv()
+        except (EOFError, OSError):
+            # The owner restarted or dropped us; reconnect on the next call
+            self._local.connection = None
+            conn.close()
+            raise
+        if status != 'ok':
+            raise CameraServiceError(result)
+        return result
+
+    def status(self):
+        now = time.time()
+        if self._status is None or now - self._status_time > STATUS_CACHE_SECONDS:
+            try:
+                self._status = self.call('status')
+            except (EOFError, OSError):
+                self._status = {'active': False, 'opened': False}
+            self._status_time = now
+        return self._status
+
+    def start(self):
+        self._status = None
+        return self.call('start')
+
+    def stop(self):
+        self._status = None
+        return self.call('stop')
+
+    def capture(self):
+        return tuple(self.call('capture'))
+
+    def isOpened(self):
+        return self.status()['opened']
+
+    def _transport(self):
+        """Return this thread's (ring, reader index), attaching on first use.
+
+        Each thread attaches over its own connection so it owns a lease cell;
+        after a camera restart it lets go of the old ring and attaches again.
+        """
+        ring = getattr(self._local, 'ring', None)
+        if ring is not None and not ring.closed:
+            return ring, self._local.reader_index
+        if ring is not None:
+            self._local.ring = None
+            self._release_ring(ring)
+
+        try:
+            attachment = self.call('attach')
+        except (EOFError, OSError, CameraServiceError):
+            attachment = None
+        if not attachment:
+            return None, None
+
+        with self._rings_lock:
+            ring = self._rings.get(attachment['name'])
+            if ring is None:
+                ring = self._rings[attachment['name']] = FrameRing.attach(attachment['name'])
+            self._ring_users[ring.name] = self._ring_users.get(ring.name, 0) + 1
+
+        self._local.ring = ring
+        self._local.reader_index = attachment['reader_index']
+        self._local.last_sequence = 0
+        return ring, self._local.reader_index
+
+    def _release_ring(self, ring):
+        # Other threads may still read from a ring the owner closed, so only
+        # the last thread using it unmaps it
+        with self._rings_lock:
+            self._ring_users[ring.name] -= 1
+            if self._ring_users[ring.name] > 0:
+                return
+            del self._ring_users[ring.name]
+            del self._rings[ring.name]
+        try:
+            ring.close()
+        except BufferError:
+            pass  # A frame view is still alive; the mapping goes with it
+
+    def read(self):
+        """Return a private copy of the next frame, via shared memory when possible"""
+        ring, reader_index = self._transport()
+        if ring is not None:
+            sequence, frame = ring.read_copy(reader_index, self._local.last_sequence)
+            if frame is not None:
+                self._local.last_sequence = sequence
+                return True, frame
+
+        try:
+            return self.call('read')
+        except (EOFError, OSError, CameraServiceError):
+            return False, None
+
+    @contextmanager
+    def lease_frame(self, timeout=1.0):
+        """Yield the next frame as a read-only view into shared memory, without copying"""
+        ring, reader_index = self._transport()
+        if ring is None:
+            ret, frame = self.read()
+            yield frame if ret else None
+            return
+
+        lease = ring.lease(reader_index, self._local.last_sequence, timeout)
+        if lease is None:
+            yield None
+            return
+
+        self._local.last_sequence = lease.sequence
+        try:
+            yield lease.frame
+        finally:
+            lease.release()
+
+    def transport_stats(self):
+        """Copy counts and latencies from the owner and this worker"""
+        with self._rings_lock:
+            readers = [ring.report() for ring in self._rings.values() if not ring.closed]
+        try:
+            owner = self.call('transport_stats')
+        except (EOFError, OSError, CameraServiceError):
+            owner = None
+        return {'owner': owner, 'worker': readers}
+
+    def get(self, prop):
+        return self.call('get', prop=prop)
+
+    def set(self, prop, value):
+        return self.call('set', prop=prop, value=value)
+
+    def release(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            conn.close()
+            self._local.connection = None
+
+class CameraService:
+    """Dispatches worker commands onto the app's camera functions"""
+
+    def __init__(self, app_module):
+        self.app = app_module
+        self.lock = threading.Lock()
+        # Devices found by the last probe, answered while the camera runs
+        self.last_scan = None
+        self.free_readers = list(range(DEFAULT_MAX_READERS))
+        self.readers_lock = threading.Lock()
+
+    def _published(self):
+        camera = self.app.camera
+        return camera if isinstance(camera, PublishedCamera) else None
+
+    def cmd_start(self):
+        with self.lock:
+            if not self.app.start_camera():
+                return False
+            if self._published() is None:
+                self.app.camera = PublishedCamera(self.app.camera)
+            return True
+
+    def cmd_stop(self):
+        with self.lock:
+            self.app.stop_camera()
+        return True
+
+    def cmd_status(self):
+        camera = self.app.camera
+        opened = bool(self.app.camera_active and camera is not None and camera.isOpened())
+        return {
+            'active': self.app.camera_active,
+            'opened': opened,
+            'device': self.app.active_camera_device,
+            'camera_info': self.app.get_camera_info() if opened else None
+        }
+
+    def cmd_read(self):
+        camera = self.app.camera
+        if camera is None:
+            return False, None
+        return camera.read()
+
+    def cmd_get(self, prop):
+        return self.app.camera.get(prop)
+
+    def cmd_set(self, prop, value):
+        return self.app.camera.set(prop, value)
+
+    def cmd_attach(self, session):
+        """Hand a reader the current frame ring and its lease cell"""
+        published = self._published()
+        if published is None or published.ring is None:
+            return None
+        if 'reader_index' not in session:
+            with self.readers_lock:
+                if not self.free_readers:
+                    return None
+                session['reader_index'] = self.free_readers.pop(0)
+        return {'name': published.ring.name, 'reader_index': session['reader_index']}
+
+    def detach(self, session):
+        """Free a disconnected reader's lease cell"""
+        reader_index = session.pop('reader_index', None)
+        if reader_index is None:
+            return
+        published = self._published()
+        if published is not None and published.ring is not None:
+            published.ring.clear_lease(reader_index)
+        with self.readers_lock:
+            self.free_readers.append(reader_index)
+
+    def cmd_transport_stats(self):
+        published = self._published()
+        return published.transport_stats() if published is not None else None
+
+    def cmd_capture(self):
+        return self.app.capture_image()
+
+    def cmd_quality_report(self):
+        return self.app.last_quality_report
+
+    def cmd_stats(self):
+        return self.app.capture_stats_snapshot()
+
+    def cmd_reset_stats(self):
+        self.app.reset_capture_stats_data()
+        return True
+
+    def cmd_metrics(self):
+        return self.app.metrics.snapshot()
+
+    def cmd_scan(self):
+        with self.lock:
+            # A probe opens every device, the one being streamed from included
+            if self.app.camera_active:
+                if self.last_scan is not None:
+                    return self.last_scan
+                device = self.app.active_camera_device
+                return [] if device is None else [device]
+            self.last_scan = self.app.find_available_cameras()
+            return self.last_scan
+
+    def cmd_permissions(self):
+        with self.lock:
+            if self.app.camera_active:
+                return 'granted'
+            return self.app.check_camera_permissions()
+
+    def handle(self, conn):
+        """Serve one worker connection until it closes"""
+        session = {}
+        try:
+            with conn:
+                while True:
+                    try:
+                        command, kwargs = conn.recv()
+                    except (EOFError, OSError):
+                        return
+
+                    handler = getattr(self, f"cmd_{command}", None)
+                    try:
+                        if handler is None:
+                            raise ValueError(f"Unknown camera command: {command}")
+                        if command == 'attach':
+                            kwargs = dict(kwargs, session=session)
+                        reply = ('ok', handler(**kwargs))
+                    except Exception as e:
+                        reply = ('error', str(e))
+
+                    try:
+                        conn.send(reply)
+                    except (EOFError, OSError):
+                        return
+        finally:
+            self.detach(session)
+
+def serve(address):
+    """Run the camera owner until interrupted"""
+    # The owner drives the camera itself, so the app must not act as a client
+    os.environ.pop('CAMERA_SERVICE_ADDRESS', None)
+    import app as app_module
+
+    service = CameraService(app_module)
+    app_module.metrics.start_sharing('camera')
+    parsed = parse_address(address)
+    if isinstance(parsed, str) and os.path.exists(parsed):
+        os.remove(parsed)
+
+    with Listener(parsed, authkey=CAMERA_SERVICE_AUTHKEY) as listener:
+        log.info(f"📷 Camera service listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError) as e:
+                log.warning(f"⚠️ Rejected camera service connection: {e}")
+                continue
+            threading.Thread(target=service.handle, args=(conn,), daemon=True).start()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Story Reader camera owner process')
+    parser.add_argument('--address', default=os.getenv('CAMERA_SERVICE_ADDRESS', DEFAULT_ADDRESS),
+                        help='host:port or Unix socket path to listen on')
+    args = parser.parse_args(argv)
+
+    if not CAMERA_SERVICE_AUTHKEY:
+        log.error(f"❌ {AUTHKEY_MISSING}")
+        return 1
+    try:
+        serve(args.address)
+    except KeyboardInterrupt:
+        log.info("🛑 Camera service stopped")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Circuit breakers for the cloud OCR and TTS backends
+
+A breaker tracks the outcome of recent calls to one backend. When the
+error rate over the rolling window crosses the threshold it opens, and
+calls fail immediately with CircuitOpenError so the caller can use its
+fallback instead of waiting for a dead backend. After a cool-down the
+breaker lets a few probe calls through (half-open); a successful probe
+closes it again, a failed one re-opens it with a longer cool-down.
+
+    breaker = CircuitBreaker('google_cloud_tts')
+    try:
+        response = breaker.call(client.synthesize_speech, request, timeout=10)
+    except CircuitOpenError:
+        ...  # fall back right away
+
+State is per process; every gunicorn/uvicorn worker trips on its own.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Defaults, overridable per breaker or through the environment
+DEFAULT_WINDOW_SECONDS = float(os.getenv('CIRCUIT_WINDOW_SECONDS', '60'))
+DEFAULT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '5'))
+DEFAULT_ERROR_RATE = float(os.getenv('CIRCUIT_ERROR_RATE', '0.5'))
+DEFAULT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+DEFAULT_MAX_OPEN_SECONDS = float(os.getenv('CIRCUIT_MAX_OPEN_SECONDS', '300'))
+DEFAULT_HALF_OPEN_CALLS = int(os.getenv('CIRCUIT_HALF_OPEN_CALLS', '1'))
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose breaker is open"""
+
+    def __init__(self, breaker, retry_in):
+        self.breaker = breaker.name
+        self.retry_in = retry_in
+        super().__init__(f"{breaker.name} circuit open, retrying in {retry_in:.0f}s")
+
+class CircuitBreaker:
+    """Rolling error-rate breaker with half-open probing"""
+
+    def __init__(self, name, window_seconds=DEFAULT_WINDOW_SECONDS, min_calls=DEFAULT_MIN_CALLS,
+                 error_rate=DEFAULT_ERROR_RATE, open_seconds=DEFAULT_OPEN_SECONDS,
+                 max_open_seconds=DEFAULT_MAX_OPEN_SECONDS, half_open_calls=DEFAULT_HALF_OPEN_CALLS,
+                 ignored_exceptions=()):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_calls = half_open_calls
+        # Errors caused by the request itself (bad input) say nothing about
+        # the backend's health and are not counted. A callable returning the
+        # classes is resolved on the first error, so their module can load lazily
+        self._ignored_exceptions = ignored_exceptions if callable(ignored_exceptions) else tuple(ignored_exceptions)
+
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (timestamp, succeeded)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._cool_down = open_seconds
+        self._probes_in_flight = 0
+        self._last_error = None
+        self._last_error_time = None
+        self._counters = {'calls': 0, 'failures': 0, 'rejected': 0, 'trips': 0}
+
+        register(self)
+
+    # State ---------------------------------------------------------------
+
+    def _prune(self, now):
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _current_error_rate(self):
+        if not self._outcomes:
+            return 0.0
+        failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+        return failures / len(self._outcomes)
+
+    def _trip(self, now):
+        if self._state == HALF_OPEN:
+            # The backend is still down: back off further before probing again
+            self._cool_down = min(self._cool_down * 2, self.max_open_seconds)
+        else:
+            self._cool_down = self.open_seconds
+        self._state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._counters['trips'] += 1
+        log.warning(f"⚡ Circuit {self.name} opened for {self._cool_down:.0f}s "
+                    f"(error rate {self._current_error_rate():.0%})")
+
+    def _close(self):
+        self._state = CLOSED
+        self._outcomes.clear()
+        self._cool_down = self.open_seconds
+        self._probes_in_flight = 0
+        log.info(f"✅ Circuit {self.name} closed")
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self._cool_down:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Reserve a call slot; raises CircuitOpenError while the breaker is open"""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN:
+                remaining = self._cool_down - (now - self._opened_at)
+                if remaining > 0:
+                    self._counters['rejected'] += 1
+                    raise CircuitOpenError(self, remaining)
+                self._state = HALF_OPEN
+                self._probes_in_flight = 0
+
+            if self._state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_calls:
+                    self._counters['rejected'] += 1
+                    raise CircuitOpenError(self, 0)
+                self._probes_in_flight += 1
+
+            self._counters['calls'] += 1
+
+    def record_success(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._close()
+                return
+            self._outcomes.append((now, True))
+            self._prune(now)
+
+    def record_failure(self, error):
+        now = time.monotonic()
+        with self._lock:
+            self._counters['failures'] += 1
+            self._last_error = str(error)[:300]
+            self._last_error_time = time.time()
+            if self._state == HALF_OPEN:
+                self._trip(now)
+                return
+            if self._state == OPEN:
+                return
+            self._outcomes.append((now, False))
+            self._prune(now)
+            if len(self._outcomes) >= self.min_calls and self._current_error_rate() >= self.error_rate:
+                self._trip(now)
+
+    @property
+    def ignored_exceptions(self):
+        if callable(self._ignored_exceptions):
+            self._ignored_exceptions = tuple(self._ignored_exceptions())
+        return self._ignored_exceptions
+
+    def _record_exception(self, error):
+        if isinstance(error, self.ignored_exceptions):
+            self.record_success()
+        else:
+            self.record_failure(error)
+
+    # Calls ---------------------------------------------------------------
+
+    def call(self, func, *args, **kwargs):
+        """Call func through the breaker"""
+        self.allow()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._record_exception(e)
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, func, *args, **kwargs):
+        """Await func(*args, **kwargs) through the breaker"""
+        self.allow()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self._record_exception(e)
+            raise
+        self.record_success()
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._close()
+
+    def snapshot(self):
+        """State and counters for /api/ocr/info"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            state = self._state
+            retry_in = None
+            if state == OPEN:
+                retry_in = max(0.0, self._cool_down - (now - self._opened_at))
+                if retry_in == 0:
+                    state = HALF_OPEN
+            return {
+                'state': state,
+                'error_rate': round(self._current_error_rate(), 3),
+                'window_calls': len(self._outcomes),
+                'window_seconds': self.window_seconds,
+                'error_rate_threshold': self.error_rate,
+                'retry_in_seconds': round(retry_in, 1) if retry_in is not None else None,
+                'last_error': self._last_error,
+                'last_error_time': self._last_error_time,
+                **self._counters
+            }
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+def register(breaker):
+    with _registry_lock:
+        _breakers[breaker.name] = breaker
+
+def get_breaker(name):
+    return _breakers.get(name)
+
+def snapshot_all():
+    """Snapshot of every breaker in this process, by name"""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
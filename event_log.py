@@ -0,0 +1,152 @@
+"""
+Structured event log: JSON lines written by a background thread, rotated by size
+
+emit() only puts the event on a bounded queue, so callers on latency
+sensitive paths (captures, request threads) never wait for the disk. A
+writer thread drains the queue in batches, appends one JSON object per
+line and rotates the file like logging.handlers.RotatingFileHandler
+(events.jsonl -> events.jsonl.1 -> ... -> events.jsonl.N). When the queue
+is full, new events are dropped and counted rather than blocking.
+
+Gunicorn workers and the camera owner append to the same file, so rotation
+happens under an flock on events.jsonl.lock, and a process that finds the
+file already rotated by another only reopens it.
+
+    log = EventLog('logs/capture_events.jsonl', max_bytes=5_000_000, backup_count=5)
+    log.emit('capture_failed', category='too_dark', brightness=0.4)
+"""
+
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation then relies on the rotated-elsewhere check alone
+    fcntl = None
+
+@contextmanager
+def _exclusive(lock_path):
+    """Hold an exclusive lock shared with other processes, where flock exists"""
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+class EventLog:
+    """Append-only JSON-lines file fed through a queue"""
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backup_count=5, queue_size=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._file = None
+        self._dropped_lock = threading.Lock()
+        self.stats = {'written': 0, 'dropped': 0, 'rotations': 0, 'write_errors': 0, 'last_error': None}
+
+    def emit(self, event, **fields):
+        """Queue one event; returns False if it had to be dropped"""
+        record = {'timestamp': datetime.now().isoformat(), 'event': event, **fields}
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self.stats['dropped'] += 1
+            return False
+
+    def _ensure_writer(self):
+        # Started on first use so a gunicorn worker gets its own thread after the fork
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='event-log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is waiting so a burst costs one write and flush
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.stats['write_errors'] += len(batch)
+                self.stats['last_error'] = str(e)
+                self._close_file()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        for record in batch:
+            self._file.write(json.dumps(record, default=str) + '\n')
+            self.stats['written'] += 1
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+        if self._file is not None:
+            self._file.flush()
+
+    def _rotate(self):
+        with _exclusive(f"{self.path}.lock"):
+            rotated_elsewhere = self._rotated_elsewhere()
+            self._close_file()
+            if not rotated_elsewhere:
+                if self.backup_count > 0:
+                    for index in range(self.backup_count - 1, 0, -1):
+                        source = f"{self.path}.{index}"
+                        if os.path.exists(source):
+                            os.replace(source, f"{self.path}.{index + 1}")
+                    os.replace(self.path, f"{self.path}.1")
+                else:
+                    os.remove(self.path)
+                self.stats['rotations'] += 1
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _rotated_elsewhere(self):
+        # Another process moved our file aside (it is now .1) since we opened it
+        try:
+            return not os.path.samestat(os.stat(self.path), os.fstat(self._file.fileno()))
+        except FileNotFoundError:
+            return True
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def flush(self):
+        """Block until every queued event has been written (tests, shutdown)"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def info(self):
+        return {
+            'path': self.path,
+            'max_bytes': self.max_bytes,
+            'backup_count': self.backup_count,
+            'queued': self._queue.qsize(),
+            **self.stats
+        }
@@ -0,0 +1,294 @@
+"""
+Shared-memory frame transport between the camera owner and other processes
+
+The camera owner copies each frame once into a fixed ring of slots in a
+multiprocessing.shared_memory block. Readers in other processes lease the
+latest slot and wrap it as a read-only numpy view, so a 640x480x3 frame
+costs no pickling and no further copies on its way to the stream encoder.
+
+Layout of the shared block (all counters are int64):
+
+    header   magic, slot_count, height, width, channels, max_readers,
+             latest_sequence, latest_slot, closed
+    slots    per slot: sequence (-1 while being written), publish time (ns)
+    leases   per reader: leased slot index or -1
+    data     slot_count frames of height * width * channels bytes
+
+The writer marks a slot as being written before it checks the leases, and
+a reader publishes its lease before it re-checks the slot's sequence, so
+at least one side always sees the other. Readers can additionally call
+FrameLease.valid() after using a frame as a seqlock-style check.
+"""
+
+import threading
+import time
+from multiprocessing import shared_memory
+
+import lazy_imports
+
+# Only the camera owner and stream readers touch frames; other workers never pay for numpy
+np = lazy_imports.lazy_module('numpy')
+
+MAGIC = 0x53524652  # "SRFR"
+HEADER_FIELDS = 9
+H_MAGIC, H_SLOTS, H_HEIGHT, H_WIDTH, H_CHANNELS, H_READERS, H_LATEST_SEQ, H_LATEST_SLOT, H_CLOSED = range(HEADER_FIELDS)
+SLOT_FIELDS = 2
+WRITING = -1
+NO_LEASE = -1
+
+# Lease cells are cheap; every worker thread that reads frames needs one
+DEFAULT_MAX_READERS = 64
+# Leases are held only while a frame is encoded, so a few spare slots are
+# enough; if every slot is leased the writer drops the frame
+DEFAULT_SLOT_COUNT = 8
+
+def _layout(slot_count, max_readers):
+    """Offsets of the header, slot table, lease table and data in bytes"""
+    header_bytes = HEADER_FIELDS * 8
+    slots_bytes = slot_count * SLOT_FIELDS * 8
+    leases_bytes = max_readers * 8
+    data_offset = header_bytes + slots_bytes + leases_bytes
+    # Keep frame data 64-byte aligned for SIMD-friendly access
+    data_offset = (data_offset + 63) // 64 * 64
+    return header_bytes, slots_bytes, leases_bytes, data_offset
+
+def _attach_untracked(name):
+    """Attach to an existing block without letting this process unlink it on exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers every attachment with the resource tracker
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+class FrameLease:
+    """A reader's hold on one slot; the frame is a read-only view into shared memory"""
+
+    def __init__(self, ring, reader_index, slot, sequence, published_ns):
+        self.ring = ring
+        self.reader_index = reader_index
+        self.slot = slot
+        self.sequence = sequence
+        self.published_ns = published_ns
+        self.frame = ring._frame_view(slot)
+
+    def valid(self):
+        """True if the writer has not touched the slot since it was leased"""
+        return self.ring._slots[self.slot, 0] == self.sequence
+
+    def release(self):
+        self.frame = None
+        self.ring._leases[self.reader_index] = NO_LEASE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+class FrameRing:
+    """Fixed ring of frame slots in shared memory with sequence numbers and reader leases"""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.name = shm.name
+
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if header[H_MAGIC] != MAGIC:
+            raise ValueError(f"Shared memory block {shm.name} is not a frame ring")
+        self.slot_count = int(header[H_SLOTS])
+        self.max_readers = int(header[H_READERS])
+        self.shape = (int(header[H_HEIGHT]), int(header[H_WIDTH]), int(header[H_CHANNELS]))
+        self.frame_bytes = self.shape[0] * self.shape[1] * self.shape[2]
+
+        header_bytes, slots_bytes, leases_bytes, data_offset = _layout(self.slot_count, self.max_readers)
+        self._header = header
+        self._slots = np.ndarray((self.slot_count, SLOT_FIELDS), dtype=np.int64, buffer=shm.buf, offset=header_bytes)
+        self._leases = np.ndarray((self.max_readers,), dtype=np.int64, buffer=shm.buf,
+                                  offset=header_bytes + slots_bytes)
+        self._data_offset = data_offset
+        self._next_slot = 0
+
+        # Per-process counters; the owner reports writer stats, readers their own
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'frames_published': 0,
+            'frames_dropped': 0,
+            'publish_copies': 0,
+            'total_publish_us': 0.0,
+            'frames_leased': 0,
+            'reader_copies': 0,
+            'stale_leases': 0,
+            'total_latency_us': 0.0,
+            'max_latency_us': 0.0
+        }
+
+    @classmethod
+    def create(cls, shape, max_readers=DEFAULT_MAX_READERS, slot_count=DEFAULT_SLOT_COUNT):
+        """Allocate a new ring in the camera owner for frames of the given shape"""
+        if len(shape) == 2:
+            shape = (shape[0], shape[1], 1)
+        frame_bytes = shape[0] * shape[1] * shape[2]
+        _, _, _, data_offset = _layout(slot_count, max_readers)
+
+        shm = shared_memory.SharedMemory(create=True, size=data_offset + slot_count * frame_bytes)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = [MAGIC, slot_count, shape[0], shape[1], shape[2], max_readers, 0, NO_LEASE, 0]
+        ring = cls(shm, owner=True)
+        ring._slots[:] = 0
+        ring._leases[:] = NO_LEASE
+        del header
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        """Open an existing ring from a reader process"""
+        return cls(_attach_untracked(name), owner=False)
+
+    def _frame_view(self, slot):
+        offset = self._data_offset + slot * self.frame_bytes
+        view = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+        if not self.owner:
+            view.flags.writeable = False
+        return view if self.shape[2] > 1 else view[:, :, 0]
+
+    @property
+    def closed(self):
+        return self._header is None or bool(self._header[H_CLOSED])
+
+    @property
+    def latest_sequence(self):
+        return int(self._header[H_LATEST_SEQ])
+
+    # Writer side ---------------------------------------------------------
+
+    def publish(self, frame):
+        """Copy a frame into a free slot and make it the latest one"""
+        start = time.perf_counter()
+        if frame.ndim == 2:
+            frame = frame[:, :, np.newaxis]
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match ring shape {self.shape}")
+
+        latest_slot = int(self._header[H_LATEST_SLOT])
+        for _ in range(self.slot_count):
+            slot = self._next_slot
+            self._next_slot = (self._next_slot + 1) % self.slot_count
+            if slot == latest_slot:
+                continue
+
+            # Claim the slot first, then look for leases (see module docstring)
+            previous = int(self._slots[slot, 0])
+            self._slots[slot, 0] = WRITING
+            if slot in self._leases:
+                self._slots[slot, 0] = previous
+                continue
+
+            offset = self._data_offset + slot * self.frame_bytes
+            target = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+            np.copyto(target, frame)
+
+            sequence = int(self._header[H_LATEST_SEQ]) + 1
+            self._slots[slot, 1] = time.monotonic_ns()
+            self._slots[slot, 0] = sequence
+            self._header[H_LATEST_SLOT] = slot
+            self._header[H_LATEST_SEQ] = sequence
+
+            with self._stats_lock:
+                self.stats['frames_published'] += 1
+                self.stats['publish_copies'] += 1
+                self.stats['total_publish_us'] += (time.perf_counter() - start) * 1e6
+            return sequence
+
+        with self._stats_lock:
+            self.stats['frames_dropped'] += 1
+        return None
+
+    def clear_lease(self, reader_index):
+        """Drop a reader's lease, e.g. after its process disconnected"""
+        self._leases[reader_index] = NO_LEASE
+
+    def close(self):
+        """Tell readers the ring is gone; the owner also unlinks the block"""
+        if self.owner:
+            self._header[H_CLOSED] = 1
+        self._header = self._slots = self._leases = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    # Reader side ---------------------------------------------------------
+
+    def lease(self, reader_index, after_sequence=0, timeout=1.0, poll_interval=0.002):
+        """Lease the latest frame newer than after_sequence, or None on timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.closed:
+                return None
+
+            sequence = int(self._header[H_LATEST_SEQ])
+            slot = int(self._header[H_LATEST_SLOT])
+            if sequence > after_sequence and slot != NO_LEASE:
+                self._leases[reader_index] = slot
+                if int(self._slots[slot, 0]) == sequence:
+                    published_ns = int(self._slots[slot, 1])
+                    latency_us = (time.monotonic_ns() - published_ns) / 1000
+                    with self._stats_lock:
+                        self.stats['frames_leased'] += 1
+                        self.stats['total_latency_us'] += latency_us
+                        self.stats['max_latency_us'] = max(self.stats['max_latency_us'], latency_us)
+                    return FrameLease(self, reader_index, slot, sequence, published_ns)
+                # The writer got there first; try the new latest slot
+                self._leases[reader_index] = NO_LEASE
+                with self._stats_lock:
+                    self.stats['stale_leases'] += 1
+                continue
+
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def read_copy(self, reader_index, after_sequence=0, timeout=1.0):
+        """Return (sequence, private copy of the frame) for callers that keep frames"""
+        lease = self.lease(reader_index, after_sequence, timeout)
+        if lease is None:
+            return after_sequence, None
+        with lease:
+            frame = lease.frame.copy()
+        with self._stats_lock:
+            self.stats['reader_copies'] += 1
+        return lease.sequence, frame
+
+    def report(self):
+        """Copy counts and per-frame timings for diagnostics"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        published = stats['frames_published']
+        leased = stats['frames_leased']
+        return {
+            'name': self.name,
+            'shape': list(self.shape),
+            'slots': self.slot_count,
+            'latest_sequence': self.latest_sequence if self._header is not None else None,
+            'frames_published': published,
+            'frames_dropped': stats['frames_dropped'],
+            'frames_leased': leased,
+            'stale_leases': stats['stale_leases'],
+            'copies': {
+                'publish': stats['publish_copies'],
+                'reader': stats['reader_copies'],
+                'per_leased_frame': round(stats['reader_copies'] / leased, 3) if leased else 0.0
+            },
+            'average_publish_us': round(stats['total_publish_us'] / published, 1) if published else None,
+            'average_latency_us': round(stats['total_latency_us'] / leased, 1) if leased else None,
+            'max_latency_us': round(stats['max_latency_us'], 1) if leased else None
+        }
@@ -0,0 +1,33 @@
+"""
+Gunicorn settings for production mode
+
+Workers are stateless HTTP processes; the webcam is owned by
+camera_service.py and reached through CAMERA_SERVICE_ADDRESS. Start both
+with run_production.py, or by hand:
+
+    export CAMERA_SERVICE_AUTHKEY=$(openssl rand -hex 32)
+    python camera_service.py &
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import multiprocessing
+import os
+
+# Workers must never open the camera themselves
+os.environ.setdefault('CAMERA_SERVICE_ADDRESS', '127.0.0.1:6001')
+
+bind = os.getenv('BIND', '0.0.0.0:5001')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Threads let one worker hold MJPEG streams open while serving other requests
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# Cloud OCR/TTS calls can take a while
+timeout = 120
+graceful_timeout = 10
+keepalive = 5
+
+if os.path.exists('cert.pem') and os.path.exists('key.pem'):
+    certfile = 'cert.pem'
+    keyfile = 'key.pem'
@@ -0,0 +1,142 @@
+"""
+Background health checks whose latest results are served from memory
+
+Some status endpoints used to do their checks inline: building cloud
+clients, or opening camera devices with cv2.VideoCapture and waiting for a
+frame. The frontend calls them on every page load. A HealthMonitor runs
+each registered check on its own interval on one background thread and
+keeps the last result with when it was taken, so those endpoints only read
+a dict.
+
+    monitor = HealthMonitor(initial_delay=1.0)
+    monitor.register('camera_devices', scan_devices, interval=60)
+    monitor.start()
+    devices, info = monitor.result('camera_devices')   # info: checked_at, age_seconds, ...
+
+A check that has never run is run inline by the first caller that needs
+it, and result(refresh=True) runs it again straight away. A check that
+raises keeps its last good result and records the error next to it.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+HEALTH_CHECK_SECONDS = metrics.gauge('storyreader_health_check_seconds',
+                                     'How long the last run of each background health check took', ('check',))
+HEALTH_CHECK_FAILURES = metrics.counter('storyreader_health_check_failures_total',
+                                        'Background health checks that raised', ('check',))
+
+log = logging.getLogger(__name__)
+
+class HealthCheck:
+    """One named check and its latest result"""
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.value = None
+        self.error = None
+        self.checked_at = None
+        self.checked_monotonic = None
+        self.duration = None
+        self.runs = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def due(self, now):
+        return self.checked_monotonic is None or now - self.checked_monotonic >= self.interval
+
+    def run(self):
+        """Run the check unless a concurrent caller finished a run while this one waited"""
+        requested = time.monotonic()
+        with self._lock:
+            if self.checked_monotonic is not None and self.checked_monotonic >= requested:
+                return
+            started = time.perf_counter()
+            try:
+                self.value = self.func()
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                self.failures += 1
+                HEALTH_CHECK_FAILURES.inc(check=self.name)
+                log.warning("⚠️ Health check %s failed: %s", self.name, e)
+            self.duration = time.perf_counter() - started
+            HEALTH_CHECK_SECONDS.set(self.duration, check=self.name)
+            self.runs += 1
+            self.checked_at = datetime.now().isoformat()
+            self.checked_monotonic = time.monotonic()
+
+    def info(self):
+        return {
+            'checked_at': self.checked_at,
+            'age_seconds': round(time.monotonic() - self.checked_monotonic, 3)
+            if self.checked_monotonic is not None else None,
+            'duration_ms': round(self.duration * 1000, 1) if self.duration is not None else None,
+            'interval_seconds': self.interval,
+            'error': self.error,
+            'runs': self.runs,
+            'failures': self.failures
+        }
+
+class HealthMonitor:
+    """Runs registered checks on a daemon thread, each on its own interval"""
+
+    def __init__(self, initial_delay=0.0):
+        self.initial_delay = initial_delay
+        self.checks = {}
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def register(self, name, func, interval=30.0):
+        self.checks[name] = HealthCheck(name, func, interval)
+        self._wake.set()
+
+    def start(self):
+        """Start the checker thread; once per process, so a forked worker starts its own"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        if self.initial_delay > 0:
+            time.sleep(self.initial_delay)
+        while True:
+            now = time.monotonic()
+            for check in list(self.checks.values()):
+                if check.due(now):
+                    check.run()
+            now = time.monotonic()
+            next_due = min((check.checked_monotonic + check.interval - now
+                            for check in self.checks.values() if check.checked_monotonic is not None),
+                           default=60.0)
+            self._wake.wait(max(0.5, next_due))
+            self._wake.clear()
+
+    def result(self, name, refresh=False):
+        """(latest value, info) for check `name`, running it first if it never ran or refresh is set"""
+        check = self.checks[name]
+        if refresh or check.checked_monotonic is None:
+            check.run()
+        return check.value, check.info()
+
+    def last_value(self, name):
+        """The previous result without running anything; None before the first run"""
+        return self.checks[name].value
+
+    def info(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            'checks': {name: check.info() for name, check in self.checks.items()}
+        }
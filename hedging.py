@@ -0,0 +1,325 @@
+"""
+Deadline-bounded, hedged and retried calls to cloud backends
+
+A few Vision calls take ten times longer than the rest for reasons on the
+server side. Instead of waiting them out, a hedged call sends a duplicate
+request once the first has been outstanding longer than a recent latency
+percentile and takes whichever answer comes back first. A budget caps
+hedges to a fraction of all calls so an overloaded backend is not hit
+twice as hard. Failures with retryable status codes are retried with
+jittered exponential backoff while the deadline allows.
+
+    policy = HedgePolicy('google_cloud_vision')
+    result = policy.call(lambda timeout: client.text_detection(image=image, timeout=timeout), deadline=10)
+
+`func` always receives the time left until the deadline, to pass on as
+the gRPC timeout.
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import lazy_imports
+import tracing
+
+GOOGLE_EXCEPTIONS_MODULE = 'google.api_core.exceptions'
+google_exceptions = lazy_imports.lazy_module(GOOGLE_EXCEPTIONS_MODULE)
+
+# Status codes worth another attempt: the backend was busy or briefly
+# unreachable, not wrong about the request
+RETRYABLE_EXCEPTION_NAMES = ('ServiceUnavailable', 'InternalServerError', 'TooManyRequests',
+                             'ResourceExhausted', 'Aborted', 'DeadlineExceeded')
+_retryable_exceptions = None
+
+# Hedged attempts run here so the caller can wait on whichever finishes first;
+# size it for two attempts per concurrent OCR request
+HEDGE_THREADS = int(os.getenv('HEDGE_THREADS', '32'))
+_executor = ThreadPoolExecutor(max_workers=HEDGE_THREADS, thread_name_prefix='hedge')
+
+def is_retryable(error):
+    global _retryable_exceptions
+    if isinstance(error, ConnectionError):
+        return True
+    # A Google API error can only exist once its module has been imported;
+    # don't import the SDK just to find out this error isn't one
+    if not lazy_imports.is_loaded(GOOGLE_EXCEPTIONS_MODULE):
+        return False
+    if _retryable_exceptions is None:
+        _retryable_exceptions = tuple(getattr(google_exceptions, name) for name in RETRYABLE_EXCEPTION_NAMES)
+    return isinstance(error, _retryable_exceptions)
+
+class LatencyTracker:
+    """Recent successful call latencies, for the hedge delay percentile"""
+
+    def __init__(self, size=500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct):
+        with self._lock:
+            values = sorted(self._samples)
+        if not values:
+            return None
+        index = min(len(values) - 1, max(0, int(round(pct / 100.0 * len(values))) - 1))
+        return values[index]
+
+class HedgeBudget:
+    """Token bucket allowing hedges for at most `ratio` of all calls"""
+
+    def __init__(self, ratio, burst=5):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = float(burst)
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+class HedgePolicy:
+    """Hedging, retry and deadline settings plus statistics for one backend"""
+
+    def __init__(self, name, enabled=True, percentile=95, initial_delay=2.0, min_delay=0.2,
+                 budget_ratio=0.1, max_retries=2, backoff_base=0.2, backoff_max=2.0, min_samples=20):
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker()
+        self.budget = HedgeBudget(budget_ratio)
+
+        self._lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'attempts': 0,
+            'hedges_sent': 0,
+            'hedge_wins': 0,
+            'hedges_denied': 0,
+            'retries': 0,
+            'deadline_exceeded': 0
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def hedge_delay(self):
+        """How long to wait for the first attempt before sending a hedge"""
+        if len(self.latencies) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def backoff(self, retry):
+        """Full-jitter exponential backoff for the given retry number"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** retry)))
+
+    def _deadline_error(self, last_error):
+        self._count('deadline_exceeded')
+        message = f"{self.name} deadline exceeded"
+        if last_error is not None:
+            message += f" (last error: {last_error})"
+        return google_exceptions.DeadlineExceeded(message)
+
+    # Sync ----------------------------------------------------------------
+
+    def call(self, func, deadline):
+        """Call func(timeout) with hedging and retries until `deadline` seconds have passed"""
+        deadline_at = time.monotonic() + deadline
+        self._count('calls')
+        self.budget.record_call()
+
+        last_error = None
+        for retry in range(self.max_retries + 1):
+            if retry:
+                pause = self.backoff(retry - 1)
+                if time.monotonic() + pause >= deadline_at:
+                    break
+                self._count('retries')
+                time.sleep(pause)
+            try:
+                return self._hedged_attempt(func, deadline_at)
+            except Exception as e:
+                if not is_retryable(e) or time.monotonic() >= deadline_at:
+                    raise
+                last_error = e
+        raise last_error
+
+    def _submit(self, func, deadline_at, hedge=False):
+        self._count('attempts')
+        started = time.monotonic()
+
+        def attempt():
+            with tracing.span(f'{self.name}.attempt', hedge=hedge):
+                result = func(max(0.001, deadline_at - time.monotonic()))
+            self.latencies.add(time.monotonic() - started)
+            return result
+
+        # Run in the caller's context so the attempt's span joins its trace
+        return _executor.submit(contextvars.copy_context().run, attempt)
+
+    def _hedged_attempt(self, func, deadline_at):
+        if not self.enabled:
+            # No hedge to race against, so stay on the caller's thread
+            self._count('attempts')
+            started = time.monotonic()
+            with tracing.span(f'{self.name}.attempt', hedge=False):
+                result = func(max(0.001, deadline_at - started))
+            self.latencies.add(time.monotonic() - started)
+            return result
+
+        primary = self._submit(func, deadline_at)
+        pending = {primary}
+        hedge = None
+        error = None
+
+        delay = min(self.hedge_delay(), max(0.0, deadline_at - time.monotonic()))
+        done, _ = wait(pending, timeout=delay)
+        if not done:
+            if self.budget.try_spend():
+                self._count('hedges_sent')
+                hedge = self._submit(func, deadline_at, hedge=True)
+                pending.add(hedge)
+            else:
+                self._count('hedges_denied')
+
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise self._deadline_error(error)
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+        if error is None:
+            raise self._deadline_error(None)
+        raise error
+
+    # Async ---------------------------------------------------------------
+
+    async def call_async(self, func, deadline):
+        """Async twin of call(); func(timeout) returns an awaitable"""
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + deadline
+        self._count('calls')
+        self.budget.record_call()
+
+        last_error = None
+        for retry in range(self.max_retries + 1):
+            if retry:
+                pause = self.backoff(retry - 1)
+                if loop.time() + pause >= deadline_at:
+                    break
+                self._count('retries')
+                await asyncio.sleep(pause)
+            try:
+                return await self._hedged_attempt_async(func, deadline_at)
+            except Exception as e:
+                if not is_retryable(e) or loop.time() >= deadline_at:
+                    raise
+                last_error = e
+        raise last_error
+
+    def _start(self, func, deadline_at, hedge=False):
+        loop = asyncio.get_running_loop()
+        self._count('attempts')
+        started = loop.time()
+
+        async def attempt():
+            with tracing.span(f'{self.name}.attempt', hedge=hedge):
+                result = await func(max(0.001, deadline_at - loop.time()))
+            self.latencies.add(loop.time() - started)
+            return result
+
+        return asyncio.ensure_future(attempt())
+
+    async def _hedged_attempt_async(self, func, deadline_at):
+        loop = asyncio.get_running_loop()
+        primary = self._start(func, deadline_at)
+        pending = {primary}
+        hedge = None
+        error = None
+
+        try:
+            if self.enabled:
+                delay = min(self.hedge_delay(), max(0.0, deadline_at - loop.time()))
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    if self.budget.try_spend():
+                        self._count('hedges_sent')
+                        hedge = self._start(func, deadline_at, hedge=True)
+                        pending.add(hedge)
+                    else:
+                        self._count('hedges_denied')
+
+            while pending:
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    raise self._deadline_error(error)
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+            if error is None:
+                raise self._deadline_error(None)
+            raise error
+        finally:
+            # Unlike threads, the losing coroutine can be cancelled outright
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def snapshot(self):
+        """Settings and counters for /api/ocr/info"""
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            'enabled': self.enabled,
+            'hedge_percentile': self.percentile,
+            'hedge_delay_seconds': round(self.hedge_delay(), 3),
+            'budget_ratio': self.budget.ratio,
+            'budget_tokens': round(self.budget.tokens, 2),
+            'max_retries': self.max_retries,
+            'latency_samples': len(self.latencies),
+            'p50_seconds': _rounded(self.latencies.percentile(50)),
+            'p95_seconds': _rounded(self.latencies.percentile(95)),
+            'p99_seconds': _rounded(self.latencies.percentile(99)),
+            **stats
+        }
+
+def _rounded(value):
+    return round(value, 3) if value is not None else None
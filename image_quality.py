@@ -0,0 +1,172 @@
+"""
+Fast quality scoring of page images before they are saved and sent to OCR
+
+A blurry, glare-washed or mostly empty frame still costs a Vision call and
+gives back little text. score_gray() looks at a gray copy scaled down to
+ANALYSIS_WIDTH pixels, which takes a few milliseconds, and measures:
+
+    sharpness      variance of the Laplacian over the squared tonal range,
+                   so a dim page is not mistaken for a blurry one
+    contrast       spread between the 1st and 99th brightness percentile (0-1)
+    glare          fraction of saturated pixels brighter than the paper (0-1)
+    edge_density   fraction of pixels on an edge (Canny)
+    text_coverage  fraction of an 8x8 grid of tiles dense enough in edges to hold text
+
+QualityGate.check() compares them with THRESHOLDS. Each metric has a warn
+and a reject limit; the verdict is the worst of them.
+
+    gate = QualityGate(mode='reject')
+    report = gate.check(gray)   # {'verdict': 'ok'|'warn'|'reject', 'scores': {...}, 'issues': [...]}
+"""
+
+import io
+import time
+
+from PIL import Image
+
+import lazy_imports
+
+cv2 = lazy_imports.lazy_module('cv2')
+np = lazy_imports.lazy_module('numpy')
+
+MODES = ('reject', 'warn', 'off')
+ANALYSIS_WIDTH = 640
+GRID_TILES = 8
+# A tile with this share of edge pixels is counted as holding text
+TEXT_TILE_EDGE_DENSITY = 0.02
+SATURATED_LEVEL = 250
+# Pixels count as glare only this far above the paper, so a white page that
+# is lit evenly (or a synthetic test page) is not flagged
+GLARE_MARGIN = 20
+
+# metric -> (kind, warn limit, reject limit); 'min' metrics fail below their
+# limits, 'max' metrics above. Calibrated on 640 px wide page images with
+# 20 px text: sharp pages score several hundred, Gaussian blur with sigma 2
+# around 25 (still readable) and sigma 3 under 10.
+THRESHOLDS = {
+    'sharpness': ('min', 100.0, 15.0),
+    'glare': ('max', 0.05, 0.25),
+    'contrast': ('min', 0.25, 0.10),
+    'text_coverage': ('min', 0.15, 0.03),
+}
+
+# metric -> (issue category, advice shown to the user)
+ISSUES = {
+    'sharpness': ('blurry', 'Image is blurry - hold the camera steady and let it focus'),
+    'glare': ('glare', 'Glare on the page - tilt the page or move the light'),
+    'contrast': ('low_contrast', 'Low contrast - add light or clean the lens'),
+    'text_coverage': ('no_text', 'Little text in view - move closer or center the page'),
+}
+
+def analysis_gray(gray, width=ANALYSIS_WIDTH):
+    """`gray` scaled down to `width` pixels wide (never up)"""
+    # INTER_AREA is only fast for exact halving; the last step, less than 2x,
+    # is bilinear, which is many times cheaper than INTER_AREA at odd ratios
+    while gray.shape[1] >= 2 * width:
+        gray = cv2.resize(gray, (gray.shape[1] // 2, gray.shape[0] // 2), interpolation=cv2.INTER_AREA)
+    height, current_width = gray.shape[:2]
+    if current_width <= width:
+        return gray
+    return cv2.resize(gray, (width, max(1, round(height * width / current_width))), interpolation=cv2.INTER_LINEAR)
+
+def decode_gray(data, width=ANALYSIS_WIDTH):
+    """Gray image from encoded bytes, decoded at 1/2, 1/4 or 1/8 scale when still `width` wide.
+
+    JPEG decoders can skip most of the work at those scales, which makes a
+    phone photo several times cheaper to score. None if the bytes don't decode."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            full_width = image.width
+    except Exception:
+        return None
+    flag = cv2.IMREAD_GRAYSCALE
+    for factor, reduced in ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                            (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)):
+        if full_width // factor >= width:
+            flag = reduced
+            break
+    return cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+
+def score_gray(gray, width=ANALYSIS_WIDTH):
+    """Quality scores for a single-channel 8-bit image"""
+    small = analysis_gray(gray, width)
+    pixels = small.size
+
+    cumulative = cv2.calcHist([small], [0], None, [256], [0, 256]).ravel().cumsum()
+    def percentile(fraction):
+        return int(np.searchsorted(cumulative, fraction * pixels))
+    low, paper, high = percentile(0.01), percentile(0.25), percentile(0.99)
+    tonal_range = high - low
+
+    laplacian = cv2.Laplacian(small, cv2.CV_16S, ksize=3)
+    laplacian_variance = float(cv2.meanStdDev(laplacian)[1][0][0]) ** 2
+    sharpness = laplacian_variance / max(tonal_range, 1) ** 2 * 1000 if tonal_range else 0.0
+
+    glare_level = max(SATURATED_LEVEL, paper + GLARE_MARGIN)
+    glare = float(pixels - cumulative[glare_level - 1]) / pixels if glare_level <= 255 else 0.0
+
+    edges = cv2.Canny(small, 50, 150)
+    edge_density = cv2.countNonZero(edges) / pixels
+    # INTER_AREA down to the grid averages each tile's edge pixels
+    tiles = cv2.resize(edges, (GRID_TILES, GRID_TILES), interpolation=cv2.INTER_AREA)
+    text_coverage = cv2.countNonZero((tiles >= TEXT_TILE_EDGE_DENSITY * 255).astype(np.uint8)) / tiles.size
+
+    return {
+        'sharpness': round(sharpness, 1),
+        'contrast': round(tonal_range / 255, 3),
+        'glare': round(glare, 4),
+        'edge_density': round(edge_density, 4),
+        'text_coverage': round(text_coverage, 3),
+        'brightness': round(float(cv2.mean(small)[0]), 1),
+        'analysed_width': small.shape[1]
+    }
+
+def assess(scores, thresholds=THRESHOLDS):
+    """('ok' | 'warn' | 'reject', issues worst first) for a set of scores"""
+    issues = []
+    for metric, (kind, warn_limit, reject_limit) in thresholds.items():
+        value = scores[metric]
+        if kind == 'min':
+            severity = 'reject' if value < reject_limit else 'warn' if value < warn_limit else None
+        else:
+            severity = 'reject' if value > reject_limit else 'warn' if value > warn_limit else None
+        if severity:
+            issue, advice = ISSUES[metric]
+            issues.append({'issue': issue, 'metric': metric, 'value': value, 'severity': severity,
+                           'limit': reject_limit if severity == 'reject' else warn_limit, 'advice': advice})
+    issues.sort(key=lambda issue: issue['severity'] != 'reject')
+    verdict = issues[0]['severity'] if issues else 'ok'
+    return verdict, issues
+
+class QualityGate:
+    """Scores frames and decides whether they are good enough to keep"""
+
+    def __init__(self, mode='reject', width=ANALYSIS_WIDTH, thresholds=None):
+        if mode not in MODES:
+            raise ValueError(f"quality gate mode must be one of {', '.join(MODES)}")
+        self.mode = mode
+        self.width = width
+        self.thresholds = thresholds or THRESHOLDS
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def check(self, gray):
+        """Quality report for a gray frame, or None when the gate is off.
+
+        In 'warn' mode reject-level issues are reported but the verdict
+        is at most 'warn', so the frame is kept."""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        scores = score_gray(gray, self.width)
+        verdict, issues = assess(scores, self.thresholds)
+        if verdict == 'reject' and self.mode == 'warn':
+            verdict = 'warn'
+        return {
+            'verdict': verdict,
+            'scores': scores,
+            'issues': issues,
+            'milliseconds': round((time.perf_counter() - started) * 1000, 2)
+        }
@@ -0,0 +1,187 @@
+"""
+Deferred imports of heavy modules, background preloading and startup timing
+
+cv2, numpy and the Google Cloud SDKs together take most of a second to
+import, which every gunicorn worker and every restart used to pay before
+it could answer anything. A LazyModule stands in for such a module and
+imports it on first attribute access, so the server starts listening with
+only Flask loaded. preload() then imports the rest on a background thread
+shortly after startup, so the first capture or OCR request usually finds
+them loaded already.
+
+    cv2 = lazy_imports.lazy_module('cv2')
+    cv2.imencode(...)                        # imports cv2 here, once
+    lazy_imports.preload(['cv2', 'google.cloud.vision'], delay=1.0)
+
+LAZY_IMPORTS=0 imports everything at lazy_module() time, as before, which
+is the baseline benchmarks/bench_suite.py --phases startup compares with.
+"""
+
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+import metrics
+
+LAZY_IMPORTS = os.getenv('LAZY_IMPORTS', '1') == '1'
+
+MODULE_IMPORT_SECONDS = metrics.gauge('storyreader_module_import_seconds',
+                                      'Time the first import of a deferred module took', ('module', 'trigger'))
+STARTUP_SECONDS = metrics.gauge('storyreader_startup_seconds',
+                                'Time from process start to each startup milestone', ('phase',))
+
+log = logging.getLogger('storyreader.startup')
+
+class LazyModule:
+    """Proxy that imports the named module the first time an attribute is read"""
+
+    def __init__(self, name):
+        self._lazy_name = name
+        self._lazy_module = None
+        self._lazy_lock = threading.Lock()
+        self._lazy_import = None  # {'seconds', 'trigger', 'thread'} once loaded
+
+    def _load(self, trigger='first_use'):
+        module = self._lazy_module
+        if module is not None:
+            return module
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                already_loaded = self._lazy_name in sys.modules
+                started = time.perf_counter()
+                module = importlib.import_module(self._lazy_name)
+                seconds = 0.0 if already_loaded else time.perf_counter() - started
+                self._lazy_import = {'seconds': round(seconds, 4), 'trigger': trigger,
+                                     'thread': threading.current_thread().name}
+                MODULE_IMPORT_SECONDS.set(seconds, module=self._lazy_name, trigger=trigger)
+                if seconds >= 0.05 and trigger == 'first_use':
+                    # Someone waited for this; a preload could have hidden it
+                    log.info("📦 Imported %s on first use in %.0f ms", self._lazy_name, seconds * 1000)
+                self._lazy_module = module
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        value = getattr(self._load(), attr)
+        # Later reads of this attribute skip __getattr__ entirely
+        self.__dict__[attr] = value
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self._lazy_module is not None else 'not loaded'
+        return f"<lazy module {self._lazy_name!r} ({state})>"
+
+_modules = {}
+_modules_lock = threading.Lock()
+
+def lazy_module(name):
+    """The shared proxy for `name`; imports right away when LAZY_IMPORTS=0"""
+    with _modules_lock:
+        proxy = _modules.get(name)
+        if proxy is None:
+            proxy = _modules[name] = LazyModule(name)
+    if not LAZY_IMPORTS:
+        proxy._load(trigger='eager')
+    return proxy
+
+def is_loaded(name):
+    """True once `name` has been imported, through a proxy or directly"""
+    return name in sys.modules
+
+_preload_thread = None
+_preload_pid = None
+
+def preload(names, delay=0.0):
+    """Import `names` on a daemon thread after `delay` seconds; once per process"""
+    global _preload_thread, _preload_pid
+    with _modules_lock:
+        if _preload_pid == os.getpid():
+            return _preload_thread
+        _preload_pid = os.getpid()
+        _preload_thread = threading.Thread(target=_preload, args=(list(names), delay),
+                                           name='module-preload', daemon=True)
+        _preload_thread.start()
+        return _preload_thread
+
+def _preload(names, delay):
+    if delay > 0:
+        # Give the server time to bind and answer health checks first
+        time.sleep(delay)
+    started = time.perf_counter()
+    for name in names:
+        try:
+            lazy_module(name)._load(trigger='preload')
+        except ImportError as e:
+            log.warning("⚠️ Could not preload %s: %s", name, e)
+    seconds = time.perf_counter() - started
+    STARTUP_SECONDS.set(process_uptime(), phase='preload_done')
+    log.info("📦 Preloaded %d modules in %.0f ms", len(names), seconds * 1000)
+
+def status():
+    """Import state of every deferred module, for /api/startup"""
+    with _modules_lock:
+        proxies = dict(_modules)
+    return {
+        'lazy_imports': LAZY_IMPORTS,
+        'modules': {name: {'loaded': is_loaded(name), **(proxy._lazy_import or {})}
+                    for name, proxy in sorted(proxies.items())}
+    }
+
+# Startup timing --------------------------------------------------------
+
+def _read_process_start_time():
+    # /proc/self/stat field 22 is the start time in clock ticks since boot and
+    # /proc/uptime the time since boot, both to 10 ms; without /proc, fall
+    # back to when this module was imported
+    try:
+        with open('/proc/self/stat') as f:
+            fields = f.read().rpartition(')')[2].split()
+        with open('/proc/uptime') as f:
+            since_boot = float(f.read().split()[0])
+        return time.time() - (since_boot - int(fields[19]) / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+PROCESS_STARTED_AT = _read_process_start_time()
+
+def _reset_start_time_after_fork():
+    # A forked worker (gunicorn --preload) starts its own clock
+    global PROCESS_STARTED_AT, _first_response_recorded
+    PROCESS_STARTED_AT = time.time()
+    _first_response_recorded = False
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_start_time_after_fork)
+
+def process_uptime():
+    """Seconds since this process started"""
+    return max(0.0, time.time() - PROCESS_STARTED_AT)
+
+_first_response_recorded = False
+
+def record_startup(phase):
+    """Set the startup gauge for `phase` to the time since process start"""
+    seconds = process_uptime()
+    STARTUP_SECONDS.set(seconds, phase=phase)
+    return seconds
+
+def record_first_response():
+    """Record time to first response; cheap no-op after the first call"""
+    global _first_response_recorded
+    if _first_response_recorded:
+        return
+    _first_response_recorded = True
+    seconds = record_startup('first_response')
+    log.info("🚀 First response %.2fs after process start", seconds)
+
+def startup_info():
+    return {
+        'process_started_at': PROCESS_STARTED_AT,
+        'uptime_seconds': round(process_uptime(), 3),
+        'milestones': {labels['phase']: round(series.value, 3) for labels, series in STARTUP_SECONDS.series()}
+    }
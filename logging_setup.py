@@ -0,0 +1,171 @@
+"""
+Logging for the app: levels, a non-blocking queue handler and JSON output
+
+configure_logging() installs one handler on the root logger that only puts
+records on a bounded queue; a QueueListener thread formats them and writes
+to stdout (and LOG_FILE if set). A slow terminal or journald then delays
+the listener, not captures or requests. When the queue is full, records
+are dropped and counted instead of blocking.
+
+    LOG_LEVEL   DEBUG | INFO (default) | WARNING | ERROR
+    LOG_FORMAT  text (default) | json, one object per line for log shippers
+    LOG_FILE    also write to this file, rotated at LOG_FILE_MAX_BYTES (10 MB)
+
+Loggers that can fire in a tight loop get a RateLimitFilter, which lets a
+few records per message through each interval and reports how many were
+suppressed when the next one passes.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+LOG_RECORDS_DROPPED = metrics.counter('storyreader_log_records_dropped_total',
+                                      'Log records dropped because the log queue was full')
+LOG_RECORDS_SUPPRESSED = metrics.counter('storyreader_log_records_suppressed_total',
+                                         'Repeated log records held back by rate limiting', ('logger',))
+
+TEXT_FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any `extra` fields at the top level"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of waiting when the queue is full"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+class RateLimitFilter(logging.Filter):
+    """Let `burst` records per message template through every `interval` seconds"""
+
+    def __init__(self, burst=5, interval=10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > 1000:
+                    # Templates with variable text would otherwise grow this forever
+                    self._windows = {key: self._windows[key]}
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                LOG_RECORDS_SUPPRESSED.inc(logger=record.name)
+                return False
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+_queue_handler = None
+_listener = None
+_configure_lock = threading.Lock()
+
+def build_handlers(fmt, log_file=None):
+    """The handlers the listener thread writes through"""
+    formatter = JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=int(os.getenv('LOG_FILE_MAX_BYTES', str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv('LOG_FILE_BACKUPS', '5')), encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def configure_logging(level=None, fmt=None, log_file=None, handlers=None, queue_size=None):
+    """Route all logging through a background queue; safe to call more than once"""
+    global _queue_handler, _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+        fmt = (fmt or os.getenv('LOG_FORMAT', 'text')).lower()
+        if handlers is None:
+            handlers = build_handlers(fmt, log_file or os.getenv('LOG_FILE'))
+
+        log_queue = queue.Queue(maxsize=queue_size or int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+        _queue_handler = NonBlockingQueueHandler(log_queue)
+        root = logging.getLogger()
+        root.addHandler(_queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Write out queued records and stop the listener thread"""
+    global _queue_handler, _listener
+    with _configure_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = _listener = None
+
+def _restart_listener_after_fork():
+    # The listener thread does not survive fork (gunicorn --preload, process
+    # pools); give the child a fresh queue and thread of its own
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.Queue(maxsize=_queue_handler.queue.maxsize)
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+def rate_limited_logger(name, burst=5, interval=10.0):
+    """Logger for messages that may repeat in a loop"""
+    logger = logging.getLogger(name)
+    if not any(isinstance(existing, RateLimitFilter) for existing in logger.filters):
+        logger.addFilter(RateLimitFilter(burst, interval))
+    return logger
@@ -0,0 +1,440 @@
+"""
+Thread-safe counters, gauges and histograms with Prometheus text exposition
+
+Metrics are registered once at import time and updated from any request
+thread. Histograms keep cumulative buckets for /metrics and a bounded
+window of recent timestamped samples, so JSON endpoints can report
+p50/p95/p99 over the last 1, 5 and 15 minutes without a Prometheus server.
+
+    CAPTURES = metrics.counter('storyreader_captures_total', 'Capture attempts', ('result',))
+    CAPTURES.inc(result='success')
+
+    STAGE_SECONDS = metrics.histogram('storyreader_capture_stage_seconds', 'Capture stages', ('stage',))
+    with STAGE_SECONDS.time(stage='encode'):
+        ...
+    STAGE_SECONDS.percentiles(300, stage='encode')   # {'p50': ..., 'p95': ..., 'p99': ...}
+
+    metrics.render()   # text for GET /metrics
+
+snapshot() copies every family into plain lists and dicts, which another
+process can send over a pipe. render_snapshots() renders several
+processes' snapshots as one exposition, each family once, with labels
+that tell the processes apart.
+
+Under gunicorn each scrape reaches one worker at random. With
+METRICS_MULTIPROCESS_DIR set, start_sharing() makes every process write its
+snapshot there every METRICS_FLUSH_SECONDS, and render_shared() sums them:
+counters and histograms over all processes of a role, including workers
+that have exited, and gauges per live process with a `pid` label.
+"""
+
+import atexit
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans a cached file read up to a slow cloud call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Rolling windows reported next to lifetime totals
+WINDOWS = (('1m', 60), ('5m', 300), ('15m', 900))
+
+MULTIPROCESS_DIR = os.getenv('METRICS_MULTIPROCESS_DIR')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+class Metric:
+    """A named family of series, one per combination of label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _series_for(self, labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def clear(self):
+        """Drop every series, e.g. when the stats they feed are reset"""
+        with self._lock:
+            self._series = {}
+
+    def series(self):
+        """[(labels dict, series)] snapshot"""
+        with self._lock:
+            items = list(self._series.items())
+        return [(dict(zip(self.labelnames, key)), series) for key, series in items]
+
+    def snapshot(self):
+        """This family as plain data: kind, documentation, label names and [label values, value] per series"""
+        return {
+            'kind': self.kind,
+            'documentation': self.documentation,
+            'labelnames': list(self.labelnames),
+            'series': [[list(labels.values()), self._series_value(series)] for labels, series in self.series()]
+        }
+
+    def _series_value(self, series):
+        return series.value
+
+class _Value:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def _new_series(self):
+        return _Value()
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('Counters only go up')
+        series = self._series_for(labels)
+        with self._lock:
+            series.value += amount
+
+    def value(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series.value if series else 0.0
+
+    def total(self):
+        """Sum over all label values"""
+        return sum(series.value for _, series in self.series())
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+
+    kind = 'gauge'
+
+    def _new_series(self):
+        return _Value()
+
+    def set(self, value, **labels):
+        series = self._series_for(labels)
+        with self._lock:
+            series.value = value
+
+    def inc(self, amount=1, **labels):
+        series = self._series_for(labels)
+        with self._lock:
+            series.value += amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series.value if series else None
+
+class _HistogramSeries:
+    __slots__ = ('buckets', 'count', 'sum', 'recent')
+
+    def __init__(self, bucket_count, window_samples):
+        self.buckets = [0] * bucket_count
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window_samples)
+
+class Histogram(Metric):
+    """Distribution of observed values: cumulative buckets plus recent samples for percentiles"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, window_samples=5000):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.window_samples = window_samples
+
+    def _new_series(self):
+        return _HistogramSeries(len(self.buckets), self.window_samples)
+
+    def observe(self, value, **labels):
+        series = self._series_for(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        now = time.monotonic()
+        with self._lock:
+            if index < len(self.buckets):
+                series.buckets[index] += 1
+            series.count += 1
+            series.sum += value
+            series.recent.append((now, value))
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series.count if series else 0
+
+    def percentiles(self, window_seconds=None, pcts=(50, 95, 99), **labels):
+        """{'p50': ..., ...} over samples from the last `window_seconds` (all kept samples if None)"""
+        series = self._series.get(self._key(labels))
+        values = []
+        if series is not None:
+            cutoff = time.monotonic() - window_seconds if window_seconds else None
+            with self._lock:
+                values = [value for at, value in series.recent if cutoff is None or at >= cutoff]
+        values.sort()
+        result = {}
+        for pct in pcts:
+            if values:
+                index = min(len(values) - 1, max(0, int(round(pct / 100.0 * len(values))) - 1))
+                result[f'p{pct}'] = values[index]
+            else:
+                result[f'p{pct}'] = None
+        result['samples'] = len(values)
+        return result
+
+    def summary(self, digits=4, **labels):
+        """Lifetime count/sum and percentiles for each rolling window"""
+        series = self._series.get(self._key(labels))
+        summary = {
+            'count': series.count if series else 0,
+            'sum': round(series.sum, digits) if series else 0.0
+        }
+        for window_name, seconds in WINDOWS:
+            summary[window_name] = {key: (round(value, digits) if isinstance(value, float) else value)
+                                    for key, value in self.percentiles(seconds, **labels).items()}
+        return summary
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot['buckets'] = list(self.buckets)
+        return snapshot
+
+    def _series_value(self, series):
+        # Per-bucket counts, not cumulative, so snapshots of several processes add up
+        with self._lock:
+            return {'buckets': list(series.buckets), 'count': series.count, 'sum': series.sum}
+
+class Registry:
+    """The set of metrics rendered by /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Re-importing a module must not create a second family
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, window_samples=5000):
+        return self.register(Histogram(name, documentation, labelnames, buckets, window_samples))
+
+    def snapshot(self):
+        """{name: family snapshot} of every metric, for render_snapshots() in another process"""
+        with self._lock:
+            families = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in families}
+
+    def render(self):
+        """Prometheus text exposition of every metric with data"""
+        return render_snapshots([({}, self.snapshot())])
+
+def _label_text(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _family_samples(name, family, extra):
+    """(sample name, label pairs, value) for every series of a family snapshot"""
+    samples = []
+    for values, value in family['series']:
+        labels = list(zip(family['labelnames'], values)) + list(extra.items())
+        if family['kind'] != 'histogram':
+            samples.append((name, labels, value))
+            continue
+        cumulative = 0
+        for bound, bucket_count in zip(family['buckets'], value['buckets']):
+            cumulative += bucket_count
+            samples.append((f'{name}_bucket', labels + [('le', _format(bound))], cumulative))
+        samples.append((f'{name}_bucket', labels + [('le', '+Inf')], value['count']))
+        samples.append((f'{name}_sum', labels, value['sum']))
+        samples.append((f'{name}_count', labels, value['count']))
+    return samples
+
+def render_snapshots(sources):
+    """One exposition from [(extra labels, snapshot)]: each family once, each source's series carrying its labels"""
+    families = {}
+    for extra, snapshot in sources:
+        for name, family in snapshot.items():
+            families.setdefault(name, []).append((extra, family))
+    lines = []
+    for name in sorted(families):
+        samples = [sample for extra, family in families[name] for sample in _family_samples(name, family, extra)]
+        if not samples:
+            continue
+        first = families[name][0][1]
+        lines.extend([f'# HELP {name} {first["documentation"]}', f'# TYPE {name} {first["kind"]}'])
+        lines.extend(f'{sample}{_label_text(labels)} {_format(value)}' for sample, labels, value in samples)
+    return '\n'.join(lines) + '\n' if lines else ''
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+snapshot = REGISTRY.snapshot
+
+# Sharing between processes ------------------------------------------------
+
+_sharing_role = None
+_sharing_pid = None
+_sharing_lock = threading.Lock()
+
+def _snapshot_path(role, pid):
+    return os.path.join(MULTIPROCESS_DIR, f"{role}_{pid}.json")
+
+def write_shared_snapshot():
+    """Write this process's snapshot where the other processes read it"""
+    path = _snapshot_path(_sharing_role, os.getpid())
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(temporary_path, path)
+
+def _share_forever():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            write_shared_snapshot()
+        except OSError:
+            pass
+
+def start_sharing(role):
+    """Write snapshots as `role` ('worker', 'camera') to METRICS_MULTIPROCESS_DIR; once per process, no-op without it"""
+    global _sharing_role, _sharing_pid
+    if not MULTIPROCESS_DIR:
+        return False
+    with _sharing_lock:
+        if _sharing_pid == os.getpid():
+            return True
+        _sharing_role, _sharing_pid = role, os.getpid()
+        os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+        write_shared_snapshot()
+        threading.Thread(target=_share_forever, name='metrics-share', daemon=True).start()
+        atexit.register(write_shared_snapshot)
+    return True
+
+def sharing():
+    return _sharing_pid is not None and _sharing_pid == os.getpid()
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def merge_snapshots(snapshots):
+    """One snapshot from [(pid, alive, snapshot)]: counters and histograms summed, gauges of live processes by pid"""
+    merged = {}
+    for pid, alive, process_snapshot in snapshots:
+        for name, family in process_snapshot.items():
+            is_gauge = family['kind'] == 'gauge'
+            if is_gauge and not alive:
+                continue
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = dict(family, series={},
+                                             labelnames=family['labelnames'] + (['pid'] if is_gauge else []))
+            for values, value in family['series']:
+                if is_gauge:
+                    target['series'][tuple(values) + (str(pid),)] = value
+                    continue
+                key = tuple(values)
+                current = target['series'].get(key)
+                if current is None:
+                    target['series'][key] = value if family['kind'] != 'histogram' else dict(value, buckets=list(value['buckets']))
+                elif family['kind'] == 'histogram':
+                    current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+                    current['count'] += value['count']
+                    current['sum'] += value['sum']
+                else:
+                    target['series'][key] = current + value
+    for family in merged.values():
+        family['series'] = [[list(key), value] for key, value in family['series'].items()]
+    return merged
+
+def render_shared():
+    """Exposition summed over every process sharing METRICS_MULTIPROCESS_DIR, with a `process` label per role"""
+    by_role = {}
+    for path in glob.glob(os.path.join(MULTIPROCESS_DIR, '*.json')):
+        role, _, pid = os.path.basename(path)[:-len('.json')].rpartition('_')
+        if not pid.isdigit():
+            continue
+        pid = int(pid)
+        if pid == os.getpid():
+            continue  # Added live below
+        try:
+            with open(path) as f:
+                process_snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        by_role.setdefault(role, []).append((pid, _alive(pid), process_snapshot))
+    if sharing():
+        by_role.setdefault(_sharing_role, []).append((os.getpid(), True, snapshot()))
+    return render_snapshots([({'process': role}, merge_snapshots(snapshots))
+                             for role, snapshots in sorted(by_role.items())])
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,296 @@
+"""
+Pluggable OCR backends and a router that picks one per request
+
+Every engine implements OCRBackend: whether it is usable right now, what
+it can do (local or cloud, batching, languages), what a page costs and
+how good its output is. The router orders the usable backends for the
+requested quality setting and falls through to the next one on failure:
+
+    best     highest quality first (cloud Vision, then local engines)
+    fast     lowest observed latency first
+    offline  local engines only, nothing leaves the machine
+
+Backends shipped here:
+
+    VisionBackend     Google Cloud Vision, wrapping the app's hedged and
+                      circuit-broken call
+    TesseractBackend  Local Tesseract through pytesseract (optional; needs
+                      the tesseract binary on PATH)
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import time
+
+import lazy_imports
+import tracing
+from hedging import LatencyTracker
+
+log = logging.getLogger(__name__)
+
+# pytesseract pulls in numpy; import it when Tesseract is first asked for
+pytesseract = lazy_imports.lazy_module('pytesseract')
+PYTESSERACT_INSTALLED = importlib.util.find_spec('pytesseract') is not None
+
+QUALITY_SETTINGS = ('best', 'fast', 'offline')
+QUALITY_RANK = {'high': 2, 'standard': 1, 'low': 0}
+
+NO_TEXT = "No text detected in image"
+
+class OCRBackendUnavailable(Exception):
+    """Raised when no backend can serve a request"""
+
+class OCRBackend:
+    """Base class for OCR engines"""
+
+    name = 'backend'
+    local = False              # Runs on this machine, works offline
+    quality = 'standard'       # 'high' | 'standard' | 'low'
+    cost_per_page = 0.0        # USD per page, for reporting and routing
+    typical_latency = 1.0      # Seconds, until real latencies are observed
+    max_batch_size = 1         # Pages per recognize_batch call
+    languages = ('en',)
+
+    def __init__(self):
+        self.latencies = LatencyTracker(size=200)
+        self._lock = threading.Lock()
+        self.stats = {'pages': 0, 'failures': 0}
+
+    def availability(self):
+        """(available, reason) for routing and /api/ocr/info"""
+        return True, None
+
+    def recognize(self, image_path, deadline=None):
+        """Return the formatted text of one page"""
+        raise NotImplementedError
+
+    def recognize_batch(self, image_paths, deadline=None):
+        """Return the text of several pages; backends without batching loop"""
+        return [self.recognize(path, deadline) for path in image_paths]
+
+    async def recognize_async(self, image_path, deadline=None):
+        """Async variant; blocking engines run on a worker thread"""
+        return await asyncio.to_thread(self.recognize, image_path, deadline)
+
+    def expected_latency(self):
+        observed = self.latencies.percentile(50)
+        return observed if observed is not None else self.typical_latency
+
+    def record(self, seconds, pages=1, failed=False):
+        with self._lock:
+            if failed:
+                self.stats['failures'] += 1
+            else:
+                self.stats['pages'] += pages
+                self.latencies.add(seconds / max(pages, 1))
+
+    def capabilities(self):
+        available, reason = self.availability()
+        p50 = self.latencies.percentile(50)
+        p95 = self.latencies.percentile(95)
+        return {
+            'available': available,
+            'reason': reason,
+            'local': self.local,
+            'quality': self.quality,
+            'cost_per_page': self.cost_per_page,
+            'max_batch_size': self.max_batch_size,
+            'languages': list(self.languages),
+            'expected_latency_seconds': round(self.expected_latency(), 3),
+            'p50_seconds': round(p50, 3) if p50 is not None else None,
+            'p95_seconds': round(p95, 3) if p95 is not None else None,
+            **self.stats
+        }
+
+class VisionBackend(OCRBackend):
+    """Google Cloud Vision; the app supplies the actual call functions"""
+
+    name = 'google_cloud_vision'
+    quality = 'high'
+    # TEXT_DETECTION list price after the free tier: $1.50 per 1000 units
+    cost_per_page = 0.0015
+    typical_latency = 1.0
+    # Vision's images:annotate takes at most 16 images per request
+    max_batch_size = 16
+    languages = ('auto',)
+
+    def __init__(self, recognize, recognize_batch=None, availability=None, recognize_async=None):
+        super().__init__()
+        self._recognize = recognize
+        self._recognize_batch = recognize_batch
+        self._availability = availability
+        self._recognize_async = recognize_async
+
+    def use_async(self, recognize_async):
+        """Register the coroutine used by the async endpoints"""
+        self._recognize_async = recognize_async
+
+    def availability(self):
+        return self._availability() if self._availability else (True, None)
+
+    def recognize(self, image_path, deadline=None):
+        return self._recognize(image_path, deadline)
+
+    def recognize_batch(self, image_paths, deadline=None):
+        if self._recognize_batch is None:
+            return super().recognize_batch(image_paths, deadline)
+        texts = []
+        for start in range(0, len(image_paths), self.max_batch_size):
+            texts.extend(self._recognize_batch(image_paths[start:start + self.max_batch_size], deadline))
+        return texts
+
+    async def recognize_async(self, image_path, deadline=None):
+        if self._recognize_async is None:
+            return await super().recognize_async(image_path, deadline)
+        return await self._recognize_async(image_path, deadline)
+
+class TesseractBackend(OCRBackend):
+    """Local Tesseract engine through pytesseract"""
+
+    name = 'tesseract'
+    local = True
+    quality = 'standard'
+    cost_per_page = 0.0
+    typical_latency = 1.5
+
+    def __init__(self, lang='eng', config='--oem 1 --psm 3', postprocess=None, max_concurrency=None):
+        super().__init__()
+        self.lang = lang
+        self.config = config
+        self.languages = tuple(lang.split('+'))
+        self.postprocess = postprocess
+        # Each page keeps one core busy; more parallel pages only add latency
+        self._slots = threading.BoundedSemaphore(max_concurrency or os.cpu_count() or 1)
+        self._version = None
+        self._error = None
+
+    def availability(self):
+        if not PYTESSERACT_INSTALLED:
+            return False, 'pytesseract is not installed'
+        if self._version is None and self._error is None:
+            try:
+                self._version = str(pytesseract.get_tesseract_version())
+            except Exception as e:
+                self._error = f'tesseract binary not found: {e}'
+        if self._error:
+            return False, self._error
+        return True, None
+
+    def recognize(self, image_path, deadline=None):
+        from PIL import Image, ImageOps
+
+        with self._slots:
+            with Image.open(image_path) as image:
+                # Grayscale with EXIF orientation applied reads better than raw RGB
+                page = ImageOps.grayscale(ImageOps.exif_transpose(image))
+            text = pytesseract.image_to_string(page, lang=self.lang, config=self.config,
+                                               timeout=deadline or 0)
+        if self.postprocess:
+            text = self.postprocess(text)
+        return text if text and text.strip() else NO_TEXT
+
+    def capabilities(self):
+        capabilities = super().capabilities()
+        capabilities['version'] = self._version
+        return capabilities
+
+class OCRRouter:
+    """Chooses a backend per request and falls back through the rest"""
+
+    def __init__(self, backends, default_quality='best', observer=None):
+        self.backends = list(backends)
+        self.default_quality = default_quality if default_quality in QUALITY_SETTINGS else 'best'
+        # Called as observer(backend name, seconds, pages, failed) after every attempt
+        self.observer = observer
+
+    def get(self, name):
+        return next((backend for backend in self.backends if backend.name == name), None)
+
+    def candidates(self, quality=None):
+        """Usable backends in the order they should be tried"""
+        quality = quality if quality in QUALITY_SETTINGS else self.default_quality
+        usable = [backend for backend in self.backends if backend.availability()[0]]
+        if quality == 'offline':
+            usable = [backend for backend in usable if backend.local]
+        if quality == 'fast':
+            return sorted(usable, key=lambda backend: (backend.expected_latency(), backend.cost_per_page))
+        return sorted(usable, key=lambda backend: (-QUALITY_RANK.get(backend.quality, 0),
+                                                   backend.expected_latency()))
+
+    def _no_backend(self, quality):
+        reasons = '; '.join(f"{backend.name}: {backend.availability()[1] or 'not a local engine'}"
+                            for backend in self.backends)
+        return OCRBackendUnavailable(f"No OCR backend available for quality "
+                                     f"'{quality or self.default_quality}' ({reasons or 'none configured'})")
+
+    def _record(self, backend, seconds, pages=1, failed=False):
+        backend.record(seconds, pages=pages, failed=failed)
+        if self.observer is not None:
+            self.observer(backend.name, seconds, pages, failed)
+
+    def recognize(self, image_path, quality=None, deadline=None):
+        """Return (text, backend name), trying backends in routing order"""
+        last_error = None
+        for backend in self.candidates(quality):
+            start = time.monotonic()
+            with tracing.span('ocr.backend', backend=backend.name) as span:
+                try:
+                    text = backend.recognize(image_path, deadline)
+                except Exception as e:
+                    span.fail(e)
+                    self._record(backend, time.monotonic() - start, failed=True)
+                    log.warning(f"⚠️ OCR backend {backend.name} failed: {e}")
+                    last_error = e
+                    continue
+                self._record(backend, time.monotonic() - start)
+                return text, backend.name
+        raise last_error or self._no_backend(quality)
+
+    async def recognize_async(self, image_path, quality=None, deadline=None):
+        """Async variant of recognize()"""
+        last_error = None
+        for backend in self.candidates(quality):
+            start = time.monotonic()
+            with tracing.span('ocr.backend', backend=backend.name) as span:
+                try:
+                    text = await backend.recognize_async(image_path, deadline)
+                except Exception as e:
+                    span.fail(e)
+                    self._record(backend, time.monotonic() - start, failed=True)
+                    log.warning(f"⚠️ OCR backend {backend.name} failed: {e}")
+                    last_error = e
+                    continue
+                self._record(backend, time.monotonic() - start)
+                return text, backend.name
+        raise last_error or self._no_backend(quality)
+
+    def recognize_batch(self, image_paths, quality=None, deadline=None):
+        """Return ([texts], backend name) for several pages in one go"""
+        last_error = None
+        for backend in self.candidates(quality):
+            start = time.monotonic()
+            with tracing.span('ocr.backend', backend=backend.name, pages=len(image_paths)) as span:
+                try:
+                    texts = backend.recognize_batch(image_paths, deadline)
+                except Exception as e:
+                    span.fail(e)
+                    self._record(backend, time.monotonic() - start, pages=len(image_paths), failed=True)
+                    log.warning(f"⚠️ OCR backend {backend.name} batch failed: {e}")
+                    last_error = e
+                    continue
+                self._record(backend, time.monotonic() - start, pages=len(image_paths))
+                return texts, backend.name
+        raise last_error or self._no_backend(quality)
+
+    def info(self):
+        """Backends, capabilities and current routing for /api/ocr/info"""
+        return {
+            'default_quality': self.default_quality,
+            'quality_settings': list(QUALITY_SETTINGS),
+            'routing': {quality: [backend.name for backend in self.candidates(quality)]
+                        for quality in QUALITY_SETTINGS},
+            'backends': {backend.name: backend.capabilities() for backend in self.backends}
+        }
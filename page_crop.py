@@ -0,0 +1,276 @@
+"""
+Page detection, perspective correction and cropping of saved page images
+
+Phone and webcam shots also show the table, hands and background, often
+more than half the frame, and all of it was stored and sent to OCR. After
+a page is saved, PageCropper looks for the page's outline and replaces the
+image with the page alone, warped flat:
+
+    detect   edges (Canny) of a gray copy DETECT_WIDTH pixels wide; the largest
+             convex four-cornered contour covering MIN_PAGE_FRACTION of the
+             frame. If none, the largest bright region (Otsu threshold) fitted
+             with a rotated rectangle. Either must be brighter than what
+             surrounds it
+    warp     the full resolution image is mapped onto a rectangle as wide and
+             high as the page's longest edges
+    store    the worker writes the corrected page to a temporary file. Only
+             once its result is back does the caller keep the original in
+             ORIGINALS_FOLDER_NAME next to the image and move the corrected
+             page in under the original name, so OCR, thumbnails and hashing
+             all see the corrected page. A job that timed out changes nothing
+
+A frame that is already mostly page (MAX_PAGE_FRACTION) is left as it is.
+The work runs in a process pool, so the decode, warp and JPEG encode of a
+12 megapixel upload do not hold the GIL of the process serving requests.
+
+    cropper = PageCropper(processes=2)
+    result = cropper.crop('images/20240101_120000_p001.jpg')
+    # {'cropped': True, 'corners': [[x, y], ...], 'original': 'originals/...', 'milliseconds': 41.2, ...}
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import image_quality
+import lazy_imports
+
+cv2 = lazy_imports.lazy_module('cv2')
+np = lazy_imports.lazy_module('numpy')
+
+log = logging.getLogger(__name__)
+
+ORIGINALS_FOLDER_NAME = 'originals'
+DETECT_WIDTH = 512
+# The page outline must cover this share of the frame to be trusted, and a
+# page covering more than MAX_PAGE_FRACTION is not worth a warp
+MIN_PAGE_FRACTION = 0.2
+MAX_PAGE_FRACTION = 0.92
+# approxPolyDP tolerance as a share of the contour's perimeter
+APPROX_EPSILON = 0.02
+# A bright region is only taken as the page when it fills its rotated rectangle this well
+MIN_RECTANGULARITY = 0.85
+CONTOURS_TRIED = 5
+# Paper is brighter than the table around it; a box drawn on a page that
+# fills the frame has paper outside it and is not taken for the page
+MIN_PAGE_CONTRAST = 8
+JPEG_QUALITY = 95
+
+def order_corners(points):
+    """Four points as top-left, top-right, bottom-right, bottom-left"""
+    points = np.asarray(points, dtype=np.float32).reshape(4, 2)
+    sums = points.sum(axis=1)
+    differences = np.diff(points, axis=1).ravel()
+    return np.array([points[np.argmin(sums)], points[np.argmin(differences)],
+                     points[np.argmax(sums)], points[np.argmax(differences)]], dtype=np.float32)
+
+def _quad_from_edges(small, min_area):
+    blurred = cv2.GaussianBlur(small, (5, 5), 0)
+    edges = cv2.dilate(cv2.Canny(blurred, 50, 150), np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:CONTOURS_TRIED]:
+        if cv2.contourArea(contour) < min_area:
+            break
+        approx = cv2.approxPolyDP(contour, APPROX_EPSILON * cv2.arcLength(contour, True), True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            return approx.reshape(4, 2)
+    return None
+
+def _quad_from_brightness(small, min_area):
+    blurred = cv2.GaussianBlur(small, (5, 5), 0)
+    _, mask = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((9, 9), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    contour = max(contours, key=cv2.contourArea)
+    area = cv2.contourArea(contour)
+    if area < min_area:
+        return None
+    approx = cv2.approxPolyDP(contour, APPROX_EPSILON * cv2.arcLength(contour, True), True)
+    if len(approx) == 4 and cv2.isContourConvex(approx):
+        return approx.reshape(4, 2)
+    rectangle = cv2.minAreaRect(contour)
+    width, height = rectangle[1]
+    if width * height == 0 or area / (width * height) < MIN_RECTANGULARITY:
+        return None
+    return cv2.boxPoints(rectangle)
+
+def _stands_out(small, quad):
+    mask = np.zeros(small.shape, np.uint8)
+    cv2.fillConvexPoly(mask, np.asarray(quad, np.int32), 255)
+    inside = cv2.mean(small, mask)[0]
+    outside = cv2.mean(small, cv2.bitwise_not(mask))[0]
+    return inside - outside >= MIN_PAGE_CONTRAST
+
+def detect_page(gray):
+    """Corners of the page in a gray image (ordered, in its pixels), or None when no page stands out"""
+    small = image_quality.analysis_gray(gray, DETECT_WIDTH)
+    scale = gray.shape[1] / small.shape[1]
+    frame_area = small.shape[0] * small.shape[1]
+    min_area = MIN_PAGE_FRACTION * frame_area
+    for find_quad in (_quad_from_edges, _quad_from_brightness):
+        quad = find_quad(small, min_area)
+        if quad is not None and _stands_out(small, quad):
+            break
+    else:
+        return None
+    if cv2.contourArea(np.asarray(quad, np.float32)) > MAX_PAGE_FRACTION * frame_area:
+        return None
+    return order_corners(quad) * scale
+
+def warp_page(image, corners):
+    """The page inside `corners` mapped flat onto an upright rectangle"""
+    top_left, top_right, bottom_right, bottom_left = corners
+    width = int(round(max(np.linalg.norm(top_right - top_left), np.linalg.norm(bottom_right - bottom_left))))
+    height = int(round(max(np.linalg.norm(bottom_left - top_left), np.linalg.norm(bottom_right - top_right))))
+    target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(corners.astype(np.float32), target)
+    return cv2.warpPerspective(image, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_REPLICATE)
+
+def _keep_original(image_path, original_path):
+    # A hard link costs nothing; the corrected page then replaces the name
+    os.makedirs(os.path.dirname(original_path), exist_ok=True)
+    if os.path.exists(original_path):
+        os.remove(original_path)
+    try:
+        os.link(image_path, original_path)
+    except OSError:
+        shutil.copyfile(image_path, original_path)
+
+def crop_page_file(image_path, analysis_width=image_quality.ANALYSIS_WIDTH, jpeg_quality=JPEG_QUALITY):
+    """Detect, warp and crop the page in an image file, writing the page to a temporary file.
+
+    Runs in a pool worker and leaves the image itself alone; commit_crop()
+    puts the page in its place. When a page was found the result carries
+    `corrected_path` and `gray`, the corrected page at `analysis_width`."""
+    started = time.perf_counter()
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"could not decode {image_path}")
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    result = {'cropped': False, 'source_size': [width, height]}
+    corners = detect_page(gray)
+    if corners is not None:
+        page = warp_page(image, corners)
+        success, encoded = cv2.imencode('.jpg', page, [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality])
+        if not success:
+            raise ValueError('could not encode the corrected page')
+        # Same folder as the image, so committing it is a rename
+        descriptor, corrected_path = tempfile.mkstemp(suffix='.crop.tmp', dir=os.path.dirname(image_path))
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(encoded.tobytes())
+        page_height, page_width = page.shape[:2]
+        result.update({
+            'cropped': True,
+            'corners': [[round(float(x), 1), round(float(y), 1)] for x, y in corners],
+            'page_size': [page_width, page_height],
+            'page_fraction': round(float(cv2.contourArea(corners)) / (width * height), 3),
+            'corrected_path': corrected_path,
+            'gray': image_quality.analysis_gray(cv2.cvtColor(page, cv2.COLOR_BGR2GRAY), analysis_width)
+        })
+    result['milliseconds'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+def commit_crop(image_path, result):
+    """Keep the original and move the corrected page from a worker's result in under the image's name"""
+    corrected_path = result.pop('corrected_path')
+    try:
+        folder, filename = os.path.split(image_path)
+        _keep_original(image_path, os.path.join(folder, ORIGINALS_FOLDER_NAME, filename))
+        # Readers see either the whole original or the whole corrected page
+        os.replace(corrected_path, image_path)
+    except OSError:
+        _remove_quietly(corrected_path)
+        raise
+    result['original'] = f"{ORIGINALS_FOLDER_NAME}/{filename}"
+    return result
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _discard_output(future):
+    # Done callback for a job its caller gave up on
+    if not future.cancelled() and future.exception() is None and future.result().get('corrected_path'):
+        _remove_quietly(future.result()['corrected_path'])
+
+def _init_worker():
+    # The pool supplies the parallelism; OpenCV's own threads would only contend
+    cv2.setNumThreads(1)
+
+class PageCropper:
+    """Runs crop_page_file() in a pool of worker processes"""
+
+    def __init__(self, processes=2, timeout=15.0, analysis_width=image_quality.ANALYSIS_WIDTH):
+        self.processes = max(1, processes)
+        self.timeout = timeout
+        self.analysis_width = analysis_width
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def pool(self):
+        # Created on first use so each gunicorn worker (or the camera owner)
+        # starts its own. Forking the worker itself would copy its threads'
+        # locks and OpenCV's state mid-use, so the jobs fork from a clean
+        # forkserver, as the TTS pool's do
+        with self._pool_lock:
+            if self._pool is None:
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._pool = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                                 mp_context=multiprocessing.get_context(method))
+            return self._pool
+
+    def _replace_broken(self, pool):
+        # A job's process died (killed for memory, or crashed in OpenCV on a
+        # bad upload) and the executor refuses all further work
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        log.warning("⚠️ Page crop pool broke, starting a new one")
+
+    def submit(self, image_path):
+        pool = self.pool()
+        try:
+            return pool.submit(crop_page_file, os.path.abspath(image_path), self.analysis_width)
+        except BrokenProcessPool:
+            self._replace_broken(pool)
+            return self.pool().submit(crop_page_file, os.path.abspath(image_path), self.analysis_width)
+
+    def crop(self, image_path):
+        """Crop one image in the pool and wait for it; the result also has `total_milliseconds`.
+
+        On timeout the job is cancelled, or its output thrown away when it
+        finishes, so the image is never replaced after the caller moved on."""
+        started = time.perf_counter()
+        future = self.submit(image_path)
+        try:
+            result = future.result(timeout=self.timeout)
+        except BaseException:
+            if not future.cancel():
+                future.add_done_callback(_discard_output)
+            raise
+        if result['cropped']:
+            commit_crop(image_path, result)
+        result['total_milliseconds'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def info(self):
+        return {'processes': self.processes, 'timeout_seconds': self.timeout, 'started': self._pool is not None}
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Perceptual hashes of saved pages and near-duplicate lookup
+
+Double taps, auto-capture jitter and re-uploads from the phone save the
+same page more than once. Every saved image gets a pHash here, so the app
+can flag a page that is close to an earlier one and copy that page's text
+and audio instead of running OCR and TTS again.
+
+page_hash() takes the DCT of a 64x64 gray thumbnail and keeps two
+signatures: a 64-bit coarse hash from DCT rows and columns 1-8, used to
+find candidates, and a 256-bit fine hash from rows and columns 0-15, which
+decides. Row and column 0 describe the page layout that every page of a
+book shares, so they are left out of the coarse hash.
+
+Lookup is multi-index hashing. The coarse hash is split into four 16-bit
+chunks, each with a table of the pages that have that value. Probing each
+chunk value and its 16 one-bit neighbours finds every page within 7 coarse
+bits, because two such hashes agree to within one bit on at least one
+chunk. At 100k pages that is a few thousand candidates instead of 100k.
+
+Hashes are stored in SQLite so every worker sees every page; each process
+keeps the chunk tables in memory and pulls new rows before a lookup.
+Existing libraries can be hashed with:
+
+    python page_hashes.py reindex [--full]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import image_quality
+import lazy_imports
+import metrics
+
+cv2 = lazy_imports.lazy_module('cv2')
+np = lazy_imports.lazy_module('numpy')
+
+PAGE_HASH_INDEX_PATH = os.getenv('PAGE_HASH_INDEX_PATH', 'page_hashes.db')
+DEFAULT_IMAGE_FOLDER = 'images'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+REINDEX_BATCH_SIZE = 500
+
+THUMBNAIL_SIZE = 64
+CHUNKS = 4
+CHUNK_BITS = 16
+# Guaranteed reach of probing each chunk within one bit: CHUNKS * 2 - 1
+COARSE_RADIUS = 7
+# Fine-hash bits two captures of one page may differ by. Re-uploads stay
+# within 8 of 256 and double taps on a fixed camera mostly within 16, while
+# different pages laid out alike (a book) start at about 16 for pages with
+# a few lines of text and 60 for full pages. Copying the wrong page's text
+# is worse than reading a page twice, so the default stays below both.
+DEFAULT_MAX_DISTANCE = 12
+
+LOOKUP_SECONDS = metrics.histogram('storyreader_page_hash_lookup_seconds', 'Near-duplicate page lookups',
+                                   buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1))
+
+_CHUNK_MASK = (1 << CHUNK_BITS) - 1
+_PROBES = (0,) + tuple(1 << bit for bit in range(CHUNK_BITS))
+
+_local = threading.local()
+
+def _connect():
+    """Return this thread's connection to the hash store, creating the schema on first use"""
+    conn = getattr(_local, 'connection', None)
+    if conn is not None and getattr(_local, 'path', None) == PAGE_HASH_INDEX_PATH:
+        return conn
+
+    conn = sqlite3.connect(PAGE_HASH_INDEX_PATH, timeout=10)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS page_hashes (
+            id INTEGER PRIMARY KEY,
+            image_file TEXT UNIQUE NOT NULL,
+            coarse INTEGER NOT NULL,
+            fine BLOB NOT NULL,
+            duplicate_of TEXT,
+            distance INTEGER
+        );
+    """)
+    _local.connection = conn
+    _local.path = PAGE_HASH_INDEX_PATH
+    return conn
+
+def page_hash(gray):
+    """(coarse, fine) perceptual hash of a single-channel 8-bit page image"""
+    # Exact halvings, then one area-averaging step: the thumbnail then comes
+    # out the same whatever resolution the page was saved at, which a
+    # bilinear step does not (near-white pages lose half their bits to it)
+    small = gray
+    while small.shape[0] >= THUMBNAIL_SIZE * 8 and small.shape[1] >= THUMBNAIL_SIZE * 8:
+        small = cv2.resize(small, (small.shape[1] // 2, small.shape[0] // 2), interpolation=cv2.INTER_AREA)
+    small = cv2.resize(small, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA)
+    dct = cv2.dct(np.float32(small))
+    coarse = dct[1:9, 1:9].ravel()
+    fine = dct[:16, :16].ravel()
+    # Each bit: is the coefficient above the median, leaving out the DC term
+    coarse_bits = np.packbits(coarse > np.median(coarse))
+    fine_bits = np.packbits(fine > np.median(fine[1:]))
+    return int.from_bytes(coarse_bits.tobytes(), 'big'), int.from_bytes(fine_bits.tobytes(), 'big')
+
+def hash_image_file(path):
+    """page_hash() of an image file, decoded at reduced size; None if it can't be read"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    gray = image_quality.decode_gray(data, THUMBNAIL_SIZE * 8)
+    return page_hash(gray) if gray is not None else None
+
+def _chunks(coarse):
+    return [(coarse >> (CHUNK_BITS * index)) & _CHUNK_MASK for index in range(CHUNKS)]
+
+class _ChunkIndex:
+    """This process's copy of the stored hashes, keyed by coarse-hash chunk"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(None)
+
+    def reset(self, path):
+        self.path = path
+        self.synced_id = 0
+        self.pages = {}  # image_file -> (coarse, fine)
+        self.tables = [{} for _ in range(CHUNKS)]  # chunk value -> list of image_file
+
+    def add(self, image_file, coarse, fine):
+        self.discard(image_file)
+        self.pages[image_file] = (coarse, fine)
+        for table, chunk in zip(self.tables, _chunks(coarse)):
+            table.setdefault(chunk, []).append(image_file)
+
+    def discard(self, image_file):
+        hashes = self.pages.pop(image_file, None)
+        if hashes is None:
+            return
+        for table, chunk in zip(self.tables, _chunks(hashes[0])):
+            files = table.get(chunk)
+            if files is not None and image_file in files:
+                files.remove(image_file)
+                if not files:
+                    del table[chunk]
+
+    def sync(self, conn):
+        """Pull rows written since the last sync, by this or any other process"""
+        if self.path != PAGE_HASH_INDEX_PATH:
+            self.reset(PAGE_HASH_INDEX_PATH)
+        rows = conn.execute('SELECT id, image_file, coarse, fine FROM page_hashes WHERE id > ? ORDER BY id',
+                            (self.synced_id,)).fetchall()
+        for row_id, image_file, coarse, fine in rows:
+            self.add(image_file, coarse & ((1 << 64) - 1), int.from_bytes(fine, 'big'))
+            self.synced_id = row_id
+
+    def candidates(self, coarse):
+        found = set()
+        for table, chunk in zip(self.tables, _chunks(coarse)):
+            for probe in _PROBES:
+                files = table.get(chunk ^ probe)
+                if files:
+                    found.update(files)
+        return found
+
+_index = _ChunkIndex()
+
+def _signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def find_duplicates(hashes, max_distance=DEFAULT_MAX_DISTANCE, exclude=None, limit=5):
+    """Stored pages within max_distance fine-hash bits of `hashes`, closest first"""
+    started = time.perf_counter()
+    coarse, fine = hashes
+    conn = _connect()
+    matches = []
+    with _index.lock:
+        _index.sync(conn)
+        for image_file in _index.candidates(coarse):
+            if image_file == exclude:
+                continue
+            other_coarse, other_fine = _index.pages[image_file]
+            if (other_coarse ^ coarse).bit_count() > COARSE_RADIUS:
+                continue
+            distance = (other_fine ^ fine).bit_count()
+            if distance <= max_distance:
+                matches.append({'filename': image_file, 'distance': distance})
+    matches.sort(key=lambda match: (match['distance'], match['filename']))
+    LOOKUP_SECONDS.observe(time.perf_counter() - started)
+    return matches[:limit]
+
+def add_page(image_file, hashes, duplicate_of=None, distance=None):
+    """Store a page's hashes, and the earlier page it duplicates if any"""
+    coarse, fine = hashes
+    conn = _connect()
+    with conn:
+        conn.execute('DELETE FROM page_hashes WHERE image_file = ?', (image_file,))
+        conn.execute('INSERT INTO page_hashes (image_file, coarse, fine, duplicate_of, distance) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     (image_file, _signed(coarse), fine.to_bytes(32, 'big'), duplicate_of, distance))
+    with _index.lock:
+        _index.sync(conn)
+
+def load():
+    """Pull every stored hash into this process, so the first lookup doesn't wait for it"""
+    conn = _connect()
+    with _index.lock:
+        _index.sync(conn)
+        return len(_index.pages)
+
+def stored_hashes(image_file):
+    """(coarse, fine) stored for a page, or None"""
+    conn = _connect()
+    with _index.lock:
+        _index.sync(conn)
+        return _index.pages.get(image_file)
+
+def recorded_duplicate(image_file):
+    """{'filename', 'distance'} of the page this one was flagged as a duplicate of, or None"""
+    row = _connect().execute('SELECT duplicate_of, distance FROM page_hashes WHERE image_file = ?',
+                             (image_file,)).fetchone()
+    if not row or row[0] is None:
+        return None
+    return {'filename': row[0], 'distance': row[1]}
+
+def recorded_duplicates():
+    """{image file: {'filename', 'distance'}} for every page flagged as a duplicate, in one query"""
+    rows = _connect().execute('SELECT image_file, duplicate_of, distance FROM page_hashes '
+                              'WHERE duplicate_of IS NOT NULL')
+    return {image_file: {'filename': duplicate_of, 'distance': distance} for image_file, duplicate_of, distance in rows}
+
+def remove_page(image_file):
+    """Forget a deleted page; other processes drop it when they next reindex or restart"""
+    conn = _connect()
+    with conn:
+        conn.execute('DELETE FROM page_hashes WHERE image_file = ?', (image_file,))
+    with _index.lock:
+        _index.discard(image_file)
+
+def page_count():
+    """Return the number of hashed pages"""
+    return _connect().execute('SELECT COUNT(*) FROM page_hashes').fetchone()[0]
+
+def reindex(image_folder=DEFAULT_IMAGE_FOLDER, full=False):
+    """Hash the images that have no stored hash and drop rows for deleted images.
+
+    With full set every image is hashed again.
+    """
+    conn = _connect()
+    stats = {'hashed': 0, 'unchanged': 0, 'unreadable': 0, 'removed': 0}
+
+    if full:
+        with conn:
+            conn.execute('DELETE FROM page_hashes')
+        with _index.lock:
+            _index.reset(PAGE_HASH_INDEX_PATH)
+
+    known = {row[0] for row in conn.execute('SELECT image_file FROM page_hashes')}
+    seen = set()
+    pending = 0
+
+    for entry in os.scandir(image_folder):
+        if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        seen.add(entry.name)
+        if entry.name in known:
+            stats['unchanged'] += 1
+            continue
+
+        hashes = hash_image_file(entry.path)
+        if hashes is None:
+            stats['unreadable'] += 1
+            continue
+        coarse, fine = hashes
+        conn.execute('INSERT INTO page_hashes (image_file, coarse, fine) VALUES (?, ?, ?)',
+                     (entry.name, _signed(coarse), fine.to_bytes(32, 'big')))
+        stats['hashed'] += 1
+
+        pending += 1
+        if pending >= REINDEX_BATCH_SIZE:
+            conn.commit()
+            pending = 0
+
+    for image_file in known - seen:
+        conn.execute('DELETE FROM page_hashes WHERE image_file = ?', (image_file,))
+        stats['removed'] += 1
+    conn.commit()
+
+    # Removed rows are not pulled by sync(); start this process's copy afresh
+    with _index.lock:
+        _index.reset(PAGE_HASH_INDEX_PATH)
+        _index.sync(conn)
+    return stats
+
+def main(argv=None):
+    global PAGE_HASH_INDEX_PATH
+
+    parser = argparse.ArgumentParser(description='Perceptual hashes of page images')
+    parser.add_argument('--index', default=PAGE_HASH_INDEX_PATH, help='Path to the SQLite hash store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    reindex_parser = subparsers.add_parser('reindex', help='Hash existing images')
+    reindex_parser.add_argument('--image-folder', default=DEFAULT_IMAGE_FOLDER)
+    reindex_parser.add_argument('--full', action='store_true', help='Hash every image again')
+
+    find_parser = subparsers.add_parser('find', help='List stored pages that look like an image')
+    find_parser.add_argument('image')
+    find_parser.add_argument('--max-distance', type=int, default=DEFAULT_MAX_DISTANCE)
+
+    args = parser.parse_args(argv)
+    PAGE_HASH_INDEX_PATH = args.index
+
+    if args.command == 'reindex':
+        start_time = time.time()
+        stats = reindex(args.image_folder, full=args.full)
+        print(f"✅ Hashed {args.image_folder} in {time.time() - start_time:.2f}s: {stats}")
+        print(f"🖼️ {page_count()} pages hashed")
+    else:
+        hashes = hash_image_file(args.image)
+        if hashes is None:
+            print(f"❌ Could not read {args.image}")
+            return 1
+        start_time = time.time()
+        matches = find_duplicates(hashes, args.max_distance, exclude=os.path.basename(args.image), limit=20)
+        elapsed_ms = (time.time() - start_time) * 1000
+        for match in matches:
+            print(f"{match['filename']} distance {match['distance']}")
+        print(f"🔍 {len(matches)} matches in {elapsed_ms:.1f}ms")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""
+On-demand profiling of live requests with cProfile or a stack sampler
+
+A session profiles the next N requests and/or T seconds of requests,
+optionally only on chosen routes. Streamed bodies such as /api/stream are
+profiled while the server pulls each chunk from the generator, so the frame
+loop shows up too. cProfile sessions produce a .pstats file (pstats,
+snakeviz); sampling sessions produce collapsed stacks, one
+"route;frame;...;frame count" line per distinct stack, ready for
+flamegraph.pl or speedscope, with the route as the root frame so the
+busiest endpoint stands out.
+
+    profiler = Profiler('logs/profiles')
+    profiler.start(mode='sample', routes=['/api/stream'], seconds=30)
+    handle = profiler.begin_request('/api/stream')   # None if not profiled
+    handle.resume(); ...; handle.pause(); handle.end()
+
+Nothing here runs unless a session is active; app.py only installs its
+request hooks when profiling is enabled at all.
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+MODES = ('cprofile', 'sample')
+OUTPUT_SUFFIX = {'cprofile': '.pstats', 'sample': '.collapsed'}
+# A streamed response is profiled at most this long when the session has no time limit
+STREAM_PROFILE_SECONDS = 10.0
+MAX_SESSION_SECONDS = 600.0
+
+def short_path(filename):
+    """'flask/app.py' for installed packages, the base name for the app's own modules"""
+    _, marker, installed = filename.rpartition('site-packages' + os.sep)
+    return installed if marker else os.path.basename(filename)
+
+class RequestProfile:
+    """Profiling of one request; resume()/pause() must run on the thread serving it"""
+
+    def __init__(self, session, route):
+        self.session = session
+        self.route = route
+        self.profiler = cProfile.Profile() if session.mode == 'cprofile' else None
+        self.started = time.monotonic()
+        self.ended = False
+        self._running = False
+
+    def resume(self):
+        if self.ended or self._running:
+            return
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another profiler already owns this thread
+                self.session.count_skipped()
+                self.profiler = None
+                self.end()
+                return
+        else:
+            self.session.watch_thread(threading.get_ident(), self.route)
+        self._running = True
+
+    def pause(self):
+        if not self._running:
+            return
+        if self.profiler is not None:
+            self.profiler.disable()
+        else:
+            self.session.unwatch_thread(threading.get_ident())
+        self._running = False
+
+    def end(self):
+        """Stop profiling this request and hand its results to the session (once)"""
+        if self.ended:
+            return
+        self.pause()
+        self.ended = True
+        self.session.request_done(self)
+
+    def profile_stream(self, iterable):
+        """Profile producing each chunk of a streamed body until the session's time is up"""
+        deadline = self.session.deadline or (time.monotonic() + STREAM_PROFILE_SECONDS)
+        iterator = iter(iterable)
+        try:
+            while not self.ended and time.monotonic() < deadline:
+                self.resume()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.pause()
+                yield chunk
+            self.end()
+            for chunk in iterator:
+                yield chunk
+        finally:
+            self.end()
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+class ProfileSession:
+    """One profiling run: which requests it takes, and their merged results"""
+
+    def __init__(self, mode='cprofile', routes=None, max_requests=None, seconds=None, interval=0.005,
+                 output_dir='.', trigger='admin', on_finish=None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if not max_requests and not seconds:
+            raise ValueError('Give a number of requests, a number of seconds or both')
+        if seconds and not 0 < seconds <= MAX_SESSION_SECONDS:
+            raise ValueError(f'seconds must be between 0 and {MAX_SESSION_SECONDS:.0f}')
+        self.id = datetime.now().strftime('%Y%m%d_%H%M%S_') + os.urandom(3).hex()
+        self.mode = mode
+        self.routes = set(routes) if routes else None
+        self.max_requests = max_requests
+        self.seconds = seconds
+        self.interval = max(0.001, interval)
+        self.trigger = trigger
+        self.path = os.path.join(output_dir, self.id + OUTPUT_SUFFIX[mode])
+        self.started_at = datetime.now().isoformat()
+        self.deadline = time.monotonic() + seconds if seconds else None
+        self.requests = 0
+        self.in_flight = 0
+        self.skipped = 0
+        self.samples = 0
+        self.routes_seen = Counter()
+        self.finished = False
+        self.closing = False
+        self.error = None
+        self._on_finish = on_finish
+        self._lock = threading.Lock()
+        self._stats = None
+        self._stacks = Counter()
+        self._watched = {}
+        self._sampler = None
+        self._timer = None
+        if seconds:
+            # Ends the session on time even if no more requests arrive
+            self._start_timer(seconds, self._deadline_reached)
+
+    def _start_timer(self, seconds, callback):
+        self._timer = threading.Timer(seconds, callback)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _deadline_reached(self):
+        with self._lock:
+            in_flight = self.in_flight
+        if in_flight == 0:
+            self.finish()
+        else:
+            # The last request to end writes the results; don't wait forever for a stuck one
+            self._start_timer(30.0, self.finish)
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _full(self):
+        return self.max_requests is not None and self.requests >= self.max_requests
+
+    def begin(self, route):
+        """A RequestProfile if this session takes the request, else None"""
+        if self.closing or (self.routes is not None and route not in self.routes) or self.expired():
+            return None
+        with self._lock:
+            if self.closing or self._full():
+                return None
+            self.requests += 1
+            self.in_flight += 1
+            self.routes_seen[route] += 1
+        return RequestProfile(self, route)
+
+    def count_skipped(self):
+        with self._lock:
+            self.skipped += 1
+
+    def request_done(self, request_profile):
+        with self._lock:
+            self.in_flight -= 1
+            if request_profile.profiler is not None and not self.closing:
+                try:
+                    if self._stats is None:
+                        self._stats = pstats.Stats(request_profile.profiler)
+                    else:
+                        self._stats.add(request_profile.profiler)
+                except TypeError:
+                    pass  # Nothing was recorded
+            done = self.in_flight == 0 and (self._full() or self.expired())
+        if done:
+            self.finish()
+
+    # Sampling ------------------------------------------------------------
+
+    def watch_thread(self, ident, route):
+        with self._lock:
+            self._watched[ident] = route
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name=f'profile-sampler-{self.id}',
+                                                 daemon=True)
+                self._sampler.start()
+
+    def unwatch_thread(self, ident):
+        with self._lock:
+            self._watched.pop(ident, None)
+
+    def _sample(self):
+        while not self.closing:
+            with self._lock:
+                watched = dict(self._watched)
+            if watched:
+                frames = sys._current_frames()
+                for ident, route in watched.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    self._stacks[';'.join([route] + stack[::-1])] += 1
+                self.samples += 1
+                del frames
+            time.sleep(self.interval)
+
+    # Results -------------------------------------------------------------
+
+    def finish(self):
+        """Stop taking requests and write the results (once)"""
+        with self._lock:
+            if self.closing:
+                return
+            self.closing = True
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._sampler is not None and self._sampler is not threading.current_thread():
+            self._sampler.join(timeout=1.0)
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            if self.mode == 'cprofile':
+                if self._stats is not None:
+                    self._stats.dump_stats(self.path)
+                else:
+                    self.path = None
+            elif self._stacks:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    for stack, count in self._stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+            else:
+                self.path = None
+        except OSError as e:
+            self.error = str(e)
+            self.path = None
+        self.finished = True
+        if self._on_finish is not None:
+            self._on_finish(self)
+
+    def top_functions(self, limit=10):
+        """Most expensive functions by cumulative time, for a quick look without downloading"""
+        if self._stats is None:
+            return []
+        rows = sorted(self._stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [{'function': f"{name} ({short_path(filename)}:{line})", 'calls': calls,
+                 'total_seconds': round(total, 4), 'cumulative_seconds': round(cumulative, 4)}
+                for (filename, line, name), (_, calls, total, cumulative, _) in rows]
+
+    def info(self):
+        info = {
+            'id': self.id,
+            'mode': self.mode,
+            'trigger': self.trigger,
+            'routes': sorted(self.routes) if self.routes else None,
+            'max_requests': self.max_requests,
+            'seconds': self.seconds,
+            'started_at': self.started_at,
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'skipped': self.skipped,
+            'routes_seen': dict(self.routes_seen),
+            'finished': self.finished,
+            'file': os.path.basename(self.path) if self.finished and self.path else None,
+            'error': self.error
+        }
+        if self.mode == 'sample':
+            info['samples'] = self.samples
+            info['interval'] = self.interval
+        elif self.finished:
+            info['top_functions'] = self.top_functions()
+        return info
+
+class Profiler:
+    """At most one admin session at a time, plus one-off single-request profiles"""
+
+    def __init__(self, output_dir, keep=20):
+        self.output_dir = output_dir
+        self.active = None
+        self.finished = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def start(self, mode='cprofile', routes=None, max_requests=None, seconds=None, interval=0.005):
+        with self._lock:
+            if self.active is not None and not self.active.closing:
+                raise RuntimeError(f'Profiling session {self.active.id} is already running')
+            self.active = ProfileSession(mode, routes, max_requests, seconds, interval, self.output_dir,
+                                         on_finish=self._finished)
+            return self.active
+
+    def stop(self):
+        session = self.active
+        if session is not None:
+            session.finish()
+        return session
+
+    def begin_request(self, route, one_off_mode=None):
+        """A RequestProfile for this request, or None; one_off_mode profiles just this request"""
+        if one_off_mode:
+            session = ProfileSession(one_off_mode, max_requests=1, output_dir=self.output_dir,
+                                     trigger='header', on_finish=self._finished)
+            return session.begin(route)
+        session = self.active
+        return session.begin(route) if session is not None else None
+
+    def _finished(self, session):
+        with self._lock:
+            if self.active is session:
+                self.active = None
+            if len(self.finished) == self.finished.maxlen:
+                # The oldest result falls out of the list; remove its file too
+                oldest = self.finished[0]
+                if oldest.path and os.path.exists(oldest.path):
+                    os.remove(oldest.path)
+            self.finished.append(session)
+
+    def find(self, session_id):
+        with self._lock:
+            return next((session for session in self.finished if session.id == session_id), None)
+
+    def status(self):
+        with self._lock:
+            active, finished = self.active, list(self.finished)
+        return {
+            'active': active.info() if active is not None else None,
+            'finished': [session.info() for session in reversed(finished)]
+        }
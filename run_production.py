@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Start Story Reader in production mode
+
+Launches the camera owner process, waits until it accepts connections,
+then runs gunicorn with N stateless HTTP workers pointed at it. Stopping
+this script stops both.
+
+    python run_production.py --workers 4
+
+With --asgi the workers are uvicorn processes serving asgi_app.py, whose
+OCR and TTS endpoints use the async Google clients. Logs are JSON lines
+unless LOG_FORMAT=text is set.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing.connection import Client
+
+import camera_service
+
+def wait_for_camera_service(address, authkey, timeout=15):
+    """Block until the camera owner accepts connections"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            Client(camera_service.parse_address(address), authkey=authkey).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def uvicorn_command(args):
+    """uvicorn command line equivalent to the gunicorn settings"""
+    host, _, port = (args.bind or os.getenv('BIND', '0.0.0.0:5001')).rpartition(':')
+    workers = args.workers or int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))
+    command = [sys.executable, '-m', 'uvicorn', 'asgi_app:application',
+               '--host', host, '--port', port, '--workers', str(workers)]
+    if os.path.exists('cert.pem') and os.path.exists('key.pem'):
+        command += ['--ssl-certfile', 'cert.pem', '--ssl-keyfile', 'key.pem']
+    return command
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run camera owner + gunicorn workers')
+    parser.add_argument('--workers', type=int, help='Number of HTTP worker processes')
+    parser.add_argument('--threads', type=int, help='Threads per worker')
+    parser.add_argument('--bind', help='Address for gunicorn to listen on (default 0.0.0.0:5001)')
+    parser.add_argument('--camera-address', default=os.getenv('CAMERA_SERVICE_ADDRESS', camera_service.DEFAULT_ADDRESS))
+    parser.add_argument('--asgi', action='store_true', help='Serve asgi_app.py with uvicorn instead of gunicorn')
+    args = parser.parse_args(argv)
+
+    # A fresh key each run, so only the processes started here can reach the camera
+    env = dict(os.environ, CAMERA_SERVICE_ADDRESS=args.camera_address, CAMERA_SERVICE_AUTHKEY=os.urandom(32).hex())
+    # One JSON object per log line for journald and log shippers
+    env.setdefault('LOG_FORMAT', 'json')
+    if args.workers:
+        env['WEB_CONCURRENCY'] = str(args.workers)
+    if args.threads:
+        env['GUNICORN_THREADS'] = env['ASGI_WSGI_THREADS'] = str(args.threads)
+    if args.bind:
+        env['BIND'] = args.bind
+    # Workers and the camera owner share metric snapshots here, so /metrics
+    # on any worker reports all of them; counters start afresh each run
+    metrics_dir = env.get('METRICS_MULTIPROCESS_DIR')
+    created_metrics_dir = not metrics_dir
+    if created_metrics_dir:
+        metrics_dir = env['METRICS_MULTIPROCESS_DIR'] = tempfile.mkdtemp(prefix='story-reader-metrics-')
+    else:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+            os.remove(path)
+
+    print(f"📷 Starting camera service on {args.camera_address}...")
+    camera_process = subprocess.Popen([sys.executable, 'camera_service.py', '--address', args.camera_address], env=env)
+    if not wait_for_camera_service(args.camera_address, env['CAMERA_SERVICE_AUTHKEY'].encode()):
+        print("❌ Camera service did not come up")
+        camera_process.terminate()
+        if created_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+        return 1
+
+    if args.asgi:
+        print("🚀 Starting uvicorn workers...")
+        web_process = subprocess.Popen(uvicorn_command(args), env=env)
+    else:
+        print("🚀 Starting gunicorn workers...")
+        web_process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], env=env)
+
+    def shutdown(signum, frame):
+        web_process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        web_process.wait()
+    except KeyboardInterrupt:
+        web_process.terminate()
+        web_process.wait()
+    finally:
+        camera_process.terminate()
+        camera_process.wait()
+        if created_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+        print("🛑 Production server stopped")
+    return web_process.returncode
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Full-text search index over OCR output
+
+Pages are stored in a SQLite FTS5 table, one row per text file in the
+text folder. The index is updated incrementally by the Flask app whenever
+OCR writes a text file, and can be rebuilt for an existing library with:
+
+    python search_index.py reindex [--full]
+"""
+
+import argparse
+import html
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', 'search_index.db')
+DEFAULT_TEXT_FOLDER = 'text'
+REINDEX_BATCH_SIZE = 1000
+
+# Snippet markers are control characters so that page text can be HTML-escaped
+# before the highlight tags are inserted.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+# Text written by ocr_api() when OCR fails; never worth indexing
+_UNINDEXED_PREFIXES = ('OCR Error:', 'No text detected in image')
+
+_local = threading.local()
+
+def _connect():
+    """Return this thread's connection to the index, creating the schema on first use"""
+    conn = getattr(_local, 'connection', None)
+    if conn is not None and getattr(_local, 'path', None) == SEARCH_INDEX_PATH:
+        return conn
+
+    conn = sqlite3.connect(SEARCH_INDEX_PATH, timeout=10)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS page_meta (
+            id INTEGER PRIMARY KEY,
+            text_file TEXT UNIQUE NOT NULL,
+            book TEXT NOT NULL,
+            mtime REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS page_meta_book ON page_meta(book);
+        CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+            content,
+            tokenize = 'porter unicode61',
+            prefix = '2 3'
+        );
+    """)
+    _local.connection = conn
+    _local.path = SEARCH_INDEX_PATH
+    return conn
+
+def book_for_filename(filename):
+    """Derive the book a page belongs to from its filename.
+
+    Captures are named YYYYMMDD_HHMMSS_pXXX and mobile uploads
+    mobile_YYYYMMDD_HHMMSS_pXXX, so pages are grouped by capture date.
+    """
+    match = re.search(r'(\d{8})_\d{6}_p\d+', filename)
+    if match:
+        return match.group(1)
+    return 'unsorted'
+
+def is_indexable(text):
+    """Check whether OCR output contains real page text"""
+    return bool(text and text.strip()) and not text.startswith(_UNINDEXED_PREFIXES)
+
+def _delete_page(conn, text_filename):
+    """Delete a page's rows without committing"""
+    row = conn.execute('SELECT id FROM page_meta WHERE text_file = ?', (text_filename,)).fetchone()
+    if not row:
+        return False
+    conn.execute('DELETE FROM pages WHERE rowid = ?', (row[0],))
+    conn.execute('DELETE FROM page_meta WHERE id = ?', (row[0],))
+    return True
+
+def _insert_page(conn, text_filename, text, mtime):
+    """Replace a page's rows without committing"""
+    _delete_page(conn, text_filename)
+    if not is_indexable(text):
+        return False
+
+    cursor = conn.execute(
+        'INSERT INTO page_meta (text_file, book, mtime) VALUES (?, ?, ?)',
+        (text_filename, book_for_filename(text_filename), mtime)
+    )
+    conn.execute('INSERT INTO pages (rowid, content) VALUES (?, ?)', (cursor.lastrowid, text))
+    return True
+
+def index_page(text_filename, text, mtime=None):
+    """Add or replace a single page in the index"""
+    conn = _connect()
+    with conn:
+        return _insert_page(conn, text_filename, text, time.time() if mtime is None else mtime)
+
+def remove_page(text_filename):
+    """Remove a page from the index"""
+    conn = _connect()
+    with conn:
+        return _delete_page(conn, text_filename)
+
+def build_match_query(query):
+    """Turn free-form user input into a safe FTS5 MATCH expression.
+
+    Quoted phrases are kept together, every other word must appear, and
+    the last word is treated as a prefix so search-as-you-type works.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\w+)', query):
+        if phrase:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                terms.append('"' + ' '.join(words) + '"')
+        else:
+            terms.append(f'"{word}"')
+
+    if not terms:
+        return None
+
+    if not terms[-1].count(' ') and not query.rstrip().endswith('"'):
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+def _highlight(snippet):
+    """HTML-escape a snippet and turn the FTS markers into <mark> tags"""
+    escaped = html.escape(snippet)
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+def search(query, book=None, limit=20, offset=0):
+    """Search the index, returning ranked results with highlighted snippets"""
+    match_query = build_match_query(query)
+    if not match_query:
+        return []
+
+    sql = f"""
+        SELECT m.text_file, m.book,
+               snippet(pages, 0, '{_MARK_START}', '{_MARK_END}', '…', 16),
+               bm25(pages)
+        FROM pages JOIN page_meta m ON m.id = pages.rowid
+        WHERE pages MATCH ?
+    """
+    params = [match_query]
+    if book:
+        sql += ' AND m.book = ?'
+        params.append(book)
+    sql += ' ORDER BY bm25(pages) LIMIT ? OFFSET ?'
+    params.extend([limit, offset])
+
+    results = []
+    for text_file, page_book, snippet, rank in _connect().execute(sql, params):
+        results.append({
+            'text_file': text_file,
+            'image_file': text_file[:-len('.txt')] + '.jpg' if text_file.endswith('.txt') else None,
+            'book': page_book,
+            'snippet': _highlight(snippet),
+            'score': round(-rank, 4)
+        })
+    return results
+
+def list_books():
+    """List indexed books with their page counts"""
+    rows = _connect().execute('SELECT book, COUNT(*) FROM page_meta GROUP BY book ORDER BY book')
+    return [{'book': book, 'pages': count} for book, count in rows]
+
+def page_count():
+    """Return the number of indexed pages"""
+    return _connect().execute('SELECT COUNT(*) FROM page_meta').fetchone()[0]
+
+def reindex(text_folder=DEFAULT_TEXT_FOLDER, full=False):
+    """Bring the index in line with the text folder.
+
+    Only files whose modification time changed are re-read unless full is
+    set, in which case the index is rebuilt from scratch.
+    """
+    conn = _connect()
+    stats = {'indexed': 0, 'unchanged': 0, 'skipped': 0, 'removed': 0}
+
+    if full:
+        with conn:
+            conn.execute('DELETE FROM pages')
+            conn.execute('DELETE FROM page_meta')
+
+    known = dict(conn.execute('SELECT text_file, mtime FROM page_meta'))
+    seen = set()
+    pending = 0
+
+    # Commit in batches; one transaction per page is far too slow for big libraries
+    for entry in os.scandir(text_folder):
+        if not entry.is_file() or not entry.name.endswith('.txt'):
+            continue
+        seen.add(entry.name)
+        mtime = entry.stat().st_mtime
+        if known.get(entry.name) == mtime:
+            stats['unchanged'] += 1
+            continue
+
+        with open(entry.path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        if _insert_page(conn, entry.name, text, mtime):
+            stats['indexed'] += 1
+        else:
+            stats['skipped'] += 1
+
+        pending += 1
+        if pending >= REINDEX_BATCH_SIZE:
+            conn.commit()
+            pending = 0
+
+    for text_file in set(known) - seen:
+        _delete_page(conn, text_file)
+        stats['removed'] += 1
+
+    conn.commit()
+    with conn:
+        conn.execute("INSERT INTO pages(pages) VALUES ('optimize')")
+
+    return stats
+
+def main(argv=None):
+    global SEARCH_INDEX_PATH
+
+    parser = argparse.ArgumentParser(description='Full-text search over OCR output')
+    parser.add_argument('--index', default=SEARCH_INDEX_PATH, help='Path to the SQLite index file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    reindex_parser = subparsers.add_parser('reindex', help='Index existing text files')
+    reindex_parser.add_argument('--text-folder', default=DEFAULT_TEXT_FOLDER)
+    reindex_parser.add_argument('--full', action='store_true', help='Rebuild the index from scratch')
+
+    search_parser = subparsers.add_parser('search', help='Run a query against the index')
+    search_parser.add_argument('query')
+    search_parser.add_argument('--book')
+    search_parser.add_argument('--limit', type=int, default=10)
+
+    args = parser.parse_args(argv)
+    SEARCH_INDEX_PATH = args.index
+
+    if args.command == 'reindex':
+        start_time = time.time()
+        stats = reindex(args.text_folder, full=args.full)
+        print(f"✅ Reindexed {args.text_folder} in {time.time() - start_time:.2f}s: {stats}")
+        print(f"📚 {page_count()} pages indexed")
+    else:
+        start_time = time.time()
+        results = search(args.query, book=args.book, limit=args.limit)
+        elapsed_ms = (time.time() - start_time) * 1000
+        for result in results:
+            print(f"{result['text_file']} [{result['book']}] {result['score']}: {result['snippet']}")
+        print(f"🔍 {len(results)} results in {elapsed_ms:.1f}ms")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Shared-memory frame ring as seen from worker threads
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import camera_service
+from frame_transport import FrameRing
+
+SHAPE = (4, 6, 3)
+
+class FakeOwnerCamera(camera_service.RemoteCamera):
+    """RemoteCamera whose owner is a ring in this process instead of a socket"""
+
+    def __init__(self):
+        self.owner_ring = FrameRing.create(SHAPE, max_readers=4)
+        super().__init__('unused')
+
+    def call(self, command, **kwargs):
+        if command == 'attach':
+            return {'name': self.owner_ring.name, 'reader_index': 0}
+        if command == 'read':
+            return False, None
+        if command == 'transport_stats':
+            return None
+        raise AssertionError(command)
+
+    def restart_camera(self):
+        self.owner_ring.close()
+        self.owner_ring = FrameRing.create(SHAPE, max_readers=4)
+
+def in_thread(function):
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = function()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+class FrameRingTest(unittest.TestCase):
+    def setUp(self):
+        self.authkey = camera_service.CAMERA_SERVICE_AUTHKEY
+        camera_service.CAMERA_SERVICE_AUTHKEY = b'test'
+
+    def tearDown(self):
+        camera_service.CAMERA_SERVICE_AUTHKEY = self.authkey
+
+    def test_closed_after_close(self):
+        owner = FrameRing.create(SHAPE)
+        reader = FrameRing.attach(owner.name)
+        owner.close()
+        self.assertTrue(reader.closed)
+        reader.close()
+        self.assertTrue(reader.closed)
+
+    def test_ring_closed_by_another_thread(self):
+        camera = FakeOwnerCamera()
+        ring_a = camera._transport()[0]
+        frame = np.full(SHAPE, 7, np.uint8)
+
+        camera.restart_camera()
+        # A second thread attaches to the new ring while this one still holds the old
+        ring_b = in_thread(lambda: camera._transport()[0])
+        self.assertIsNot(ring_a, ring_b)
+
+        camera.owner_ring.publish(frame)
+        ret, read = camera.read()
+        self.assertTrue(ret)
+        self.assertTrue((read == frame).all())
+        self.assertEqual(camera.transport_stats()['worker'][0]['name'], camera.owner_ring.name)
+        camera.owner_ring.close()
+
+if __name__ == '__main__':
+    unittest.main()
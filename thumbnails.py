@@ -0,0 +1,121 @@
+"""
+Thumbnail generation with an on-disk cache
+
+Thumbnails are keyed by the source image's name, the requested size and a
+version derived from the source's mtime and size, so a re-captured or
+replaced image never serves a stale thumbnail and every cached file can be
+served with long-lived, immutable cache headers.
+"""
+
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, features
+
+log = logging.getLogger(__name__)
+
+THUMBNAIL_FOLDER = os.getenv('THUMBNAIL_FOLDER', 'thumbnails')
+
+# Longest edge in pixels for each named size
+THUMBNAIL_SIZES = {
+    'small': 240,
+    'medium': 640
+}
+DEFAULT_SIZE = 'small'
+
+THUMBNAIL_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+THUMBNAIL_EXTENSION = '.webp' if THUMBNAIL_FORMAT == 'WEBP' else '.jpg'
+THUMBNAIL_MIMETYPE = 'image/webp' if THUMBNAIL_FORMAT == 'WEBP' else 'image/jpeg'
+THUMBNAIL_QUALITY = 75
+
+# Generation happens off the request thread at capture/upload time
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbnail')
+_locks = {}
+_locks_guard = threading.Lock()
+
+def version_from_stat(stat):
+    """Return a cache key for the contents described by a stat result"""
+    return f"{stat.st_mtime_ns:x}{stat.st_size:x}"
+
+def source_version(source_path):
+    """Return a cache key for the current contents of a source image"""
+    return version_from_stat(os.stat(source_path))
+
+def _source_folder(source_path):
+    """Each source image gets its own folder so cleanup never lists the whole cache"""
+    return os.path.join(THUMBNAIL_FOLDER, os.path.splitext(os.path.basename(source_path))[0])
+
+def thumbnail_path(source_path, size, version):
+    """Path of the cached thumbnail for a given source version"""
+    return os.path.join(_source_folder(source_path), f"{size}_{version}{THUMBNAIL_EXTENSION}")
+
+def _lock_for(key):
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = threading.Lock()
+        return lock
+
+def _remove_stale(source_path, size, keep_path):
+    """Delete cached thumbnails of older versions of the same source"""
+    folder = _source_folder(source_path)
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.startswith(f"{size}_") and name.endswith(THUMBNAIL_EXTENSION) and path != keep_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _render(source_path, target_path, max_edge):
+    """Decode, downscale and write a single thumbnail"""
+    with Image.open(source_path) as image:
+        # Let the JPEG decoder scale down in the DCT domain before resampling
+        image.draft('RGB', (max_edge, max_edge))
+        image = image.convert('RGB')
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        # Write to a temporary name so concurrent readers never see a partial file
+        temp_path = f"{target_path}.{threading.get_ident()}.tmp"
+        image.save(temp_path, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+        os.replace(temp_path, target_path)
+
+def get_thumbnail(source_path, size=DEFAULT_SIZE):
+    """Return the path of an up-to-date thumbnail, generating it if needed"""
+    if size not in THUMBNAIL_SIZES:
+        raise ValueError(f"Unknown thumbnail size: {size}")
+
+    version = source_version(source_path)
+    target_path = thumbnail_path(source_path, size, version)
+    if os.path.exists(target_path):
+        return target_path
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    with _lock_for(target_path):
+        if not os.path.exists(target_path):
+            _render(source_path, target_path, THUMBNAIL_SIZES[size])
+            _remove_stale(source_path, size, target_path)
+
+    with _locks_guard:
+        _locks.pop(target_path, None)
+    return target_path
+
+def generate_thumbnails_async(source_path):
+    """Pre-render every thumbnail size for a new image in the background"""
+    def generate():
+        for size in THUMBNAIL_SIZES:
+            try:
+                get_thumbnail(source_path, size)
+            except Exception as e:
+                log.warning(f"⚠️ Thumbnail generation failed for {source_path} ({size}): {e}")
+
+    return _executor.submit(generate)
+
+def remove_thumbnails(filename):
+    """Delete every cached thumbnail for a source image"""
+    folder = _source_folder(filename)
+    if os.path.isdir(folder):
+        shutil.rmtree(folder, ignore_errors=True)
@@ -0,0 +1,463 @@
+"""
+Request tracing: a tree of timed spans per request, kept in memory and exported
+
+A trace starts when a request comes in and collects one span for every
+stage the request passes through, so a slow page can be pinned on capture,
+the Vision upload, text formatting, TTS or the file transfer:
+
+    with tracing.span('ocr.vision_request', pages=1) as span:
+        ...
+        span.set(bytes=len(content))
+
+    @tracing.traced('ocr.format_text')
+    def smart_format_text(text): ...
+
+The current span lives in a contextvar, so spans nest across function
+calls, asyncio tasks and asyncio.to_thread(); thread pools that should join
+the trace submit through contextvars.copy_context(). Outside a trace
+(startup, background threads, the camera owner process) span() is a no-op.
+
+Finished traces go to a bounded buffer for /api/traces/slowest and to an
+exporter: FileExporter writes one JSON trace per line, OTLPExporter posts
+OTLP/HTTP JSON to a collector (benchmarks/fake_otlp_collector.py stands in
+for one locally).
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import event_log
+
+log = logging.getLogger(__name__)
+
+# A runaway loop inside one request should not grow its trace without bound
+MAX_SPANS_PER_TRACE = 256
+
+TRACE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+TRACEPARENT_PATTERN = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+_current_span = contextvars.ContextVar('storyreader_current_span', default=None)
+
+def new_trace_id():
+    return os.urandom(16).hex()
+
+def new_span_id():
+    return os.urandom(8).hex()
+
+def trace_context_from_headers(headers):
+    """(trace id, parent span id) from a W3C traceparent or X-Trace-Id header, if valid
+
+    `headers` is looked up with lowercase names, which Werkzeug's Headers and
+    a dict built from an ASGI scope both answer.
+    """
+    match = TRACEPARENT_PATTERN.match((headers.get('traceparent') or '').strip().lower())
+    if match and match.group(1) != '0' * 32:
+        return match.group(1), match.group(2)
+    trace_id = (headers.get('x-trace-id') or '').strip().lower().replace('-', '')
+    if TRACE_ID_PATTERN.match(trace_id) and trace_id != '0' * 32:
+        return trace_id, None
+    return None, None
+
+class Span:
+    """One timed stage of a trace"""
+
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start', 'end', 'attributes', 'error')
+
+    def __init__(self, trace, name, parent_id=None, attributes=None, start=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+    def finish(self, end=None):
+        if self.end is None:
+            self.end = time.perf_counter() if end is None else end
+
+    @property
+    def duration(self):
+        return None if self.end is None else self.end - self.start
+
+    def to_dict(self, depth=0):
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'depth': depth,
+            'offset_ms': round((self.start - self.trace.root.start) * 1000, 3),
+            'duration_ms': None if self.end is None else round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+class _NoopSpan:
+    """Stands in for a span outside any trace"""
+
+    __slots__ = ()
+    span_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """All the spans of one request, rooted at a span named after the route"""
+
+    def __init__(self, name, trace_id=None, parent_span_id=None, attributes=None):
+        self.trace_id = trace_id or new_trace_id()
+        self.started_at = time.time()
+        self.spans = []
+        self.dropped_spans = 0
+        self.finished = False
+        self.root = Span(self, name, parent_span_id, attributes)
+        self.spans.append(self.root)
+
+    @property
+    def name(self):
+        return self.root.name
+
+    @property
+    def duration(self):
+        return self.root.duration
+
+    def add(self, span):
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped_spans += 1
+            return False
+        self.spans.append(span)
+        return True
+
+    def wall_time(self, perf_time):
+        """Epoch seconds for a perf_counter() reading taken during this trace"""
+        return self.started_at + (perf_time - self.root.start)
+
+    def to_dict(self):
+        # Spans are appended as they start; order children under their parent
+        children = {}
+        for span in list(self.spans):
+            children.setdefault(span.parent_id, []).append(span)
+        ordered = []
+
+        def walk(span, depth):
+            ordered.append(span.to_dict(depth))
+            for child in children.get(span.span_id, ()):
+                walk(child, depth + 1)
+
+        walk(self.root, 0)
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='milliseconds'),
+            'duration_ms': None if self.duration is None else round(self.duration * 1000, 3),
+            'attributes': self.root.attributes,
+            'error': self.root.error,
+            'dropped_spans': self.dropped_spans,
+            'spans': ordered
+        }
+
+class Tracer:
+    """Starts and finishes traces and keeps the most recent ones"""
+
+    def __init__(self, enabled=True, buffer_size=500, exporter=None):
+        self.enabled = enabled
+        self.exporter = exporter
+        self._recent = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=None, buffer_size=None, exporter=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if buffer_size is not None:
+            with self._lock:
+                self._recent = deque(self._recent, maxlen=buffer_size)
+        if exporter is not None:
+            self.exporter = exporter
+
+    # Request lifecycle -------------------------------------------------------
+
+    def start_trace(self, name, trace_id=None, parent_span_id=None, **attributes):
+        """Begin a trace and make its root span current; returns None when tracing is off"""
+        if not self.enabled:
+            return None
+        trace = Trace(name, trace_id, parent_span_id, attributes)
+        _current_span.set(trace.root)
+        return trace
+
+    def detach(self):
+        """Forget the current span, e.g. when a worker thread is done with a request"""
+        _current_span.set(None)
+
+    def finish_trace(self, trace, error=None):
+        """End the root span, buffer the trace and hand it to the exporter (once)"""
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        if error is not None:
+            trace.root.fail(error)
+        trace.root.finish()
+        with self._lock:
+            self._recent.append(trace)
+        if self.exporter is not None:
+            try:
+                self.exporter.export(trace)
+            except Exception as e:
+                log.warning(f"⚠️ Trace export failed: {e}")
+
+    @contextmanager
+    def trace(self, name, trace_id=None, parent_span_id=None, **attributes):
+        """Run a block as its own trace (requests outside Flask, scripts)"""
+        if not self.enabled:
+            yield None
+            return
+        trace = Trace(name, trace_id, parent_span_id, attributes)
+        token = _current_span.set(trace.root)
+        error = None
+        try:
+            yield trace
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish_trace(trace, error)
+
+    # Spans ---------------------------------------------------------------------
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the block as a child of the current span; a no-op outside a trace"""
+        parent = _current_span.get()
+        if parent is None:
+            yield NOOP_SPAN
+            return
+        child = Span(parent.trace, name, parent.span_id, attributes)
+        if not parent.trace.add(child):
+            yield NOOP_SPAN
+            return
+        token = _current_span.set(child)
+        try:
+            yield child
+        except BaseException as e:
+            child.fail(e)
+            raise
+        finally:
+            child.finish()
+            _current_span.reset(token)
+
+    def traced(self, name=None):
+        """Decorator form of span(); the span is named after the function by default"""
+        def decorate(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return func(*args, **kwargs)
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+        return decorate
+
+    def add_span(self, trace, name, start, end, parent=None, **attributes):
+        """Record a stage timed elsewhere, such as the response body leaving after the handler returned"""
+        if trace is None:
+            return None
+        span = Span(trace, name, (parent or trace.root).span_id, attributes, start=start)
+        span.finish(end)
+        return span if trace.add(span) else None
+
+    def current_trace_id(self):
+        span = _current_span.get()
+        return span.trace.trace_id if span is not None else None
+
+    # Recent traces ------------------------------------------------------------
+
+    def recent(self):
+        with self._lock:
+            return list(self._recent)
+
+    def slowest(self, limit=10, window_seconds=None, name=None):
+        """Finished traces from the buffer, slowest first"""
+        cutoff = time.time() - window_seconds if window_seconds else None
+        traces = [trace for trace in self.recent()
+                  if (cutoff is None or trace.started_at >= cutoff) and (name is None or trace.name == name)]
+        traces.sort(key=lambda trace: trace.duration or 0.0, reverse=True)
+        return traces[:limit]
+
+    def get(self, trace_id):
+        return next((trace for trace in reversed(self.recent()) if trace.trace_id == trace_id), None)
+
+    def info(self):
+        return {
+            'enabled': self.enabled,
+            'buffered': len(self._recent),
+            'buffer_size': self._recent.maxlen,
+            'exporter': self.exporter.info() if self.exporter is not None else None
+        }
+
+# Exporters -------------------------------------------------------------------
+
+class FileExporter:
+    """One JSON trace per line, written and rotated off the request thread by an EventLog"""
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.events = event_log.EventLog(path, max_bytes=max_bytes, backup_count=backup_count)
+
+    def export(self, trace):
+        self.events.emit('trace', **trace.to_dict())
+
+    def flush(self):
+        self.events.flush()
+
+    def info(self):
+        return {'kind': 'file', **self.events.info()}
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+def otlp_spans(trace):
+    """The trace's finished spans in OTLP/JSON form"""
+    spans = []
+    for span in list(trace.spans):
+        if span.end is None:
+            continue
+        entry = {
+            'traceId': trace.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            # SERVER for the request itself, INTERNAL for its stages
+            'kind': 2 if span is trace.root else 1,
+            'startTimeUnixNano': str(int(trace.wall_time(span.start) * 1e9)),
+            'endTimeUnixNano': str(int(trace.wall_time(span.end) * 1e9)),
+            'attributes': _otlp_attributes(span.attributes),
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+        }
+        if span.parent_id:
+            entry['parentSpanId'] = span.parent_id
+        spans.append(entry)
+    return spans
+
+class OTLPExporter:
+    """Posts batches of traces to an OTLP/HTTP collector as JSON from a background thread"""
+
+    def __init__(self, endpoint, service_name='storyreader', batch_size=64, flush_interval=1.0,
+                 timeout=5.0, queue_size=2000):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {'exported': 0, 'dropped': 0, 'failed': 0, 'last_error': None}
+
+    def export(self, trace):
+        self._ensure_sender()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            with self._stats_lock:
+                self.stats['dropped'] += 1
+
+    def _ensure_sender(self):
+        # Started on first use so each gunicorn worker gets its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='otlp-exporter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            batch_deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = batch_deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._post(batch)
+                with self._stats_lock:
+                    self.stats['exported'] += len(batch)
+            except Exception as e:
+                with self._stats_lock:
+                    self.stats['failed'] += len(batch)
+                    self.stats['last_error'] = str(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def payload(self, traces):
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': _otlp_attributes({'service.name': self.service_name,
+                                                             'process.pid': os.getpid()})},
+                'scopeSpans': [{
+                    'scope': {'name': 'storyreader.tracing'},
+                    'spans': [span for trace in traces for span in otlp_spans(trace)]
+                }]
+            }]
+        }
+
+    def _post(self, traces):
+        body = json.dumps(self.payload(traces)).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def flush(self):
+        """Block until every queued trace has been sent or given up on"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def info(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {'kind': 'otlp', 'url': self.url, 'queued': self._queue.qsize(), **stats}
+
+tracer = Tracer()
+configure = tracer.configure
+span = tracer.span
+traced = tracer.traced
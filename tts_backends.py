@@ -0,0 +1,349 @@
+"""
+Pluggable text-to-speech backends and a router that picks one per request
+
+Every engine implements TTSBackend: whether it is usable right now, how
+good it sounds, and how fast it has been lately, tracked as characters of
+text synthesized per second and time to the first audio bytes. The router
+tries the usable backends best-sounding first, except that when a latency
+target is set, backends expected to miss it for the given text go last.
+A failed backend falls through to the next one.
+
+Backends shipped here:
+
+    CloudTTSBackend  Wraps one of the app's online engines (Google Cloud
+                     TTS, gTTS)
+    EspeakBackend    Local espeak-ng in a process pool; works offline.
+                     Output is MP3 when lame or ffmpeg is on PATH, else WAV
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import tracing
+from hedging import LatencyTracker
+
+log = logging.getLogger(__name__)
+
+QUALITY_RANK = {'high': 2, 'standard': 1, 'low': 0}
+
+class TTSBackendUnavailable(Exception):
+    """Raised when no backend can serve a request"""
+
+class TTSBackend:
+    """Base class for speech engines"""
+
+    name = 'backend'
+    local = False             # Runs on this machine, works offline
+    quality = 'standard'      # 'high' | 'standard' | 'low'
+    output_format = 'mp3'
+    typical_chars_per_second = 500.0  # Until real timings are observed
+
+    def __init__(self):
+        self.first_audio = LatencyTracker(size=200)
+        self.chars_per_second = LatencyTracker(size=200)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'characters': 0, 'failures': 0}
+
+    def availability(self):
+        """(available, reason) for routing and /api/ocr/info"""
+        return True, None
+
+    def synthesize(self, text, filename):
+        """Write audio for `text` to the audio folder as `filename`.<ext>.
+
+        Returns (audio_path, seconds to first audio or None if the engine
+        only hands back complete files)."""
+        raise NotImplementedError
+
+    async def synthesize_async(self, text, filename):
+        """Async variant; blocking engines run on a worker thread"""
+        return await asyncio.to_thread(self.synthesize, text, filename)
+
+    def expected_latency(self, characters):
+        """Expected seconds to synthesize `characters` of text"""
+        rate = self.chars_per_second.percentile(50)
+        return characters / (rate or self.typical_chars_per_second)
+
+    def record(self, characters, seconds, first_audio=None):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['characters'] += characters
+        self.first_audio.add(first_audio if first_audio is not None else seconds)
+        self.chars_per_second.add(characters / max(seconds, 0.001))
+
+    def record_failure(self):
+        with self._lock:
+            self.stats['failures'] += 1
+
+    def capabilities(self):
+        available, reason = self.availability()
+        return {
+            'available': available,
+            'reason': reason,
+            'local': self.local,
+            'quality': self.quality,
+            'output_format': self.output_format,
+            'chars_per_second_p50': _rounded(self.chars_per_second.percentile(50), 1),
+            'first_audio_p50_seconds': _rounded(self.first_audio.percentile(50), 3),
+            'first_audio_p95_seconds': _rounded(self.first_audio.percentile(95), 3),
+            **self.stats
+        }
+
+class CloudTTSBackend(TTSBackend):
+    """An online engine; the app supplies the actual call functions"""
+
+    def __init__(self, name, quality, synthesize, availability=None, synthesize_async=None,
+                 typical_chars_per_second=500.0):
+        super().__init__()
+        self.name = name
+        self.quality = quality
+        self.typical_chars_per_second = typical_chars_per_second
+        self._synthesize = synthesize
+        self._availability = availability
+        self._synthesize_async = synthesize_async
+
+    def use_async(self, synthesize_async):
+        """Register the coroutine used by the async endpoints"""
+        self._synthesize_async = synthesize_async
+
+    def availability(self):
+        return self._availability() if self._availability else (True, None)
+
+    def synthesize(self, text, filename):
+        return self._synthesize(text, filename), None
+
+    async def synthesize_async(self, text, filename):
+        if self._synthesize_async is None:
+            return await super().synthesize_async(text, filename)
+        return await self._synthesize_async(text, filename), None
+
+def _encoder_command(wav_path, mp3_path):
+    if shutil.which('lame'):
+        return ['lame', '--quiet', '-V', '4', wav_path, mp3_path]
+    if shutil.which('ffmpeg'):
+        return ['ffmpeg', '-loglevel', 'error', '-y', '-i', wav_path, '-codec:a', 'libmp3lame', '-q:a', '4', mp3_path]
+    return None
+
+def _fix_wav_header(path):
+    """espeak-ng cannot seek stdout, so its streamed WAV header has placeholder sizes"""
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        header = f.read(44)
+        if size < 44 or header[:4] != b'RIFF' or header[36:40] != b'data':
+            return
+        f.seek(4)
+        f.write((size - 8).to_bytes(4, 'little'))
+        f.seek(40)
+        f.write((size - 44).to_bytes(4, 'little'))
+
+def _espeak_synthesize(command, voice, words_per_minute, text, audio_base, timeout):
+    """Process-pool worker: run espeak-ng, stream its WAV to disk and encode to MP3 if possible"""
+    started = time.monotonic()
+    first_audio = None
+    wav_path = f"{audio_base}.wav"
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', encoding='utf-8', delete=False) as text_file:
+        text_file.write(text)
+    try:
+        process = subprocess.Popen([command, '-v', voice, '-s', str(words_per_minute), '-f', text_file.name,
+                                    '--stdout'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        killer = threading.Timer(timeout, process.kill)
+        killer.start()
+        try:
+            with open(wav_path, 'wb') as out:
+                for chunk in iter(lambda: process.stdout.read(65536), b''):
+                    if first_audio is None:
+                        first_audio = time.monotonic() - started
+                    out.write(chunk)
+            returncode = process.wait()
+        finally:
+            killer.cancel()
+    finally:
+        os.unlink(text_file.name)
+
+    if returncode != 0:
+        if os.path.exists(wav_path):
+            os.remove(wav_path)
+        if returncode < 0:
+            raise TimeoutError(f"{command} took longer than {timeout:.0f}s")
+        raise RuntimeError(f"{command} exited with status {returncode}")
+
+    _fix_wav_header(wav_path)
+
+    mp3_path = f"{audio_base}.mp3"
+    encoder = _encoder_command(wav_path, mp3_path)
+    if encoder and subprocess.run(encoder, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+        os.remove(wav_path)
+        return mp3_path, first_audio
+    return wav_path, first_audio
+
+class EspeakBackend(TTSBackend):
+    """Local espeak-ng (or espeak) synthesis in a process pool"""
+
+    name = 'espeak'
+    local = True
+    quality = 'low'
+    typical_chars_per_second = 2000.0
+
+    def __init__(self, audio_folder, voice='en-us', words_per_minute=160, processes=None, timeout=30.0):
+        super().__init__()
+        self.audio_folder = audio_folder
+        self.voice = voice
+        self.words_per_minute = words_per_minute
+        self.processes = processes or os.cpu_count() or 1
+        self.timeout = timeout
+        self.command = shutil.which('espeak-ng') or shutil.which('espeak')
+        self.output_format = 'mp3' if _encoder_command('', '') else 'wav'
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def availability(self):
+        if not self.command:
+            return False, 'espeak-ng not found on PATH'
+        return True, None
+
+    def pool(self):
+        # Created on first use so each gunicorn worker starts its own. Forking
+        # a worker with request threads running copies their locks mid-use;
+        # a forkserver starts clean and imports __main__ once, where spawn
+        # would re-import the whole app in every pool process
+        with self._pool_lock:
+            if self._pool is None:
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                 mp_context=multiprocessing.get_context(method))
+            return self._pool
+
+    def _replace_broken(self, pool):
+        # A pool process died and the executor refuses all further work;
+        # without a new one local speech would stay off until a restart
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        log.warning("⚠️ espeak pool broke, starting a new one")
+
+    def _submit(self, text, filename):
+        arguments = (_espeak_synthesize, self.command, self.voice, self.words_per_minute, text,
+                     os.path.abspath(os.path.join(self.audio_folder, filename)), self.timeout)
+        pool = self.pool()
+        try:
+            return pool.submit(*arguments)
+        except BrokenProcessPool:
+            self._replace_broken(pool)
+            return self.pool().submit(*arguments)
+
+    def synthesize(self, text, filename):
+        return self._submit(text, filename).result()
+
+    async def synthesize_async(self, text, filename):
+        return await asyncio.wrap_future(self._submit(text, filename))
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def capabilities(self):
+        capabilities = super().capabilities()
+        capabilities.update({'command': self.command, 'voice': self.voice, 'processes': self.processes})
+        return capabilities
+
+class TTSRouter:
+    """Chooses a backend per request and falls back through the rest"""
+
+    def __init__(self, backends, latency_target=None, observer=None):
+        self.backends = list(backends)
+        self.latency_target = latency_target
+        # Called as observer(backend name, seconds, characters, failed) after every attempt
+        self.observer = observer
+
+    def get(self, name):
+        return next((backend for backend in self.backends if backend.name == name), None)
+
+    def candidates(self, characters=0, latency_target=None):
+        """Usable backends in the order they should be tried"""
+        target = latency_target or self.latency_target
+        usable = [backend for backend in self.backends if backend.availability()[0]]
+
+        def order(backend):
+            expected = backend.expected_latency(characters)
+            misses_target = bool(target) and expected > target
+            # Within target: best quality first; over target: fastest first
+            return (misses_target, expected if misses_target else -QUALITY_RANK.get(backend.quality, 0), expected)
+
+        return sorted(usable, key=order)
+
+    def _no_backend(self):
+        reasons = '; '.join(f"{backend.name}: {backend.availability()[1]}" for backend in self.backends)
+        return TTSBackendUnavailable(f"No TTS backend available ({reasons or 'none configured'})")
+
+    def _attempt_failed(self, backend, error, seconds, characters):
+        backend.record_failure()
+        if self.observer is not None:
+            self.observer(backend.name, seconds, characters, True)
+        log.warning(f"⚠️ TTS backend {backend.name} failed: {error}")
+
+    def _attempt_succeeded(self, backend, seconds, characters, first_audio):
+        backend.record(characters, seconds, first_audio)
+        if self.observer is not None:
+            self.observer(backend.name, seconds, characters, False)
+
+    def synthesize(self, text, filename, latency_target=None):
+        """Return (audio_path, backend name), trying backends in routing order"""
+        last_error = None
+        for backend in self.candidates(len(text), latency_target):
+            start = time.monotonic()
+            with tracing.span('tts.backend', backend=backend.name, characters=len(text)) as span:
+                try:
+                    audio_path, first_audio = backend.synthesize(text, filename)
+                    if not audio_path:
+                        raise RuntimeError('no audio produced')
+                except Exception as e:
+                    span.fail(e)
+                    self._attempt_failed(backend, e, time.monotonic() - start, len(text))
+                    last_error = e
+                    continue
+                self._attempt_succeeded(backend, time.monotonic() - start, len(text), first_audio)
+                return audio_path, backend.name
+        raise last_error or self._no_backend()
+
+    async def synthesize_async(self, text, filename, latency_target=None):
+        """Async variant of synthesize()"""
+        last_error = None
+        for backend in self.candidates(len(text), latency_target):
+            start = time.monotonic()
+            with tracing.span('tts.backend', backend=backend.name, characters=len(text)) as span:
+                try:
+                    audio_path, first_audio = await backend.synthesize_async(text, filename)
+                    if not audio_path:
+                        raise RuntimeError('no audio produced')
+                except Exception as e:
+                    span.fail(e)
+                    self._attempt_failed(backend, e, time.monotonic() - start, len(text))
+                    last_error = e
+                    continue
+                self._attempt_succeeded(backend, time.monotonic() - start, len(text), first_audio)
+                return audio_path, backend.name
+        raise last_error or self._no_backend()
+
+    def info(self):
+        """Backends, their speed and the current routing for /api/ocr/info"""
+        return {
+            'latency_target_seconds': self.latency_target,
+            'routing': [backend.name for backend in self.candidates(1000)],
+            'backends': {backend.name: backend.capabilities() for backend in self.backends}
+        }
+
+def _rounded(value, digits):
+    return round(value, digits) if value is not None else None
@@ -0,0 +1,174 @@
+"""
+Synthetic camera that replays a video file, a folder of page images or one image
+
+VirtualCamera has the parts of the cv2.VideoCapture interface the app uses
+(read, isOpened, get, set, release), so the capture and stream paths can
+run and be benchmarked on headless machines without a webcam. Frames are
+paced at the configured FPS like a real device; with realtime=False they
+are returned as fast as they are asked for.
+
+    CAMERA_SOURCE=test_ocr_document.jpg python app.py
+    CAMERA_SOURCE=pages/ CAMERA_SOURCE_HOLD_FRAMES=90 python app.py
+    CAMERA_SOURCE=pages.mp4 CAMERA_SOURCE_FPS=15 python app.py
+
+Images are decoded once and scaled to the size the app asks for with
+CAP_PROP_FRAME_WIDTH/HEIGHT. Each image is shown for `hold_frames` frames
+before moving on to the next, and the sequence loops.
+"""
+
+import os
+import threading
+import time
+
+import lazy_imports
+
+cv2 = lazy_imports.lazy_module('cv2')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+class VirtualCamera:
+    """cv2.VideoCapture look-alike backed by a video file, an image folder or one image"""
+
+    def __init__(self, source, fps=None, hold_frames=1, loop=True, realtime=True):
+        self.source = source
+        self.device_id = f"virtual:{source}"
+        self.hold_frames = max(1, int(hold_frames))
+        self.loop = loop
+        self.realtime = realtime
+        self.width = None
+        self.height = None
+        self.frames_read = 0
+
+        self._lock = threading.Lock()
+        self._video = None
+        self._images = []
+        self._cache = {}
+        self._position = 0
+        self._next_frame_at = None
+        self._opened = False
+
+        if os.path.isdir(source):
+            self._images = sorted(os.path.join(source, name) for name in os.listdir(source)
+                                  if name.lower().endswith(IMAGE_EXTENSIONS))
+            self._opened = bool(self._images)
+            self.fps = float(fps or 30)
+        elif source.lower().endswith(IMAGE_EXTENSIONS):
+            # A single page held in front of the camera
+            self._images = [source] if os.path.isfile(source) else []
+            self._opened = bool(self._images)
+            self.fps = float(fps or 30)
+        elif os.path.isfile(source):
+            self._video = cv2.VideoCapture(source)
+            self._opened = self._video.isOpened()
+            self.fps = float(fps or (self._video.get(cv2.CAP_PROP_FPS) if self._opened else 0) or 30)
+        else:
+            self.fps = float(fps or 30)
+
+    # Frames --------------------------------------------------------------
+
+    def _image_frame(self, index):
+        size = (self.width, self.height)
+        key = (index, size)
+        frame = self._cache.get(key)
+        if frame is None:
+            frame = cv2.imread(self._images[index])
+            if frame is None:
+                return None
+            frame = self._scaled(frame)
+            # Keep the decoded pages around; a replay folder is small
+            self._cache[key] = frame
+        return frame.copy()
+
+    def _video_frame(self):
+        ret, frame = self._video.read()
+        if not ret and self.loop:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._video.read()
+        return self._scaled(frame) if ret else None
+
+    def _scaled(self, frame):
+        if self.width and self.height and (frame.shape[1], frame.shape[0]) != (self.width, self.height):
+            return cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        return frame
+
+    def _wait_for_frame_time(self):
+        """Sleep until the next frame is due, like a camera delivering at a fixed rate"""
+        now = time.monotonic()
+        if self._next_frame_at is None or self._next_frame_at < now:
+            # Idle or slow consumer: a real camera does not queue missed frames
+            self._next_frame_at = now
+        else:
+            time.sleep(self._next_frame_at - now)
+        self._next_frame_at += 1.0 / self.fps
+
+    def read(self):
+        """Return (ret, frame) for the next frame"""
+        with self._lock:
+            if not self._opened:
+                return False, None
+            if self.realtime:
+                self._wait_for_frame_time()
+
+            if self._video is not None:
+                frame = self._video_frame()
+            else:
+                index = self._position // self.hold_frames
+                if index >= len(self._images):
+                    if not self.loop:
+                        return False, None
+                    self._position, index = 0, 0
+                frame = self._image_frame(index)
+                self._position += 1
+
+            if frame is None:
+                return False, None
+            self.frames_read += 1
+            return True, frame
+
+    # cv2.VideoCapture interface -----------------------------------------
+
+    def isOpened(self):
+        return self._opened
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width or self._native_size()[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height or self._native_size()[1])
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            if self._video is not None:
+                return self._video.get(prop)
+            return float(len(self._images) * self.hold_frames)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frames_read)
+        return 0.0
+
+    def set(self, prop, value):
+        with self._lock:
+            if prop == cv2.CAP_PROP_FRAME_WIDTH:
+                self.width = int(value)
+            elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+                self.height = int(value)
+            elif prop == cv2.CAP_PROP_FPS and value > 0:
+                self.fps = float(value)
+            else:
+                return False
+            return True
+
+    def _native_size(self):
+        if self._video is not None:
+            return (int(self._video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self._video.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        if self._images:
+            frame = cv2.imread(self._images[0])
+            if frame is not None:
+                return frame.shape[1], frame.shape[0]
+        return 0, 0
+
+    def release(self):
+        with self._lock:
+            if self._video is not None:
+                self._video.release()
+            self._cache.clear()
+            self._opened = False
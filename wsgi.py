@@ -0,0 +1,10 @@
+"""
+WSGI entry point for production servers (gunicorn -c gunicorn.conf.py wsgi:app)
+"""
+
+import app as app_module
+
+app = app_module.app
+# The worker's socket is already listening; import cv2 and the Google SDKs and
+# run the first health checks behind it
+app_module.start_background_tasks()